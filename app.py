@@ -9,6 +9,10 @@ import os
 import sys
 import json
 import time
+import queue
+import argparse
+import threading
+import importlib.util
 from pathlib import Path
 from datetime import datetime
 
@@ -24,63 +28,85 @@ import io
 # 添加当前目录到路径
 sys.path.append(str(Path(__file__).parent))
 
-# 尝试导入Kokoro
-try:
-    from kokoro import KModel, KPipeline
-    KOKORO_AVAILABLE = True
-except ImportError:
-    KOKORO_AVAILABLE = False
+from tts_engine_manager import TTSEngineManager, timestamps_to_dict, categorize_voices
+from voice_cache import is_voice_mix, parse_voice_mix
+from tts_scheduler import CancellationToken, SynthesisCancelled
+from memory_budget import MemoryBudgetExceeded
+from text_segmenter import IncrementalTextBuffer
+from audio_processing import OUTPUT_FORMATS, encode_audio, validate_output_rate
+from voice_validator import VoiceCatalog
+
+# 检查Kokoro是否已安装，模型由引擎管理器加载
+KOKORO_AVAILABLE = importlib.util.find_spec('kokoro') is not None
+if not KOKORO_AVAILABLE:
     print("⚠️  警告: kokoro包未安装，部分功能将不可用")
     print("请运行: pip install kokoro>=0.8.2 'misaki[zh]>=0.8.2'")
 
+# WebSocket流式接口需要flask-sock
+try:
+    from flask_sock import Sock
+    WEBSOCKET_AVAILABLE = True
+except ImportError:
+    WEBSOCKET_AVAILABLE = False
+
 app = Flask(__name__)
 CORS(app)
+sock = Sock(app) if WEBSOCKET_AVAILABLE else None
 
 # 配置
-REPO_ID = 'hexgrad/Kokoro-82M-v1.1-zh'
 SAMPLE_RATE = 24000
 MAX_TEXT_LENGTH = 500
 OUTPUT_DIR = Path(__file__).parent / 'output'
 OUTPUT_DIR.mkdir(exist_ok=True)
+CONFIG_PATH = Path(__file__).parent / 'tts_config.json'
 
 # 全局变量
-model = None
-zh_pipeline = None
-en_pipelines = None
+manager = None
 device = 'cuda' if torch.cuda.is_available() else 'cpu'
 
+# 进行中的请求: request_id -> 取消令牌，前端放弃请求时通过 /api/cancel 取消
+active_requests = {}
+active_requests_lock = threading.Lock()
+
+# 批量任务: job_id -> 状态。优先级分道只在同一个引擎管理器（进程）内生效，
+# 离线批量合成需要与Web流量共存时通过 /api/batch 提交到本进程，走bulk通道
+batch_jobs = {}
+batch_jobs_lock = threading.Lock()
+BATCH_WORKERS = 2
+MAX_BATCH_ITEMS = 10000
+# 已结束的任务保留这么久（秒）供查询，之后从batch_jobs中移除（输出文件保留）
+BATCH_JOB_TTL = 3600
+
+voice_catalog = VoiceCatalog(str(Path(__file__).parent / 'voices'))
+# 请求中查询音色列表时最多每隔这么久（秒）重新扫描一次音色目录
+VOICE_RESCAN_INTERVAL = 30
+
 def get_available_voices():
     """获取可用的音色列表"""
-    voices_dir = Path(__file__).parent / 'voices'
-    if not voices_dir.exists():
-        return {'female': [], 'male': [], 'english': []}
-    
-    voice_files = list(voices_dir.glob('*.pt'))
-    
-    voices = {
-        'female': [],
-        'male': [],
-        'english': []
-    }
-    
-    for voice_file in voice_files:
-        name = voice_file.stem
-        if name.startswith('zf_'):
-            voices['female'].append(name)
-        elif name.startswith('zm_'):
-            voices['male'].append(name)
-        elif name.startswith(('af_', 'bf_')):
-            voices['english'].append(name)
-    
-    # 排序
-    for category in voices:
-        voices[category].sort()
-    
-    return voices
+    # 音色目录只做结构和元数据校验并缓存结果，损坏的文件不会出现在列表中
+    voice_catalog.refresh(VOICE_RESCAN_INTERVAL)
+    return categorize_voices(voice_catalog.available())
+
+def parse_speed_params(data):
+    """
+    解析语速倍率和目标时长（秒，配音对齐时间槽时使用，优先于speed）
+
+    Raises:
+        ValueError: 不是正数
+    """
+    try:
+        speed = float(data['speed']) if data.get('speed') is not None else None
+        target_duration = (float(data['target_duration'])
+                           if data.get('target_duration') is not None else None)
+    except (TypeError, ValueError):
+        raise ValueError('必须为数字')
+    if (speed is not None and speed <= 0) or (target_duration is not None and target_duration <= 0):
+        raise ValueError('必须为正数')
+    return speed, target_duration
 
 def init_model():
     """初始化模型"""
-    global model, zh_pipeline, en_pipelines
+    global manager
     
     if not KOKORO_AVAILABLE:
         return False
@@ -88,24 +114,14 @@ def init_model():
     try:
         print(f"🚀 正在初始化模型... (设备: {device})")
         
-        # 加载模型
-        model = KModel(repo_id=REPO_ID).to(device).eval()
-        
-        # 初始化中文pipeline
-        en_pipeline = KPipeline(lang_code='a', repo_id=REPO_ID, model=False)
-        def en_callable(text):
-            if text == 'Kokoro':
-                return 'kˈOkəɹO'
-            elif text == 'Sol':
-                return 'sˈOl'
-            return next(en_pipeline(text)).phonemes
-        
-        zh_pipeline = KPipeline(lang_code='z', repo_id=REPO_ID, model=model, en_callable=en_callable)
-        
-        # 初始化英文pipelines
-        en_pipelines = [KPipeline(lang_code='b' if british else 'a', repo_id=REPO_ID, model=model) 
-                       for british in (False, True)]
+        # Web请求与 /api/batch 提交的批量任务共用引擎管理器的调度器，分别走interactive和bulk通道
+        tts_manager = TTSEngineManager(str(CONFIG_PATH))
+        results = tts_manager.initialize_engines(['kokoro'])
+        if not results.get('kokoro'):
+            print("❌ Kokoro引擎初始化失败")
+            return False
         
+        manager = tts_manager
         print("✅ 模型初始化完成")
         return True
         
@@ -113,15 +129,6 @@ def init_model():
         print(f"❌ 模型初始化失败: {str(e)}")
         return False
 
-def speed_callable(len_ps):
-    """动态调整语速"""
-    speed = 0.8
-    if len_ps <= 83:
-        speed = 1
-    elif len_ps < 183:
-        speed = 1 - (len_ps - 83) / 500
-    return speed * 1.1
-
 @app.route('/')
 def index():
     """主页"""
@@ -145,7 +152,7 @@ def api_generate():
             'error': 'Kokoro模块未安装'
         }), 500
     
-    if model is None:
+    if manager is None:
         return jsonify({
             'success': False, 
             'error': '模型未初始化'
@@ -156,6 +163,20 @@ def api_generate():
         text = data.get('text', '').strip()
         voice = data.get('voice', 'zf_001')
         language = data.get('language', 'zh')
+        # 输出采样率（如电话链路的8000）和编码，mulaw为G.711 μ-law WAV
+        audio_format = data.get('format', 'wav')
+        try:
+            output_rate = validate_output_rate(data.get('output_rate'))
+        except (TypeError, ValueError) as e:
+            return jsonify({
+                'success': False, 
+                'error': f'输出采样率无效: {str(e)}'
+            }), 400
+        if audio_format not in ('wav', 'mulaw'):
+            return jsonify({
+                'success': False, 
+                'error': '输出格式只支持 wav 或 mulaw'
+            }), 400
         
         if not text:
             return jsonify({
@@ -169,52 +190,354 @@ def api_generate():
                 'error': f'文本长度不能超过{MAX_TEXT_LENGTH}字符'
             }), 400
         
-        # 生成语音
-        start_time = time.time()
+        # 语速倍率，或目标时长（秒，配音对齐时间槽时使用，优先于speed）
+        try:
+            speed, target_duration = parse_speed_params(data)
+        except ValueError as e:
+            return jsonify({
+                'success': False, 
+                'error': f'语速或目标时长无效: {str(e)}'
+            }), 400
         
-        if language == 'zh' or voice.startswith(('zf_', 'zm_')):
-            # 中文生成
-            generator = zh_pipeline(text, voice=voice, speed=speed_callable)
-            result = next(generator)
-            wav = result.audio
-        else:
-            # 英文生成
-            british = voice.startswith('bf_')
-            generator = en_pipelines[british](text, voice=voice)
-            result = next(generator)
-            wav = result.audio
+        # 混合音色，如 zf_001:0.6,zf_004:0.4
+        if is_voice_mix(voice):
+            try:
+                parse_voice_mix(voice)
+            except ValueError as e:
+                return jsonify({
+                    'success': False, 
+                    'error': str(e)
+                }), 400
         
-        generation_time = time.time() - start_time
+        # 生成语音，客户端提供request_id时可中途取消
+        request_id = data.get('request_id')
+        cancel_token = CancellationToken()
+        if request_id:
+            with active_requests_lock:
+                active_requests[request_id] = cancel_token
+        try:
+            # timestamps为true时保证返回由时长预测得到的分段/单词/音素时间
+            result = manager.generate_speech(text, 'kokoro', output_rate=output_rate,
+                                             postprocess=data.get('postprocess'),
+                                             timestamps=bool(data.get('timestamps', False)),
+                                             voice=voice, language=language, speed=speed,
+                                             target_duration=target_duration,
+                                             priority='interactive', cancel_token=cancel_token)
+        finally:
+            if request_id:
+                with active_requests_lock:
+                    active_requests.pop(request_id, None)
+        wav = result.audio
+        sample_rate = result.sample_rate
+        subtype = 'ULAW' if audio_format == 'mulaw' else None
+        generation_time = result.generation_time
         
         # 保存音频文件
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')[:-3]
-        filename = f'tts_{voice}_{timestamp}.wav'
+        # 混合音色如 zf_001:0.6,zf_004:0.4 不能直接用作文件名
+        voice_label = voice.replace(':', '-').replace(',', '+').replace(' ', '')
+        filename = f'tts_{voice_label}_{timestamp}.wav'
         filepath = OUTPUT_DIR / filename
         
-        sf.write(filepath, wav, SAMPLE_RATE)
+        sf.write(filepath, wav, sample_rate, subtype=subtype)
         
         # 转换为base64用于前端播放
         audio_buffer = io.BytesIO()
-        sf.write(audio_buffer, wav, SAMPLE_RATE, format='wav')
+        sf.write(audio_buffer, wav, sample_rate, format='wav', subtype=subtype)
         audio_base64 = base64.b64encode(audio_buffer.getvalue()).decode('utf-8')
         
-        return jsonify({
+        response = {
             'success': True,
             'audio_data': f'data:audio/wav;base64,{audio_base64}',
             'filename': filename,
             'generation_time': round(generation_time, 3),
-            'audio_length': round(len(wav) / SAMPLE_RATE, 2),
-            'sample_rate': SAMPLE_RATE,
+            'audio_length': round(len(wav) / sample_rate, 2),
+            'sample_rate': sample_rate,
+            'format': audio_format,
             'voice': voice,
             'text_length': len(text)
-        })
+        }
+        if result.target_met is not None:
+            # 目标时长超出语速范围时为False，audio_length是实际可达的时长
+            response['target_met'] = result.target_met
+        if result.timestamps is not None:
+            response['timestamps'] = timestamps_to_dict(result.timestamps)
+        return jsonify(response)
         
+    except SynthesisCancelled:
+        return jsonify({
+            'success': False, 
+            'error': '请求已取消'
+        }), 499
+    except MemoryBudgetExceeded as e:
+        return jsonify({
+            'success': False, 
+            'error': f'服务繁忙，请稍后重试: {str(e)}'
+        }), 503
     except Exception as e:
         return jsonify({
             'success': False, 
             'error': f'生成失败: {str(e)}'
         }), 500
 
+@app.route('/api/cancel', methods=['POST'])
+def api_cancel():
+    """API: 取消进行中的生成请求"""
+    data = request.get_json() or {}
+    with active_requests_lock:
+        cancel_token = active_requests.get(data.get('request_id'))
+    if cancel_token is None:
+        return jsonify({'success': False, 'error': '请求不存在或已完成'}), 404
+    cancel_token.cancel()
+    return jsonify({'success': True})
+
+def run_batch_job(job_id, items, cancel_token):
+    """在后台线程中以bulk优先级逐条合成，写入 output/batch_<job_id>/"""
+    job = batch_jobs[job_id]
+    job_dir = OUTPUT_DIR / f'batch_{job_id}'
+    job_dir.mkdir(exist_ok=True)
+    
+    def render(index, item):
+        params = {k: v for k, v in item.items() if k in ('voice', 'language', 'speed', 'target_duration')}
+        result = manager.generate_speech(item['text'], 'kokoro', output_rate=item.get('output_rate'),
+                                         postprocess=item.get('postprocess'), priority='bulk',
+                                         cancel_token=cancel_token, **params)
+        filename = f'{index:05d}.wav'
+        sf.write(job_dir / filename, result.audio, result.sample_rate)
+        return filename, result
+    
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=BATCH_WORKERS) as executor:
+        futures = [executor.submit(render, i, item) for i, item in enumerate(items)]
+        for i, future in enumerate(futures):
+            try:
+                filename, result = future.result()
+                with batch_jobs_lock:
+                    job['files'][i] = filename
+                    job['done'] += 1
+                    if result.target_met is False:
+                        # 目标时长超出语速范围，记录实际可达的时长
+                        job['missed_targets'].append({'index': i, 'target_duration': items[i]['target_duration'],
+                                                      'audio_length': round(result.audio_length, 3)})
+            except SynthesisCancelled:
+                with batch_jobs_lock:
+                    job['status'] = 'cancelled'
+            except Exception as e:
+                with batch_jobs_lock:
+                    job['failed'] += 1
+                    job['errors'].append({'index': i, 'error': str(e)})
+    with batch_jobs_lock:
+        if job['status'] == 'running':
+            job['status'] = 'completed'
+        job['finished_at'] = datetime.now().isoformat(timespec='seconds')
+        job['expires_at'] = time.time() + BATCH_JOB_TTL
+    with active_requests_lock:
+        active_requests.pop(job_id, None)
+
+def expire_batch_jobs():
+    """移除结束超过BATCH_JOB_TTL的任务，须持有batch_jobs_lock调用"""
+    now = time.time()
+    for job_id in [job_id for job_id, job in batch_jobs.items()
+                   if job.get('expires_at') is not None and job['expires_at'] <= now]:
+        del batch_jobs[job_id]
+
+@app.route('/api/batch', methods=['POST'])
+def api_batch():
+    """
+    API: 提交批量合成任务
+    
+    请求: {"items": [{"text": ..., "voice": ..., "language": ..., "output_rate": ...}, ...]}
+    立即返回job_id，任务在本进程中以bulk优先级执行，不挤占Web请求的interactive通道；
+    用 GET /api/batch/<job_id> 查询进度，用 /api/cancel 取消（request_id 即 job_id）
+    """
+    if manager is None:
+        return jsonify({'success': False, 'error': '模型未初始化'}), 500
+    data = request.get_json() or {}
+    items = data.get('items')
+    if not isinstance(items, list) or not items:
+        return jsonify({'success': False, 'error': 'items必须是非空列表'}), 400
+    if len(items) > MAX_BATCH_ITEMS:
+        return jsonify({'success': False, 'error': f'单个任务最多{MAX_BATCH_ITEMS}条'}), 400
+    for i, item in enumerate(items):
+        text = item.get('text', '').strip() if isinstance(item, dict) else ''
+        if not text or len(text) > MAX_TEXT_LENGTH:
+            return jsonify({'success': False,
+                            'error': f'第{i}条文本为空或超过{MAX_TEXT_LENGTH}字符'}), 400
+        item['text'] = text
+        try:
+            item['output_rate'] = validate_output_rate(item.get('output_rate'))
+        except (TypeError, ValueError) as e:
+            return jsonify({'success': False, 'error': f'第{i}条输出采样率无效: {str(e)}'}), 400
+        try:
+            item['speed'], item['target_duration'] = parse_speed_params(item)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': f'第{i}条语速或目标时长无效: {str(e)}'}), 400
+        voice = item.get('voice', 'zf_001')
+        if not isinstance(voice, str):
+            return jsonify({'success': False, 'error': f'第{i}条音色无效'}), 400
+        if is_voice_mix(voice):
+            try:
+                parse_voice_mix(voice)
+            except ValueError as e:
+                return jsonify({'success': False, 'error': f'第{i}条{str(e)}'}), 400
+    
+    job_id = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+    cancel_token = CancellationToken()
+    with batch_jobs_lock:
+        expire_batch_jobs()
+        batch_jobs[job_id] = {'status': 'running', 'total': len(items), 'done': 0, 'failed': 0,
+                              'files': [None] * len(items), 'errors': [], 'missed_targets': [],
+                              'created_at': datetime.now().isoformat(timespec='seconds')}
+    with active_requests_lock:
+        active_requests[job_id] = cancel_token
+    threading.Thread(target=run_batch_job, args=(job_id, items, cancel_token),
+                     name=f'batch-{job_id}', daemon=True).start()
+    return jsonify({'success': True, 'job_id': job_id}), 202
+
+@app.route('/api/batch/<job_id>')
+def api_batch_status(job_id):
+    """API: 查询批量任务进度，files[i] 为第i条的文件名（位于 output/batch_<job_id>/）"""
+    with batch_jobs_lock:
+        expire_batch_jobs()
+        job = batch_jobs.get(job_id)
+        if job is None:
+            return jsonify({'success': False, 'error': '任务不存在'}), 404
+        return jsonify(dict(job, success=True, job_id=job_id))
+
+def ws_stream(ws):
+    """
+    WebSocket: 增量文本输入、逐段音频输出
+    
+    客户端 -> 服务端 (JSON文本消息):
+        {"type": "config", "voice": "zf_001", "language": "zh",
+         "output_rate": 8000, "format": "pcm_s16le" | "mulaw" | "pcm_f32", "timestamps": true}
+        {"type": "text", "text": "文本片段"}   缓冲到句末/从句标点后立即合成
+        {"type": "flush"}                      合成缓冲中剩余的文本
+        {"type": "cancel"}                     丢弃缓冲和尚未播放完的合成
+    服务端 -> 客户端:
+        {"type": "segment", "index": n, "text": ...} 之后跟若干二进制帧
+        (默认24kHz 单声道 16位小端PCM，可由config修改)，{"type": "segment_end", "index": n}，
+        开启timestamps时音频帧前有 {"type": "timestamps", "index": n, "timestamps": {...}}，
+        时间为相对该分段开头的秒数；以及 flushed / cancelled / error 事件
+    """
+    if manager is None:
+        ws.send(json.dumps({'type': 'error', 'error': '模型未初始化'}))
+        return
+    
+    settings = {'voice': 'zf_001', 'language': 'zh', 'output_rate': None, 'format': 'pcm_s16le',
+                'timestamps': False}
+    text_buffer = IncrementalTextBuffer()
+    jobs = queue.Queue()
+    send_lock = threading.Lock()
+    state = {'token': CancellationToken(), 'index': 0}
+    
+    def send(message):
+        with send_lock:
+            ws.send(message if isinstance(message, bytes) else json.dumps(message, ensure_ascii=False))
+    
+    def enqueue(text):
+        jobs.put(('segment', text, state['index'], dict(settings), state['token']))
+        state['index'] += 1
+    
+    def synthesize_worker():
+        # 单独的合成线程，接收线程可以随时处理cancel消息
+        while True:
+            job = jobs.get()
+            if job is None:
+                return
+            kind, text, index, params, cancel_token = job
+            audio_format = params.pop('format') if params else None
+            with_timestamps = params.pop('timestamps') if params else False
+            if cancel_token.cancelled:
+                continue
+            if kind == 'flush':
+                send({'type': 'flushed'})
+                continue
+            try:
+                send({'type': 'segment', 'index': index, 'text': text})
+                params.update(priority='interactive', cancel_token=cancel_token)
+                if with_timestamps:
+                    chunks = manager.stream_speech_timed(text, 'kokoro', **params)
+                else:
+                    chunks = manager.stream_speech(text, 'kokoro', **params)
+                try:
+                    for item in chunks:
+                        chunk, timestamps = item if with_timestamps else (item, None)
+                        if cancel_token.cancelled:
+                            break
+                        if timestamps:
+                            send({'type': 'timestamps', 'index': index,
+                                  'timestamps': timestamps_to_dict(timestamps)})
+                        if len(chunk):
+                            send(encode_audio(chunk, audio_format))
+                finally:
+                    # 取消或出错时立即关闭生成器，释放引擎副本和优先级通道名额
+                    chunks.close()
+                send({'type': 'segment_end', 'index': index})
+            except SynthesisCancelled:
+                continue
+            except Exception as e:
+                send({'type': 'error', 'index': index, 'error': f'生成失败: {str(e)}'})
+    
+    worker = threading.Thread(target=synthesize_worker, daemon=True)
+    worker.start()
+    try:
+        while True:
+            raw = ws.receive()
+            if raw is None:
+                break
+            try:
+                message = json.loads(raw)
+            except (TypeError, ValueError):
+                send({'type': 'error', 'error': '消息必须是JSON'})
+                continue
+            
+            kind = message.get('type')
+            if kind == 'config':
+                voice = message.get('voice', settings['voice'])
+                if is_voice_mix(voice):
+                    try:
+                        parse_voice_mix(voice)
+                    except ValueError as e:
+                        send({'type': 'error', 'error': str(e)})
+                        continue
+                try:
+                    output_rate = validate_output_rate(message.get('output_rate', settings['output_rate']))
+                except (TypeError, ValueError) as e:
+                    send({'type': 'error', 'error': f'输出采样率无效: {str(e)}'})
+                    continue
+                audio_format = message.get('format', settings['format'])
+                if audio_format not in OUTPUT_FORMATS:
+                    send({'type': 'error', 'error': f'输出格式只支持 {", ".join(OUTPUT_FORMATS)}'})
+                    continue
+                settings['voice'] = voice
+                settings['language'] = message.get('language', settings['language'])
+                settings['output_rate'] = output_rate
+                settings['format'] = audio_format
+                settings['timestamps'] = bool(message.get('timestamps', settings['timestamps']))
+            elif kind == 'text':
+                for text in text_buffer.push(message.get('text', '')):
+                    enqueue(text)
+            elif kind == 'flush':
+                text = text_buffer.flush()
+                if text:
+                    enqueue(text)
+                jobs.put(('flush', None, None, None, state['token']))
+            elif kind == 'cancel':
+                text_buffer.clear()
+                state['token'].cancel()
+                state['token'] = CancellationToken()
+                send({'type': 'cancelled'})
+            else:
+                send({'type': 'error', 'error': f'未知的消息类型: {kind}'})
+    finally:
+        # 连接断开: 取消尚未完成的合成，释放工作线程
+        state['token'].cancel()
+        jobs.put(None)
+
+if sock is not None:
+    sock.route('/ws/stream')(ws_stream)
+
 @app.route('/api/download/<filename>')
 def api_download(filename):
     """API: 下载生成的音频文件"""
@@ -232,7 +555,8 @@ def api_status():
     
     return jsonify({
         'kokoro_available': KOKORO_AVAILABLE,
-        'model_loaded': model is not None,
+        'model_loaded': manager is not None,
+        'websocket_available': WEBSOCKET_AVAILABLE,
         'device': device,
         'total_voices': total_voices,
         'voices_by_category': {k: len(v) for k, v in voices.items()},
@@ -241,10 +565,15 @@ def api_status():
     })
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Kokoro TTS 本地测试应用')
+    parser.add_argument('--prerendered', help='预渲染音频库目录（由 unified_tts_app.py --precompute 生成）')
+    args = parser.parse_args()
+    
     print("🎵 Kokoro TTS 中文版 - 本地测试应用")
     print("=" * 50)
     
-    # 检查声音库
+    # 检查声音库，启动时完整扫描一次
+    voice_catalog.scan()
     voices = get_available_voices()
     total_voices = sum(len(v) for v in voices.values())
     print(f"📊 发现音色: {total_voices} 个")
@@ -259,8 +588,19 @@ if __name__ == '__main__':
         else:
             print("❌ 模型初始化失败")
     
+    # 内存映射预渲染音频库，命中的提示语直接返回
+    if args.prerendered:
+        if manager is not None:
+            manager.load_prerendered_store(args.prerendered)
+        else:
+            print("⚠️  模型未初始化，忽略预渲染音频库")
+    
     print(f"\n🌐 启动Web服务器...")
     print(f"📱 访问地址: http://localhost:5001")
+    if WEBSOCKET_AVAILABLE:
+        print(f"🔌 流式接口: ws://localhost:5001/ws/stream")
+    else:
+        print("⚠️  未安装flask-sock，WebSocket流式接口不可用")
     print("=" * 50)
     
     app.run(debug=True, host='0.0.0.0', port=5001)
\ No newline at end of file
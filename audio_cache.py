@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+音频缓存
+预渲染音频库：把已知的高频提示语一次性合成后写入一个连续的float32数据文件，
+配合索引文件在启动时内存映射，命中的请求无需任何合成；
+合成结果缓存：可插拔的缓存后端，磁盘后端按内容寻址存放在共享目录中，
+多个worker进程乃至多台主机（共享存储）之间都能复用
+"""
+
+import os
+import json
+import time
+import struct
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows没有fcntl，淘汰时退化为不加锁
+    fcntl = None
+
+DATA_FILE = 'audio.f32'
+INDEX_FILE = 'index.json'
+
+# 不影响引擎原生音频的参数（调度参数和输出格式），不参与缓存键计算；
+# 缓存和预渲染库中只存原生音频，输出格式在取出后再处理
+NON_AUDIO_PARAMS = {'priority', 'max_wait', 'deadline', 'cancel_token',
+                    'output_rate', 'postprocess', 'timestamps', 'format'}
+
+
+def make_cache_key(engine: str, text: str, params: Optional[Dict[str, Any]] = None) -> str:
+    """由 (引擎, 文本, 音色及其他参数) 计算内容寻址的缓存键"""
+    params = {k: v for k, v in (params or {}).items()
+              if k not in NON_AUDIO_PARAMS and v is not None}
+    payload = json.dumps([engine, text.strip(), params], ensure_ascii=False,
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _write_json_atomic(path: Path, data: Any):
+    """先写临时文件再rename，读者不会看到写了一半的索引"""
+    tmp_path = path.with_name(f'.{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+class PrerenderedAudioStore:
+    """
+    只读的预渲染音频库
+
+    目录结构:
+        audio.f32   所有片段首尾相接的float32采样
+        index.json  缓存键 -> {offset, length, sample_rate, ...}
+    """
+
+    def __init__(self, path: str, use_mmap: bool = True):
+        self.path = Path(path)
+        with open(self.path / INDEX_FILE, 'r', encoding='utf-8') as f:
+            self.index: Dict[str, Dict[str, Any]] = json.load(f)
+
+        data_path = self.path / DATA_FILE
+        if not self.index or data_path.stat().st_size == 0:
+            self.data = np.zeros(0, dtype=np.float32)
+        elif use_mmap:
+            # 只映射不读取，页面按需由操作系统换入，多个worker进程共享页缓存
+            self.data = np.memmap(data_path, dtype=np.float32, mode='r')
+        else:
+            self.data = np.fromfile(data_path, dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.index
+
+    def get(self, key: str) -> Optional[Tuple[np.ndarray, Dict[str, Any]]]:
+        """返回 (音频视图, 元数据)，音频是数据文件的零拷贝切片"""
+        entry = self.index.get(key)
+        if entry is None:
+            return None
+        offset, length = entry['offset'], entry['length']
+        return self.data[offset:offset + length], entry
+
+
+class PrerenderedStoreWriter:
+    """
+    预渲染音频库写入器，可被多个合成线程并发调用
+
+    已存在的库会被追加，已有的键会被跳过
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        index_path = self.path / INDEX_FILE
+        self.index: Dict[str, Dict[str, Any]] = {}
+        if index_path.exists():
+            with open(index_path, 'r', encoding='utf-8') as f:
+                self.index = json.load(f)
+        self._data = open(self.path / DATA_FILE, 'ab')
+        # 以实际文件大小为准，丢弃上次中断时未进入索引的尾部数据也不影响读取
+        self._offset = self._data.tell() // np.dtype(np.float32).itemsize
+        self._lock = threading.Lock()
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self.index
+
+    def add(self, key: str, audio: np.ndarray, sample_rate: int, **metadata):
+        """追加一段音频"""
+        samples = np.ascontiguousarray(audio, dtype=np.float32)
+        with self._lock:
+            if key in self.index:
+                return
+            self._data.write(samples.tobytes())
+            self.index[key] = dict(metadata, offset=self._offset, length=len(samples),
+                                   sample_rate=sample_rate)
+            self._offset += len(samples)
+
+    def flush(self):
+        """落盘数据并原子地更新索引"""
+        with self._lock:
+            self._data.flush()
+            os.fsync(self._data.fileno())
+            _write_json_atomic(self.path / INDEX_FILE, self.index)
+
+    def close(self):
+        """落盘并关闭"""
+        self.flush()
+        self._data.close()
+
+    def __enter__(self) -> 'PrerenderedStoreWriter':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load_manifest(path: str, default_voice: Optional[str] = None) -> Iterable[Dict[str, Any]]:
+    """
+    读取提示语清单
+
+    .jsonl: 每行一个对象 {"text": ..., "voice": ..., "engine": ..., 其他引擎参数}
+    其他:   每行一条文本，使用默认音色
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if str(path).endswith('.jsonl'):
+                try:
+                    item = json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"清单第{line_no}行格式错误: {str(e)}")
+            else:
+                item = {'text': line}
+            if default_voice and 'voice' not in item:
+                item['voice'] = default_voice
+            yield item
+
+
+class AudioCacheBackend(ABC):
+    """合成结果缓存后端接口，键为 make_cache_key 的结果"""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Tuple[np.ndarray, int]]:
+        """返回 (音频, 采样率)，未命中返回None"""
+        pass
+
+    @abstractmethod
+    def put(self, key: str, audio: np.ndarray, sample_rate: int):
+        """写入一段音频"""
+        pass
+
+    @abstractmethod
+    def get_stats(self) -> Dict[str, Any]:
+        """缓存统计"""
+        pass
+
+    @abstractmethod
+    def clear(self):
+        """清空缓存"""
+        pass
+
+
+class MemoryAudioCache(AudioCacheBackend):
+    """
+    进程内LRU缓存
+
+    作为键值存储（如Redis）后端的替身，接口与磁盘后端一致
+    """
+
+    def __init__(self, max_size_mb: float = 256.0):
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+        self._entries: 'OrderedDict[str, Tuple[np.ndarray, int]]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0}
+
+    def get(self, key: str) -> Optional[Tuple[np.ndarray, int]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry
+
+    def put(self, key: str, audio: np.ndarray, sample_rate: int):
+        samples = np.ascontiguousarray(audio, dtype=np.float32)
+        samples.setflags(write=False)
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = (samples, sample_rate)
+            self._bytes += samples.nbytes
+            self._stats['writes'] += 1
+            # 至少保留刚写入的条目
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self._stats['evictions'] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(backend='memory', entries=len(self._entries),
+                         size_mb=self._bytes / (1024 * 1024))
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+class DiskAudioCache(AudioCacheBackend):
+    """
+    内容寻址的磁盘缓存，可被多个进程/主机共享
+
+    - 文件按键的前缀分片存放: <root>/ab/cd/<key>.f32，避免单目录文件过多
+    - 写入先落到同目录的临时文件再rename，读者只会看到完整的文件
+    - 命中时更新文件mtime作为访问时间，超过容量时按mtime从旧到新淘汰；
+      淘汰由持有锁文件的一个进程执行，其余进程跳过
+    """
+
+    SUFFIX = '.f32'
+    HEADER = struct.Struct('<I')  # 采样率
+    MAX_SAMPLE_RATE = 768000
+    LOCK_FILE = '.evict.lock'
+
+    def __init__(self, path: str, max_size_mb: float = 1024.0, shard_depth: int = 2,
+                 touch_interval: float = 60.0, low_watermark: float = 0.9):
+        """
+        Args:
+            path: 缓存根目录
+            max_size_mb: 容量上限
+            shard_depth: 分片目录层数，每层取键的2个十六进制字符
+            touch_interval: 命中时更新访问时间的最小间隔（秒），减少元数据写入
+            low_watermark: 淘汰到容量上限的该比例为止
+        """
+        self.root = Path(path)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+        self.shard_depth = shard_depth
+        self.touch_interval = touch_interval
+        self.low_watermark = low_watermark
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0, 'corrupt': 0}
+        # 只是本进程的估计值，其他进程的写入在下次淘汰扫描时计入
+        self._approx_bytes = sum(size for _, _, size in self._scan())
+
+    def _path_for(self, key: str) -> Path:
+        shards = [key[i * 2:i * 2 + 2] for i in range(self.shard_depth)]
+        return self.root.joinpath(*shards, key + self.SUFFIX)
+
+    def get(self, key: str) -> Optional[Tuple[np.ndarray, int]]:
+        path = self._path_for(key)
+        try:
+            with open(path, 'rb') as f:
+                (sample_rate,) = self.HEADER.unpack(f.read(self.HEADER.size))
+                body = bytearray(f.read())
+            if not 0 < sample_rate <= self.MAX_SAMPLE_RATE or len(body) % 4:
+                # 损坏或截断的条目按未命中处理并删除，之后重新合成写入
+                raise ValueError(f'缓存条目损坏: {path.name}')
+            audio = np.frombuffer(body, dtype=np.float32)
+            if time.time() - path.stat().st_mtime > self.touch_interval:
+                os.utime(path)
+        except FileNotFoundError:
+            # 不存在，或者刚好被其他进程淘汰
+            with self._lock:
+                self._stats['misses'] += 1
+            return None
+        except (struct.error, ValueError):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            with self._lock:
+                self._stats['misses'] += 1
+                self._stats['corrupt'] += 1
+            return None
+        with self._lock:
+            self._stats['hits'] += 1
+        return audio, sample_rate
+
+    def put(self, key: str, audio: np.ndarray, sample_rate: int):
+        path = self._path_for(key)
+        if path.exists():
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        samples = np.ascontiguousarray(audio, dtype=np.float32)
+        tmp_path = path.with_name(f'.{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(self.HEADER.pack(sample_rate))
+                f.write(samples.tobytes())
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️  写入音频缓存失败: {str(e)}")
+            if tmp_path.exists():
+                tmp_path.unlink()
+            return
+
+        with self._lock:
+            self._stats['writes'] += 1
+            self._approx_bytes += self.HEADER.size + samples.nbytes
+            over_limit = self._approx_bytes > self.max_bytes
+        if over_limit:
+            self.evict()
+
+    def _scan(self) -> List[Tuple[float, Path, int]]:
+        """列出所有缓存文件 (mtime, 路径, 大小)"""
+        entries = []
+        for path in self.root.rglob('*' + self.SUFFIX):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, path, stat.st_size))
+        return entries
+
+    def evict(self) -> int:
+        """按访问时间淘汰到低水位，返回淘汰的文件数"""
+        with open(self.root / self.LOCK_FILE, 'a') as lock_file:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return 0  # 其他进程正在淘汰
+
+            entries = sorted(self._scan())
+            total = sum(size for _, _, size in entries)
+            target = self.max_bytes * self.low_watermark
+            evicted = 0
+            for _, path, size in entries:
+                if total <= target:
+                    break
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+                total -= size
+                evicted += 1
+
+        with self._lock:
+            self._approx_bytes = total
+            self._stats['evictions'] += evicted
+        return evicted
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(backend='disk', path=str(self.root),
+                         size_mb=self._approx_bytes / (1024 * 1024))
+        return stats
+
+    def clear(self):
+        for _, path, _ in self._scan():
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self._approx_bytes = 0
+
+
+AUDIO_CACHE_BACKENDS = {
+    'disk': DiskAudioCache,
+    'memory': MemoryAudioCache,
+}
+
+
+def create_audio_cache(config: Dict[str, Any]) -> AudioCacheBackend:
+    """按配置创建缓存后端"""
+    backend = config.get('backend', 'disk')
+    if backend == 'disk':
+        return DiskAudioCache(
+            path=config.get('path', './audio_cache'),
+            max_size_mb=config.get('max_size_mb', 1024.0),
+            shard_depth=config.get('shard_depth', 2),
+            touch_interval=config.get('touch_interval', 60.0)
+        )
+    if backend == 'memory':
+        return MemoryAudioCache(max_size_mb=config.get('max_size_mb', 256.0))
+    raise ValueError(f"未知的音频缓存后端: {backend}，可选: {', '.join(AUDIO_CACHE_BACKENDS)}")
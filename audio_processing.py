@@ -0,0 +1,555 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+音频输出处理
+多相重采样：滤波器核按 (源采样率, 目标采样率) 预计算并缓存，支持逐块流式处理且块边界无伪影；
+G.711 μ-law 编码，用于8kHz电话链路；
+后处理：基于帧能量的首尾静音裁剪、门限RMS响度归一化和峰值限幅，
+可对一批片段整体向量化处理，也可逐块处理流式输出
+"""
+
+import math
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+OUTPUT_FORMATS = ('pcm_f32', 'pcm_s16le', 'mulaw')
+
+# 滤波器设计参数：每侧的过零点数、相对截止频率和Kaiser窗参数
+RESAMPLE_ZERO_CROSSINGS = 16
+RESAMPLE_ROLLOFF = 0.945
+RESAMPLE_KAISER_BETA = 8.6
+
+# 每次向量化计算的输出样本数上限，限制 [N, taps] 索引矩阵的内存
+_BLOCK_SIZE = 1 << 15
+
+
+@dataclass(frozen=True)
+class ResampleKernel:
+    """
+    多相滤波器核
+
+    输出样本n对应上采样域的时刻 t = n*down，记 t = q*up + p，则
+    y[n] = sum_k taps[p, k] * x[q + offsets[p] + k]
+    """
+    up: int
+    down: int
+    taps: np.ndarray       # [up, K]
+    offsets: np.ndarray    # [up]
+
+
+@lru_cache(maxsize=32)
+def get_resample_kernel(src_rate: int, dst_rate: int) -> ResampleKernel:
+    """计算并缓存 src_rate -> dst_rate 的多相滤波器核"""
+    g = math.gcd(src_rate, dst_rate)
+    up, down = dst_rate // g, src_rate // g
+
+    # 在上采样域设计窗函数sinc低通，截止频率取两侧奈奎斯特频率中较低者
+    cutoff = 0.5 / max(up, down) * RESAMPLE_ROLLOFF
+    half = int(math.ceil(RESAMPLE_ZERO_CROSSINGS / (2 * cutoff)))
+
+    phases = np.arange(up)
+    offsets = -((half - phases) // up)   # ceil((p - half) / up)
+    num_taps = (2 * half) // up + 2
+    t = phases[:, None] - (offsets[:, None] + np.arange(num_taps)[None, :]) * up
+    window = np.where(np.abs(t) <= half,
+                      np.i0(RESAMPLE_KAISER_BETA * np.sqrt(np.clip(1 - (t / half) ** 2, 0, None))),
+                      0.0) / np.i0(RESAMPLE_KAISER_BETA)
+    # 乘以up补偿零值插入带来的增益损失
+    taps = (2 * cutoff * up) * np.sinc(2 * cutoff * t) * window
+
+    taps = taps.astype(np.float32)
+    taps.setflags(write=False)
+    offsets.setflags(write=False)
+    return ResampleKernel(up=up, down=down, taps=taps, offsets=offsets)
+
+
+class StreamingResampler:
+    """
+    流式多相重采样器
+
+    每次 process() 只输出所需输入已全部到达的样本，其余留到下一块，
+    因此分块处理与整段处理的结果一致；最后调用 flush() 输出尾部
+    """
+
+    def __init__(self, src_rate: int, dst_rate: int):
+        self.src_rate = src_rate
+        self.dst_rate = dst_rate
+        self.kernel = get_resample_kernel(src_rate, dst_rate)
+        num_taps = self.kernel.taps.shape[1]
+        # 开头补零，使最早的输出样本也能取到完整的窗口
+        self._pad = num_taps
+        self._buffer = np.zeros(self._pad, dtype=np.float32)
+        self._buffer_start = -self._pad   # buffer[0] 对应的输入下标
+        self._total_in = 0
+        self._next_out = 0
+
+    def _first_input(self, n: np.ndarray) -> np.ndarray:
+        t = n * self.kernel.down
+        return t // self.kernel.up + self.kernel.offsets[t % self.kernel.up]
+
+    def _render(self, n_end: int) -> np.ndarray:
+        """输出 [_next_out, n_end) 的样本"""
+        kernel = self.kernel
+        num_taps = kernel.taps.shape[1]
+        blocks = []
+        for start in range(self._next_out, n_end, _BLOCK_SIZE):
+            n = np.arange(start, min(start + _BLOCK_SIZE, n_end), dtype=np.int64)
+            t = n * kernel.down
+            first = t // kernel.up + kernel.offsets[t % kernel.up] - self._buffer_start
+            windows = self._buffer[first[:, None] + np.arange(num_taps)[None, :]]
+            blocks.append(np.einsum('nk,nk->n', windows, kernel.taps[t % kernel.up]))
+        self._next_out = n_end
+        return np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.float32)
+
+    def _trim_buffer(self):
+        """丢弃后续输出不再需要的历史输入"""
+        keep_from = int(self._first_input(np.array([self._next_out]))[0])
+        drop = max(0, keep_from - self._buffer_start)
+        if drop:
+            self._buffer = self._buffer[drop:]
+            self._buffer_start += drop
+
+    def process(self, chunk: np.ndarray) -> np.ndarray:
+        """输入一块音频，返回已可确定的输出样本"""
+        if self.kernel.up == self.kernel.down:
+            return np.asarray(chunk, dtype=np.float32)
+        chunk = np.asarray(chunk, dtype=np.float32).reshape(-1)
+        self._buffer = np.concatenate([self._buffer, chunk])
+        self._total_in += len(chunk)
+
+        # 输出n需要的最后一个输入为 first(n) + K - 1，必须小于已到达的输入数
+        num_taps = self.kernel.taps.shape[1]
+        limit = self._total_in - num_taps   # first(n) 必须 <= limit
+        if limit < 0:
+            return np.zeros(0, dtype=np.float32)
+        # first(n) 随n单调不减，按上采样域时刻估算后向下修正
+        n_end = max(self._next_out, (limit + 1) * self.kernel.up // self.kernel.down + 1)
+        while n_end > self._next_out and self._first_input(np.array([n_end - 1]))[0] > limit:
+            n_end -= 1
+        output = self._render(n_end)
+        self._trim_buffer()
+        return output
+
+    def flush(self) -> np.ndarray:
+        """输入结束，用零补齐尾部并输出剩余样本"""
+        if self.kernel.up == self.kernel.down:
+            return np.zeros(0, dtype=np.float32)
+        n_total = -(-self._total_in * self.kernel.up // self.kernel.down)
+        num_taps = self.kernel.taps.shape[1]
+        self._buffer = np.concatenate([self._buffer, np.zeros(num_taps, dtype=np.float32)])
+        output = self._render(max(self._next_out, n_total))
+        self._trim_buffer()
+        return output
+
+
+def resample(audio: np.ndarray, src_rate: int, dst_rate: int) -> np.ndarray:
+    """整段重采样，输出长度为 ceil(len * dst / src)"""
+    if src_rate == dst_rate:
+        return np.asarray(audio, dtype=np.float32)
+    resampler = StreamingResampler(src_rate, dst_rate)
+    return np.concatenate([resampler.process(audio), resampler.flush()])
+
+
+def encode_mulaw(audio: np.ndarray) -> np.ndarray:
+    """float32 [-1, 1] -> G.711 μ-law 字节 (uint8)"""
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int32)
+    sign = np.where(pcm < 0, 0x80, 0)
+    magnitude = np.minimum(np.abs(pcm), 32635) + 0x84
+    # magnitude 在 [132, 32767]，最高位位置减7即为段号
+    exponent = np.frexp(magnitude)[1] - 8
+    mantissa = (magnitude >> (exponent + 3)) & 0x0F
+    return (~(sign | (exponent << 4) | mantissa) & 0xFF).astype(np.uint8)
+
+
+def decode_mulaw(data: np.ndarray) -> np.ndarray:
+    """G.711 μ-law 字节 -> float32"""
+    data = ~np.asarray(data, dtype=np.uint8).astype(np.int32) & 0xFF
+    exponent = (data >> 4) & 0x07
+    magnitude = (((data & 0x0F) << 3) + 0x84) << exponent
+    pcm = np.where(data & 0x80, 0x84 - magnitude, magnitude - 0x84)
+    return (pcm / 32768.0).astype(np.float32)
+
+
+def encode_audio(audio: np.ndarray, output_format: str = 'pcm_f32') -> bytes:
+    """按输出格式编码为原始字节流"""
+    if output_format == 'pcm_f32':
+        return np.asarray(audio, dtype='<f4').tobytes()
+    if output_format == 'pcm_s16le':
+        return (np.clip(audio, -1.0, 1.0) * 32767).astype('<i2').tobytes()
+    if output_format == 'mulaw':
+        return encode_mulaw(audio).tobytes()
+    raise ValueError(f"未知的输出格式: {output_format}，可选: {', '.join(OUTPUT_FORMATS)}")
+
+
+def validate_output_rate(rate: Optional[int]) -> Optional[int]:
+    """校验输出采样率参数"""
+    if rate is None:
+        return None
+    rate = int(rate)
+    if not 4000 <= rate <= 192000:
+        raise ValueError(f"输出采样率超出范围: {rate}")
+    return rate
+
+
+def _frame_batch(clips: Sequence[np.ndarray], frame: int) -> Tuple[np.ndarray, np.ndarray, List[int]]:
+    """
+    把一批片段补零到帧长的整数倍后拼接分帧
+
+    Returns:
+        (frames [N, frame], 每帧所属片段下标 [N], 每个片段的帧数)
+    """
+    counts = [-(-len(clip) // frame) for clip in clips]
+    flat = np.zeros(sum(counts) * frame, dtype=np.float32)
+    position = 0
+    for clip, count in zip(clips, counts):
+        flat[position:position + len(clip)] = clip
+        position += count * frame
+    clip_index = np.repeat(np.arange(len(clips)), counts)
+    return flat.reshape(-1, frame), clip_index, counts
+
+
+def _db_to_amplitude(db: float) -> float:
+    return 10.0 ** (db / 20.0)
+
+
+class AudioPostProcessor:
+    """
+    合成结果后处理: 静音裁剪 -> 响度归一化 -> 峰值限幅
+
+    响度按 BS.1770 的门限方式计算（100ms块，-70dB绝对门限和相对-10dB门限），
+    但不做K加权滤波，数值接近LUFS而不等同
+    """
+
+    def __init__(self, sample_rate: int = 24000, trim: bool = True,
+                 trim_threshold_db: float = -45.0, trim_padding_ms: float = 30.0,
+                 normalize: bool = True, target_db: float = -20.0, max_gain_db: float = 20.0,
+                 limit: bool = True, peak_db: float = -1.0):
+        self.sample_rate = sample_rate
+        self.trim = trim
+        self.trim_threshold = _db_to_amplitude(trim_threshold_db)
+        self.trim_frame = max(1, sample_rate // 100)            # 10ms
+        self.trim_padding = int(sample_rate * trim_padding_ms / 1000)
+        self.normalize = normalize
+        self.target_db = target_db
+        self.max_gain_db = max_gain_db
+        self.loudness_block = max(1, sample_rate // 10)         # 100ms
+        self.limit = limit
+        self.peak = _db_to_amplitude(peak_db)
+        self.limiter_block = max(1, sample_rate // 400)         # 2.5ms
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], sample_rate: int = 24000) -> 'AudioPostProcessor':
+        """从配置字典创建后处理器"""
+        return cls(
+            sample_rate=sample_rate,
+            trim=config.get('trim', True),
+            trim_threshold_db=config.get('trim_threshold_db', -45.0),
+            trim_padding_ms=config.get('trim_padding_ms', 30.0),
+            normalize=config.get('normalize', True),
+            target_db=config.get('target_db', -20.0),
+            max_gain_db=config.get('max_gain_db', 20.0),
+            limit=config.get('limit', True),
+            peak_db=config.get('peak_db', -1.0)
+        )
+
+    def trim_bounds(self, clips: Sequence[np.ndarray]) -> List[Tuple[int, int]]:
+        """批量计算每个片段去掉首尾静音后的 [start, end)，全静音时为 (0, 0)"""
+        if not clips:
+            return []
+        frames, _, counts = _frame_batch(clips, self.trim_frame)
+        active = np.sqrt(np.mean(frames ** 2, axis=1)) > self.trim_threshold
+        bounds = []
+        for clip, clip_active in zip(clips, np.split(active, np.cumsum(counts)[:-1])):
+            if not clip_active.any():
+                bounds.append((0, 0))
+                continue
+            first = int(np.argmax(clip_active))
+            last = len(clip_active) - int(np.argmax(clip_active[::-1]))
+            bounds.append((max(0, first * self.trim_frame - self.trim_padding),
+                           min(len(clip), last * self.trim_frame + self.trim_padding)))
+        return bounds
+
+    def loudness_db(self, clips: Sequence[np.ndarray]) -> np.ndarray:
+        """批量计算门限响度 (dB)，无有效内容的片段为 -inf"""
+        frames, clip_index, _ = _frame_batch(clips, self.loudness_block)
+        power = np.mean(frames.astype(np.float64) ** 2, axis=1)
+        num_clips = len(clips)
+
+        def gated_mean(mask):
+            total = np.bincount(clip_index, weights=power * mask, minlength=num_clips)
+            count = np.bincount(clip_index, weights=mask.astype(np.float64), minlength=num_clips)
+            return np.divide(total, count, out=np.zeros(num_clips), where=count > 0)
+
+        gate = power > 10.0 ** (-70.0 / 10.0)
+        relative = gated_mean(gate) * 10.0 ** (-10.0 / 10.0)
+        gate &= power > relative[clip_index]
+        mean_power = gated_mean(gate)
+        with np.errstate(divide='ignore'):
+            return 10.0 * np.log10(mean_power)
+
+    def normalization_gains(self, clips: Sequence[np.ndarray]) -> np.ndarray:
+        """把每个片段调整到目标响度所需的线性增益"""
+        loudness = self.loudness_db(clips)
+        gain_db = np.where(np.isfinite(loudness), self.target_db - loudness, 0.0)
+        return 10.0 ** (np.minimum(gain_db, self.max_gain_db) / 20.0)
+
+    def limit_batch(self, clips: Sequence[np.ndarray]) -> List[np.ndarray]:
+        """
+        批量峰值限幅
+
+        每个2.5ms块的增益取 min(1, 上限/块峰值) 并与同一片段内相邻块取最小，
+        再在块中心之间线性插值，保证任一采样点都不超过上限且增益平滑变化；
+        增益只在片段内部平滑，不会从上一个片段（可能属于另一个请求）延续过来
+        """
+        if not clips:
+            return []
+        frames, clip_index, counts = _frame_batch(clips, self.limiter_block)
+        peaks = np.abs(frames).max(axis=1)
+        gains = np.minimum(1.0, self.peak / np.maximum(peaks, 1e-9))
+        if not np.any(gains < 1.0):
+            return [np.asarray(clip, dtype=np.float32) for clip in clips]
+        same_clip = clip_index[1:] == clip_index[:-1]
+        block_gains = gains.copy()
+        gains[1:] = np.where(same_clip, np.minimum(gains[1:], block_gains[:-1]), gains[1:])
+        gains[:-1] = np.where(same_clip, np.minimum(gains[:-1], block_gains[1:]), gains[:-1])
+
+        limited = []
+        for clip, start, count in zip(clips, np.concatenate([[0], np.cumsum(counts)[:-1]]), counts):
+            start = int(start)
+            centers = (np.arange(count) + 0.5) * self.limiter_block
+            sample_gains = np.interp(np.arange(len(clip)), centers,
+                                     gains[start:start + count]).astype(np.float32)
+            flat = frames[start:start + count].reshape(-1)[:len(clip)]
+            limited.append(np.clip(flat * sample_gains, -self.peak, self.peak))
+        return limited
+
+    def process_batch(self, clips: Sequence[np.ndarray]) -> List[np.ndarray]:
+        """对一批片段整体做 裁剪 -> 归一化 -> 限幅"""
+        return self.process_batch_with_offsets(clips)[0]
+
+    def process_batch_with_offsets(self, clips: Sequence[np.ndarray]) -> Tuple[List[np.ndarray], List[int]]:
+        """同process_batch，另外返回每个片段开头被裁掉的采样点数，用于平移时间戳"""
+        clips = [np.asarray(clip, dtype=np.float32).reshape(-1) for clip in clips]
+        offsets = [0] * len(clips)
+        if self.trim:
+            bounds = self.trim_bounds(clips)
+            clips = [clip[start:end] for clip, (start, end) in zip(clips, bounds)]
+            offsets = [start for start, _ in bounds]
+        if self.normalize and clips:
+            clips = [clip * np.float32(gain) for clip, gain in zip(clips, self.normalization_gains(clips))]
+        if self.limit:
+            clips = self.limit_batch(clips)
+        return clips, offsets
+
+    def process(self, audio: np.ndarray) -> np.ndarray:
+        """处理单个片段"""
+        return self.process_batch([audio])[0]
+
+
+class StreamingPostProcessor:
+    """
+    逐块后处理流式输出
+
+    - 只裁掉整条流开头的静音；块尾的静音先暂存，后面还有语音时再补上，流结束时丢弃
+    - 归一化增益按每块的响度估计，块首在一个短窗口内从上一块的增益线性过渡到本块增益，
+      避免音量跳变；变响时过渡段的起始增益不超过不触发限幅的值，安静块之后的响亮块不会被压扁
+    - 增益和暂存状态只属于一条流，每个请求新建一个实例，不要跨请求复用
+    """
+
+    def __init__(self, processor: AudioPostProcessor, ramp_ms: float = 10.0):
+        self.processor = processor
+        # 增益过渡窗口，与AudioAssembler的交叉淡化同一量级
+        self.ramp = max(1, int(round(processor.sample_rate * ramp_ms / 1000)))
+        # 流开头被裁掉的采样点数，之后的输出整体提前这么多
+        self.trimmed_head = 0
+        self._started = False
+        self._held = np.zeros(0, dtype=np.float32)
+        self._gain: Optional[float] = None
+
+    def process(self, chunk: np.ndarray) -> np.ndarray:
+        processor = self.processor
+        chunk = np.asarray(chunk, dtype=np.float32).reshape(-1)
+        if processor.trim:
+            start, end = processor.trim_bounds([chunk])[0]
+            if end == 0:
+                # 整块静音：开头直接丢弃，中间暂存
+                if self._started:
+                    self._held = np.concatenate([self._held, chunk])
+                else:
+                    self.trimmed_head += len(chunk)
+                return np.zeros(0, dtype=np.float32)
+            if self._started:
+                start = 0
+            else:
+                self.trimmed_head += start
+            output = np.concatenate([self._held, chunk[start:end]])
+            self._held = chunk[end:]
+            self._started = True
+        else:
+            output = chunk
+
+        if processor.normalize and len(output):
+            target = float(processor.normalization_gains([output])[0])
+            previous = target if self._gain is None else self._gain
+            ramp = min(self.ramp, len(output))
+            if previous > target:
+                ramp_peak = float(np.abs(output[:ramp]).max())
+                previous = max(target, min(previous, processor.peak / max(ramp_peak, 1e-9)))
+            gains = np.full(len(output), target, dtype=np.float32)
+            gains[:ramp] = np.linspace(previous, target, ramp, dtype=np.float32)
+            output = output * gains
+            self._gain = target
+        if processor.limit and len(output):
+            output = processor.limit_batch([output])[0]
+        return output
+
+    def flush(self) -> np.ndarray:
+        """流结束，丢弃暂存的尾部静音"""
+        self._held = np.zeros(0, dtype=np.float32)
+        return np.zeros(0, dtype=np.float32)
+
+
+class AudioAssembler:
+    """
+    长文本音频拼接器
+
+    片段直接写入按倍数增长的预分配缓冲，或者边拼接边写入WAV/FLAC文件，
+    不再为每个句子和整篇各做一次concatenate；句间/段间插入可配置的停顿，
+    无停顿衔接处做短交叉淡化以消除接缝处的爆音
+    """
+
+    def __init__(self, sample_rate: int = 24000, sentence_pause_ms: float = 0.0,
+                 paragraph_pause_ms: float = 200.0, crossfade_ms: float = 5.0,
+                 output_path: Optional[str] = None, expected_seconds: float = 60.0,
+                 subtype: Optional[str] = None):
+        """
+        Args:
+            sentence_pause_ms: 同一段落内句子之间的停顿
+            paragraph_pause_ms: 段落之间的停顿
+            crossfade_ms: 无停顿衔接时的交叉淡化时长
+            output_path: 指定时流式写入该文件（按后缀选择WAV/FLAC），不在内存中保留整篇音频
+            expected_seconds: 内存模式下预分配的时长，不足时按倍数扩容
+            subtype: 文件模式的采样格式，如 'PCM_16'，默认由soundfile决定
+        """
+        self.sample_rate = sample_rate
+        self.pauses = {
+            'sentence': int(round(sample_rate * sentence_pause_ms / 1000)),
+            'paragraph': int(round(sample_rate * paragraph_pause_ms / 1000)),
+        }
+        self.crossfade = int(round(sample_rate * crossfade_ms / 1000))
+        self.output_path = output_path
+        self._file = None
+        self._buffer: Optional[np.ndarray] = None
+        if output_path is not None:
+            import soundfile as sf
+            self._file = sf.SoundFile(output_path, 'w', samplerate=sample_rate, channels=1,
+                                      subtype=subtype)
+        else:
+            self._buffer = np.empty(max(1, int(sample_rate * expected_seconds)), dtype=np.float32)
+        self._length = 0
+        # 尚未提交的上一段末尾，用于与下一段交叉淡化
+        self._tail = np.zeros(0, dtype=np.float32)
+        self.segments = 0
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], sample_rate: int = 24000,
+                    **overrides) -> 'AudioAssembler':
+        """从配置字典创建拼接器，overrides中非None的参数优先"""
+        params = {
+            'sentence_pause_ms': config.get('sentence_pause_ms', 0.0),
+            'paragraph_pause_ms': config.get('paragraph_pause_ms', 200.0),
+            'crossfade_ms': config.get('crossfade_ms', 5.0),
+            'subtype': config.get('subtype'),
+        }
+        params.update({k: v for k, v in overrides.items() if v is not None})
+        return cls(sample_rate=sample_rate, **params)
+
+    def __len__(self) -> int:
+        """已拼接的样本数（包括尚未提交的末尾）"""
+        return self._length + len(self._tail)
+
+    @property
+    def duration(self) -> float:
+        return len(self) / self.sample_rate
+
+    def _commit(self, samples: np.ndarray):
+        if not len(samples):
+            return
+        if self._file is not None:
+            self._file.write(samples)
+        else:
+            needed = self._length + len(samples)
+            if needed > len(self._buffer):
+                grown = np.empty(max(needed, len(self._buffer) * 2), dtype=np.float32)
+                grown[:self._length] = self._buffer[:self._length]
+                self._buffer = grown
+            self._buffer[self._length:needed] = samples
+        self._length += len(samples)
+
+    def _commit_silence(self, count: int):
+        if self._file is None:
+            self._commit(np.zeros(count, dtype=np.float32))
+            return
+        block = np.zeros(min(count, self.sample_rate), dtype=np.float32)
+        while count > 0:
+            self._commit(block[:count])
+            count -= len(block)
+
+    def add(self, audio: np.ndarray, pause: Optional[str] = 'sentence',
+            pause_samples: Optional[int] = None) -> int:
+        """
+        追加一个片段
+
+        Args:
+            audio: 片段音频
+            pause: 与前一片段之间的停顿类型 'sentence' / 'paragraph'，None表示不停顿
+            pause_samples: 显式指定停顿的样本数，优先于pause
+
+        Returns:
+            int: 片段在输出中的起始样本位置（交叉淡化时与前一片段重叠）
+        """
+        audio = np.asarray(audio, dtype=np.float32).reshape(-1)
+        gap = pause_samples if pause_samples is not None else self.pauses.get(pause, 0)
+        if self.segments == 0:
+            gap = 0
+        self.segments += 1
+
+        fade = min(self.crossfade, len(self._tail), len(audio)) if gap == 0 else 0
+        start = len(self) + gap - fade
+        if fade:
+            ramp = np.linspace(0.0, 1.0, fade, dtype=np.float32)
+            self._commit(self._tail[:len(self._tail) - fade])
+            self._commit(self._tail[-fade:] * (1 - ramp) + audio[:fade] * ramp)
+            audio = audio[fade:]
+        else:
+            self._commit(self._tail)
+            self._commit_silence(gap)
+
+        keep = min(self.crossfade, len(audio))
+        self._commit(audio[:len(audio) - keep])
+        self._tail = audio[len(audio) - keep:].copy()
+        return start
+
+    def finish(self) -> np.ndarray:
+        """
+        结束拼接
+
+        Returns:
+            np.ndarray: 内存模式下为整篇音频（缓冲的视图），文件模式下为空数组
+        """
+        self._commit(self._tail)
+        self._tail = np.zeros(0, dtype=np.float32)
+        if self._file is not None:
+            self._file.close()
+            return np.zeros(0, dtype=np.float32)
+        return self._buffer[:self._length]
+
+    def __enter__(self) -> 'AudioAssembler':
+        return self
+
+    def __exit__(self, *exc):
+        if self._file is not None and not self._file.closed:
+            self.finish()
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+有声书渲染任务
+按章节标记切分整本书，各章节在独立进程中并行合成；每合成完一句即落盘检查点，
+任务中断后重新运行会从断点继续；输出每章一个音频文件和句子级的时间索引
+
+工作进程各自加载引擎，bulk优先级只在各自进程内生效，与同机的Web服务之间没有分道保护；
+需要在线上服务旁边渲染时，应把句子通过Web服务的 /api/batch 提交
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from text_segmenter import TextSegmenter
+from audio_processing import AudioAssembler
+
+# 默认章节标记: "第十二章 ..."、"Chapter 3"、Markdown标题
+DEFAULT_CHAPTER_PATTERN = r'^\s*(第[0-9零一二三四五六七八九十百千两]+[章回节卷].*|chapter\s+\w+.*|#{1,3}\s+.+)$'
+INDEX_FILE = 'timing_index.json'
+
+
+@dataclass
+class Chapter:
+    """一个章节及其句子，pauses[i] 为第i句之前的停顿类型"""
+    index: int
+    title: str
+    sentences: List[str] = field(default_factory=list)
+    pauses: List[str] = field(default_factory=list)
+
+    @property
+    def name(self) -> str:
+        return f'chapter_{self.index:03d}'
+
+
+def split_chapters(text: str, pattern: str = DEFAULT_CHAPTER_PATTERN) -> List[Chapter]:
+    """按章节标记切分全文，标记行作为章节标题并朗读；标记前的内容归入第0章"""
+    chapter_re = re.compile(pattern, re.IGNORECASE)
+    chapters = [Chapter(index=0, title='')]
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if chapter_re.match(line):
+            title = line.lstrip('#').strip()
+            chapters.append(Chapter(index=len(chapters), title=title))
+            chapters[-1].sentences.append(title)
+            chapters[-1].pauses.append('paragraph')
+            continue
+        for i, sentence in enumerate(TextSegmenter.split_sentences(line)):
+            chapters[-1].sentences.append(sentence)
+            chapters[-1].pauses.append('paragraph' if i == 0 else 'sentence')
+    return [chapter for chapter in chapters if chapter.sentences]
+
+
+def _checkpoint_path(chapter_dir: Path, index: int, sentence: str) -> Path:
+    """句子检查点路径，文件名带文本哈希，改动过的句子会重新合成"""
+    digest = hashlib.sha1(sentence.encode('utf-8')).hexdigest()[:10]
+    return chapter_dir / f's{index:05d}_{digest}.npy'
+
+
+def _params_digest(engine_name: Optional[str], params: Dict[str, Any]) -> str:
+    """合成参数的摘要，换了音色或采样率不会误用旧的检查点和章节文件"""
+    payload = json.dumps([engine_name, params], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:10]
+
+
+def _save_checkpoint(path: Path, audio: np.ndarray, sample_rate: int):
+    """先写临时文件再rename，崩溃时不会留下半个检查点"""
+    tmp_path = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    with open(tmp_path, 'wb') as f:
+        np.save(f, np.asarray(audio, dtype=np.float32))
+    os.replace(tmp_path, path)
+    rate_file = path.parent / 'sample_rate'
+    if not rate_file.exists():
+        rate_file.write_text(str(sample_rate))
+
+
+# 每个工作进程各自持有一个引擎管理器
+_worker_manager = None
+
+
+def _init_worker(config_path: str, engine_name: Optional[str]):
+    global _worker_manager
+    from tts_engine_manager import TTSEngineManager
+
+    _worker_manager = TTSEngineManager(config_path)
+    names = [engine_name] if engine_name else None
+    if not any(_worker_manager.initialize_engines(names).values()):
+        raise RuntimeError('工作进程中没有可用的TTS引擎')
+
+
+def render_chapter(chapter: Chapter, output_dir: str, engine_name: Optional[str] = None,
+                   audio_format: str = 'wav', params: Optional[Dict[str, Any]] = None,
+                   long_form_config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    渲染一个章节（在工作进程中运行）
+
+    已有检查点的句子直接读取，其余逐句合成并落盘；全部完成后拼接为章节文件，
+    返回该章节的时间索引
+    """
+    output_dir = Path(output_dir)
+    params = dict(params or {})
+    params_digest = _params_digest(engine_name, params)
+    chapter_dir = output_dir / 'checkpoints' / params_digest / chapter.name
+    chapter_dir.mkdir(parents=True, exist_ok=True)
+    params.setdefault('priority', 'bulk')
+
+    rendered = 0
+    for i, sentence in enumerate(chapter.sentences):
+        path = _checkpoint_path(chapter_dir, i, sentence)
+        if path.exists():
+            continue
+        result = _worker_manager.generate_speech(sentence, engine_name, **params)
+        _save_checkpoint(path, result.audio, result.sample_rate)
+        rendered += 1
+
+    sample_rate = int((chapter_dir / 'sample_rate').read_text())
+    audio_path = output_dir / f'{chapter.name}.{audio_format}'
+    # 临时文件保留扩展名，soundfile按扩展名选择容器格式
+    tmp_path = audio_path.with_name(f'.{chapter.name}.tmp.{audio_format}')
+    timings = []
+    with AudioAssembler.from_config(long_form_config or {}, sample_rate,
+                                    output_path=str(tmp_path)) as assembler:
+        for i, (sentence, pause) in enumerate(zip(chapter.sentences, chapter.pauses)):
+            audio = np.load(_checkpoint_path(chapter_dir, i, sentence), mmap_mode='r')
+            start = assembler.add(audio, pause)
+            timings.append({'index': i, 'text': sentence,
+                            'start': start / sample_rate, 'end': (start + len(audio)) / sample_rate})
+        duration = assembler.duration
+    os.replace(tmp_path, audio_path)
+
+    entry = {
+        'index': chapter.index,
+        'title': chapter.title,
+        'file': audio_path.name,
+        'sample_rate': sample_rate,
+        'params_digest': params_digest,
+        'duration': duration,
+        'rendered_sentences': rendered,
+        'sentences': timings,
+    }
+    with open(output_dir / f'{chapter.name}.json', 'w', encoding='utf-8') as f:
+        json.dump(entry, f, ensure_ascii=False, indent=2)
+    return entry
+
+
+class AudiobookRunner:
+    """有声书渲染任务"""
+
+    def __init__(self, config_path: str = 'tts_config.json', output_dir: str = './audiobook',
+                 engine_name: Optional[str] = None, workers: int = 2, audio_format: str = 'wav',
+                 chapter_pattern: str = DEFAULT_CHAPTER_PATTERN):
+        self.config_path = config_path
+        self.output_dir = Path(output_dir)
+        self.engine_name = engine_name
+        self.workers = max(1, workers)
+        self.audio_format = audio_format
+        self.chapter_pattern = chapter_pattern
+        with open(config_path, 'r', encoding='utf-8') as f:
+            self.long_form_config = json.load(f).get('long_form', {})
+
+    def _is_complete(self, chapter: Chapter, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """章节文件和索引都存在、且句子和合成参数一致时视为已完成"""
+        index_path = self.output_dir / f'{chapter.name}.json'
+        if not index_path.exists() or not (self.output_dir / f'{chapter.name}.{self.audio_format}').exists():
+            return None
+        with open(index_path, 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+        if ([s['text'] for s in entry['sentences']] != chapter.sentences
+                or entry.get('params_digest') != _params_digest(self.engine_name, params)):
+            return None
+        return entry
+
+    def run(self, book_path: str, **params) -> Dict[str, Any]:
+        """
+        渲染整本书
+
+        Args:
+            book_path: 书籍文本文件
+            **params: 传给generate_speech的参数（voice、output_rate等）
+
+        Returns:
+            Dict[str, Any]: 时间索引，同时写入 output_dir/timing_index.json
+        """
+        text = Path(book_path).read_text(encoding='utf-8')
+        chapters = split_chapters(text, self.chapter_pattern)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        print(f"📚 {Path(book_path).name}: {len(chapters)} 章, "
+              f"{sum(len(c.sentences) for c in chapters)} 句")
+
+        start_time = time.time()
+        entries: Dict[int, Dict[str, Any]] = {}
+        pending = []
+        for chapter in chapters:
+            entry = self._is_complete(chapter, params)
+            if entry is not None:
+                entries[chapter.index] = entry
+            else:
+                pending.append(chapter)
+        if entries:
+            print(f"⏭️  已完成 {len(entries)} 章，从断点继续")
+
+        args = (str(self.output_dir), self.engine_name, self.audio_format, params,
+                self.long_form_config)
+        if self.workers == 1 or len(pending) <= 1:
+            if pending:
+                _init_worker(self.config_path, self.engine_name)
+            for chapter in pending:
+                entries[chapter.index] = render_chapter(chapter, *args)
+                self._report(entries[chapter.index], len(entries), len(chapters))
+        else:
+            # spawn避免fork继承父进程中的torch线程池和CUDA状态
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(pending)), mp_context=context,
+                                     initializer=_init_worker,
+                                     initargs=(self.config_path, self.engine_name)) as executor:
+                futures = {executor.submit(render_chapter, chapter, *args): chapter
+                           for chapter in pending}
+                for future in as_completed(futures):
+                    chapter = futures[future]
+                    try:
+                        entries[chapter.index] = future.result()
+                    except Exception as e:
+                        print(f"❌ {chapter.name} 渲染失败: {str(e)}（已完成的句子已保存，重新运行可继续）")
+                        continue
+                    self._report(entries[chapter.index], len(entries), len(chapters))
+
+        index = {
+            'book': Path(book_path).name,
+            'chapters': [entries[c.index] for c in chapters if c.index in entries],
+            'complete': len(entries) == len(chapters),
+        }
+        index['duration'] = sum(c['duration'] for c in index['chapters'])
+        tmp_path = self.output_dir / f'.{INDEX_FILE}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.output_dir / INDEX_FILE)
+
+        print(f"✅ 完成 {len(entries)}/{len(chapters)} 章, 音频 {index['duration'] / 60:.1f} 分钟, "
+              f"耗时 {(time.time() - start_time) / 60:.1f} 分钟")
+        return index
+
+    @staticmethod
+    def _report(entry: Dict[str, Any], done: int, total: int):
+        print(f"   [{done}/{total}] {entry['file']} {entry['duration']:.1f}s "
+              f"(新合成 {entry['rendered_sentences']} 句)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='有声书渲染：按章节并行合成，可断点续跑')
+    parser.add_argument('book', help='书籍文本文件')
+    parser.add_argument('--output-dir', '-o', default='./audiobook', help='输出目录')
+    parser.add_argument('--config', default='tts_config.json', help='配置文件路径')
+    parser.add_argument('--engine', '-e', help='TTS引擎')
+    parser.add_argument('--voice', '-v', help='音色')
+    parser.add_argument('--workers', '-w', type=int, default=2, help='并行渲染的进程数')
+    parser.add_argument('--format', choices=['wav', 'flac'], default='wav', help='章节音频格式')
+    parser.add_argument('--output-rate', type=int, help='输出采样率')
+    parser.add_argument('--chapter-pattern', default=DEFAULT_CHAPTER_PATTERN,
+                        help='章节标记的正则表达式（逐行匹配）')
+    args = parser.parse_args()
+
+    params = {}
+    if args.voice:
+        params['voice'] = args.voice
+    if args.output_rate:
+        params['output_rate'] = args.output_rate
+
+    runner = AudiobookRunner(args.config, args.output_dir, args.engine, args.workers,
+                             args.format, args.chapter_pattern)
+    runner.run(args.book, **params)
+
+
+if __name__ == '__main__':
+    main()
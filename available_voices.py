@@ -2,16 +2,19 @@
 # -*- coding: utf-8 -*-
 """
 获取Kokoro TTS可用语音模型列表
+按音色目录查询（只校验文件结构和张量元数据），不再逐个合成探测
 """
 
-import kokoro
-import warnings
-warnings.filterwarnings("ignore")
+from pathlib import Path
+
+from voice_validator import VoiceCatalog
+
+VOICES_DIR = Path(__file__).parent / 'voices'
 
 def get_available_voices():
     """获取可用的语音模型列表"""
-    print("正在初始化Kokoro TTS...")
-    pipeline = kokoro.KPipeline('z', device='cpu')
+    catalog = VoiceCatalog(str(VOICES_DIR))
+    entries = catalog.scan()
     
     # 尝试一些常见的语音模型
     test_voices = [
@@ -26,26 +29,26 @@ def get_available_voices():
         'zm_001', 'zm_002', 'zm_003', 'zm_009', 'zm_012',
     ]
     
+    # 目录中其他音色也一并列出
+    test_voices += [voice for voice in sorted(entries) if voice not in test_voices]
+    
     available_voices = []
     failed_voices = []
     
-    test_text = "测试"
-    
-    print(f"\n测试 {len(test_voices)} 个语音模型...")
+    print(f"\n查询 {len(test_voices)} 个语音模型 (音色目录: {VOICES_DIR}, "
+          f"共 {catalog.last_scan['files']} 个文件)...")
     
     for voice in test_voices:
-        try:
-            print(f"测试 {voice}... ", end="")
-            results = list(pipeline(test_text, voice=voice))
-            if results:
-                available_voices.append(voice)
-                print("✅ 可用")
-            else:
-                failed_voices.append(voice)
-                print("❌ 无结果")
-        except Exception as e:
+        info = catalog.get(voice)
+        if info is None:
+            failed_voices.append(voice)
+            print(f"{voice}... ❌ 不存在")
+        elif not info.valid:
             failed_voices.append(voice)
-            print(f"❌ 失败: {str(e)[:50]}...")
+            print(f"{voice}... ❌ 文件损坏: {info.error}")
+        else:
+            available_voices.append(voice)
+            print(f"{voice}... ✅ 可用")
     
     return available_voices, failed_voices
 
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+KModel 导出工具
+把KModel的完整前向（文本编码器、时长/韵律预测器、解码器）以动态序列长度
+导出为ONNX和/或TorchScript，并把音色包转换为.npy，供kokoro_onnx引擎
+在不加载PyTorch模型的情况下推理
+"""
+
+import json
+import argparse
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+import torch
+
+REPO_ID = 'hexgrad/Kokoro-82M-v1.1-zh'
+DEFAULT_OPSET = 17
+STYLE_DIM = 256
+
+
+class KokoroExportWrapper(torch.nn.Module):
+    """
+    导出用的包装模块
+
+    输入:  input_ids [1, T] (首尾为0), ref_s [1, 256], speed [1]
+    输出:  audio [samples], pred_dur [T]
+    """
+
+    def __init__(self, model: torch.nn.Module):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids: torch.Tensor, ref_s: torch.Tensor,
+                speed: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        audio, pred_dur = self.model.forward_with_tokens(input_ids, ref_s, speed)
+        return audio, pred_dur
+
+
+def load_model(repo_id: str = REPO_ID) -> torch.nn.Module:
+    """在CPU上加载KModel，尽量关闭复数运算（ONNX不支持complex STFT）"""
+    from kokoro import KModel
+
+    try:
+        model = KModel(repo_id=repo_id, disable_complex=True)
+    except TypeError:
+        print("⚠️  当前kokoro版本不支持disable_complex，ONNX导出可能失败")
+        model = KModel(repo_id=repo_id)
+    return model.to('cpu').eval()
+
+
+def example_inputs(model: torch.nn.Module, length: int = 64) -> Tuple[torch.Tensor, ...]:
+    """构造示例输入，长度只用于跟踪，导出的序列轴是动态的"""
+    n_token = max(model.vocab.values()) + 1
+    input_ids = torch.randint(1, n_token, (1, length + 2), dtype=torch.long)
+    input_ids[0, 0] = input_ids[0, -1] = 0
+    ref_s = torch.randn(1, STYLE_DIM)
+    speed = torch.tensor([1.0])
+    return input_ids, ref_s, speed
+
+
+def export_onnx(model: torch.nn.Module, output_path: Path, opset: int = DEFAULT_OPSET) -> Path:
+    """导出ONNX，tokens和samples为动态轴"""
+    wrapper = KokoroExportWrapper(model).eval()
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with torch.no_grad():
+        torch.onnx.export(
+            wrapper,
+            example_inputs(model),
+            str(output_path),
+            input_names=['input_ids', 'ref_s', 'speed'],
+            output_names=['audio', 'pred_dur'],
+            dynamic_axes={
+                'input_ids': {1: 'tokens'},
+                'audio': {0: 'samples'},
+                'pred_dur': {0: 'tokens'},
+            },
+            opset_version=opset,
+            do_constant_folding=True,
+        )
+    print(f"✅ ONNX已导出: {output_path}")
+    return output_path
+
+
+def export_torchscript(model: torch.nn.Module, output_path: Path) -> Path:
+    """以trace方式导出TorchScript"""
+    wrapper = KokoroExportWrapper(model).eval()
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with torch.no_grad():
+        traced = torch.jit.trace(wrapper, example_inputs(model), check_trace=False)
+    traced.save(str(output_path))
+    print(f"✅ TorchScript已导出: {output_path}")
+    return output_path
+
+
+def export_vocab(model: torch.nn.Module, output_path: Path) -> Path:
+    """导出音素表，推理端无需再读取模型配置"""
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(model.vocab, f, ensure_ascii=False, indent=2)
+    return output_path
+
+
+def export_voices(voices_dir: Path, output_dir: Path) -> int:
+    """把voices/*.pt转换为float32的.npy，推理端可用mmap直接读取"""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    count = 0
+    for voice_file in sorted(voices_dir.glob('*.pt')):
+        pack = torch.load(voice_file, map_location='cpu', weights_only=True)
+        np.save(output_dir / f'{voice_file.stem}.npy', pack.float().numpy())
+        count += 1
+    print(f"✅ 已转换 {count} 个音色: {output_dir}")
+    return count
+
+
+def verify_onnx(model: torch.nn.Module, onnx_path: Path, length: int = 40) -> float:
+    """用onnxruntime跑一次，与PyTorch输出比较，返回音频长度相对偏差"""
+    import onnxruntime as ort
+
+    inputs = example_inputs(model, length)
+    with torch.no_grad():
+        audio, _ = KokoroExportWrapper(model)(*inputs)
+    session = ort.InferenceSession(str(onnx_path), providers=['CPUExecutionProvider'])
+    ort_audio, _ = session.run(None, {
+        'input_ids': inputs[0].numpy(),
+        'ref_s': inputs[1].numpy(),
+        'speed': inputs[2].numpy(),
+    })
+    diff = abs(len(ort_audio) - audio.shape[-1]) / max(audio.shape[-1], 1)
+    print(f"🔍 ONNX校验: PyTorch {audio.shape[-1]} samples, ONNX {len(ort_audio)} samples")
+    return diff
+
+
+def main():
+    parser = argparse.ArgumentParser(description='导出KModel为ONNX/TorchScript')
+    parser.add_argument('--repo-id', default=REPO_ID, help='模型仓库')
+    parser.add_argument('--output-dir', '-o', default='./exports', help='导出目录')
+    parser.add_argument('--format', choices=['onnx', 'torchscript', 'all'], default='onnx',
+                        help='导出格式')
+    parser.add_argument('--opset', type=int, default=DEFAULT_OPSET, help='ONNX opset版本')
+    parser.add_argument('--voices-dir', default=str(Path(__file__).parent / 'voices'),
+                        help='音色目录，为空则不转换音色')
+    parser.add_argument('--verify', action='store_true', help='导出后用onnxruntime校验')
+    args = parser.parse_args()
+
+    output_dir = Path(args.output_dir)
+    model = load_model(args.repo_id)
+    export_vocab(model, output_dir / 'vocab.json')
+
+    onnx_path: Optional[Path] = None
+    if args.format in ('onnx', 'all'):
+        onnx_path = export_onnx(model, output_dir / 'kokoro.onnx', args.opset)
+    if args.format in ('torchscript', 'all'):
+        export_torchscript(model, output_dir / 'kokoro.torchscript.pt')
+
+    if args.voices_dir and Path(args.voices_dir).exists():
+        export_voices(Path(args.voices_dir), output_dir / 'voices')
+
+    if args.verify and onnx_path is not None:
+        diff = verify_onnx(model, onnx_path)
+        print(f"{'✅' if diff < 0.01 else '⚠️ '} 音频长度偏差: {diff:.2%}")
+
+
+if __name__ == '__main__':
+    main()
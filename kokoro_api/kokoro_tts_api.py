@@ -30,18 +30,22 @@ class KokoroTTSAPI:
     提供简洁的接口来使用Kokoro TTS进行中文语音合成
     """
     
-    def __init__(self, model_path: str, vocos_path: str, device: str = "auto"):
+    def __init__(self, model_path: str, vocos_path: str, device: str = "auto",
+                 num_threads: Optional[int] = None):
         """
         初始化Kokoro TTS API
         
         Args:
             model_path: Kokoro模型文件路径
             vocos_path: Vocos声码器模型路径
-            device: 计算设备 ('auto', 'cuda', 'cpu')
+            device: 计算设备 ('auto', 'cpu', 'cuda', 'cuda:N')，同一进程中的多个实例
+                    可以放在不同的设备上
+            num_threads: CPU推理的intra-op线程数，None时使用PyTorch默认值
         """
         self.model_path = Path(model_path)
         self.vocos_path = Path(vocos_path)
         self.device = self._setup_device(device)
+        self.num_threads = num_threads
         self.model = None
         self.vocos = None
         self.is_initialized = False
@@ -73,7 +77,7 @@ class KokoroTTSAPI:
         设置计算设备
         
         Args:
-            device: 设备类型
+            device: 设备类型，指定的GPU不存在时回退到CPU
             
         Returns:
             torch.device: 计算设备
@@ -84,7 +88,12 @@ class KokoroTTSAPI:
             else:
                 device = "cpu"
         
-        return torch.device(device)
+        device = torch.device(device)
+        if device.type == "cuda" and (not torch.cuda.is_available() or
+                                      (device.index or 0) >= torch.cuda.device_count()):
+            logging.getLogger(__name__).warning(f"设备 {device} 不可用，使用CPU")
+            device = torch.device("cpu")
+        return device
     
     def initialize(self) -> bool:
         """
@@ -96,6 +105,10 @@ class KokoroTTSAPI:
         try:
             self.logger.info(f"正在初始化Kokoro TTS模型...")
             self.logger.info(f"设备: {self.device}")
+            
+            if self.num_threads:
+                torch.set_num_threads(self.num_threads)
+                self.logger.info(f"线程数: {self.num_threads}")
             self.logger.info(f"模型路径: {self.model_path}")
             self.logger.info(f"Vocos路径: {self.vocos_path}")
             
@@ -316,6 +329,13 @@ class KokoroTTSAPI:
         self.is_initialized = False
         self.logger.info("🧹 Kokoro TTS资源已清理")
     
+    def __enter__(self) -> 'KokoroTTSAPI':
+        return self
+    
+    def __exit__(self, *exc):
+        """with块结束时立即释放模型，而不是等待垃圾回收触发__del__"""
+        self.cleanup()
+    
     def __del__(self):
         """
         析构函数
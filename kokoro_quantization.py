@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+KModel 动态INT8量化
+对PL-BERT编码器、文本编码器和时长/韵律预测器中的Linear层做动态量化，降低CPU推理延迟和内存；
+LSTM保持fp32：Kokoro的TextEncoder/DurationEncoder在前向中调用LSTM.flatten_parameters()，
+量化后的动态LSTM没有这个方法；
+解码器（声码器）默认保持fp32，它对权重误差最敏感。
+并提供在固定语料上对比fp32与int8的质量/延迟/峰值内存报告（每种模式在独立子进程中测量）
+"""
+
+import io
+import sys
+import copy
+import json
+import argparse
+import multiprocessing
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import torch
+
+QUANTIZE_MODES = ('none', 'dynamic_int8')
+# 默认量化的KModel子模块；'decoder'（声码器）可以显式加入，但音质损失明显
+DEFAULT_QUANTIZE_MODULES = ('bert', 'bert_encoder', 'text_encoder', 'predictor')
+# 动态量化的层类型，不包含LSTM（见模块说明）
+QUANTIZE_LAYER_TYPES = (torch.nn.Linear,)
+
+# 固定评测语料，覆盖短句、长句、数字和中英混读
+REPORT_CORPUS = [
+    "你好，欢迎使用语音合成系统。",
+    "今天天气很好，我们一起去公园散步吧。",
+    "Kokoro 是一系列体积虽小但功能强大的 TTS 模型。",
+    "会议定于2024年5月1日下午3点在三楼会议室举行，请准时参加。",
+    "由于该模型删除了许多声音，因此它并不是对其前身的严格升级，但它提前发布以收集有关新声音和标记化的反馈。",
+    "美国版权局目前的指导表明，合成数据通常不符合版权保护的资格。",
+]
+
+
+def quantize_model(model: torch.nn.Module, mode: str = 'dynamic_int8',
+                   device: str = 'cpu', modules: Optional[Sequence[str]] = None) -> torch.nn.Module:
+    """
+    按模式量化模型
+
+    Args:
+        model: 已加载的KModel (eval模式)
+        mode: 'none' 或 'dynamic_int8'
+        device: 模型所在设备，动态量化只支持CPU
+        modules: 要量化的子模块名，默认DEFAULT_QUANTIZE_MODULES，其余子模块保持fp32
+
+    Returns:
+        torch.nn.Module: 量化后的模型（不支持时原样返回）
+    """
+    if mode in (None, '', 'none'):
+        return model
+    if mode not in QUANTIZE_MODES:
+        raise ValueError(f"未知的量化模式: {mode}，可选: {', '.join(QUANTIZE_MODES)}")
+    if str(device) != 'cpu':
+        print(f"⚠️  动态INT8量化只支持CPU推理，当前设备为 {device}，跳过量化")
+        return model
+
+    for name in modules or DEFAULT_QUANTIZE_MODULES:
+        submodule = getattr(model, name, None)
+        if submodule is None:
+            raise ValueError(f"模型没有子模块: {name}")
+        setattr(model, name, torch.ao.quantization.quantize_dynamic(
+            submodule, set(QUANTIZE_LAYER_TYPES), dtype=torch.qint8))
+    return model
+
+
+def model_size_mb(model: torch.nn.Module) -> float:
+    """序列化后的state_dict大小 (MB)，量化后的packed权重也计算在内"""
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell() / (1024 * 1024)
+
+
+def peak_rss_mb() -> float:
+    """当前进程的峰值常驻内存 (MB)"""
+    try:
+        import resource
+        # Linux上ru_maxrss单位为KB，macOS上为字节
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    except ImportError:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+
+
+def _log_spectrogram(audio: np.ndarray, n_fft: int = 1024, hop: int = 256) -> np.ndarray:
+    """分帧FFT得到对数幅度谱"""
+    if len(audio) < n_fft:
+        audio = np.pad(audio, (0, n_fft - len(audio)))
+    n_frames = 1 + (len(audio) - n_fft) // hop
+    frames = np.lib.stride_tricks.as_strided(
+        audio, shape=(n_frames, n_fft),
+        strides=(audio.strides[0] * hop, audio.strides[0]))
+    spectrum = np.abs(np.fft.rfft(frames * np.hanning(n_fft), axis=-1))
+    return np.log(spectrum + 1e-5)
+
+
+def compare_audio(reference: np.ndarray, candidate: np.ndarray) -> Dict[str, float]:
+    """比较两段音频：时长差、对数谱距离和对齐后的信噪比"""
+    reference = np.ascontiguousarray(reference, dtype=np.float32)
+    candidate = np.ascontiguousarray(candidate, dtype=np.float32)
+    n = min(len(reference), len(candidate))
+    ref_spec = _log_spectrogram(reference[:n])
+    cand_spec = _log_spectrogram(candidate[:n])
+    noise = reference[:n] - candidate[:n]
+    snr = 10 * np.log10(np.sum(reference[:n] ** 2) / max(np.sum(noise ** 2), 1e-12))
+    return {
+        'length_diff_ratio': abs(len(candidate) - len(reference)) / max(len(reference), 1),
+        'log_spectral_distance': float(np.sqrt(np.mean((ref_spec - cand_spec) ** 2))),
+        'snr_db': float(snr),
+    }
+
+
+def _run_corpus(engine, corpus: List[str], voice: str, repeats: int) -> Dict[str, Any]:
+    """在语料上测延迟，返回每句的音频和耗时"""
+    # 预热，避免首次调用的初始化开销计入
+    engine.generate(corpus[0], voice=voice)
+
+    audios, latencies, audio_seconds = [], [], 0.0
+    for text in corpus:
+        best = None
+        for _ in range(repeats):
+            result = engine.generate(text, voice=voice)
+            best = result.generation_time if best is None else min(best, result.generation_time)
+        audios.append(result.audio)
+        latencies.append(best)
+        audio_seconds += result.audio_length
+    return {
+        'audios': audios,
+        'latencies': latencies,
+        'total_latency': sum(latencies),
+        'rtf': sum(latencies) / audio_seconds if audio_seconds else 0.0,
+    }
+
+
+def _measure_mode(base_config: Dict[str, Any], mode: str, corpus: List[str], voice: str,
+                  repeats: int, num_threads: Optional[int]) -> Dict[str, Any]:
+    """在子进程中加载一种量化模式的模型并跑完语料，峰值内存只包含这一种模式"""
+    from tts_engine_manager import KokoroEngine
+
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    engine = KokoroEngine(dict(copy.deepcopy(base_config), quantize=mode))
+    engine.device = 'cpu'
+    if not engine.initialize():
+        raise RuntimeError(f"Kokoro引擎初始化失败 (quantize={mode})")
+    run = _run_corpus(engine, corpus, voice, repeats)
+    run['model_size_mb'] = model_size_mb(engine.model)
+    run['peak_rss_mb'] = peak_rss_mb()
+    run['threads'] = torch.get_num_threads()
+    return run
+
+
+def build_report(config_path: str = 'tts_config.json', voice: str = 'zf_001',
+                 repeats: int = 3, num_threads: Optional[int] = None,
+                 corpus: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    在CPU上分别加载fp32和int8模型，比较延迟、模型大小、峰值内存和音质
+
+    Returns:
+        Dict[str, Any]: 报告字典
+    """
+    corpus = corpus or REPORT_CORPUS
+
+    with open(config_path, 'r', encoding='utf-8') as f:
+        base_config = json.load(f)['tts_engines']['kokoro']
+    # 报告只关心模型本身，关闭调度器排队
+    base_config = dict(base_config, scheduler={'enabled': False})
+
+    # 每种模式一个spawn子进程，峰值RSS互不影响，也不继承父进程的torch状态
+    runs = {}
+    context = multiprocessing.get_context('spawn')
+    for mode in QUANTIZE_MODES:
+        with context.Pool(1) as pool:
+            runs[mode] = pool.apply(_measure_mode, (base_config, mode, corpus, voice,
+                                                    repeats, num_threads))
+
+    fp32, int8 = runs['none'], runs['dynamic_int8']
+    sentences = []
+    for i, text in enumerate(corpus):
+        sentence = {
+            'text': text,
+            'fp32_latency': fp32['latencies'][i],
+            'int8_latency': int8['latencies'][i],
+            'speedup': fp32['latencies'][i] / max(int8['latencies'][i], 1e-9),
+        }
+        sentence.update(compare_audio(fp32['audios'][i], int8['audios'][i]))
+        sentences.append(sentence)
+
+    summary_keys = ('total_latency', 'rtf', 'model_size_mb', 'peak_rss_mb')
+    return {
+        'voice': voice,
+        'threads': fp32['threads'],
+        'quantize_modules': list(base_config.get('quantize_modules') or DEFAULT_QUANTIZE_MODULES),
+        'fp32': {k: fp32[k] for k in summary_keys},
+        'int8': {k: int8[k] for k in summary_keys},
+        'speedup': fp32['total_latency'] / max(int8['total_latency'], 1e-9),
+        'size_reduction': 1 - int8['model_size_mb'] / max(fp32['model_size_mb'], 1e-9),
+        'peak_rss_reduction': 1 - int8['peak_rss_mb'] / max(fp32['peak_rss_mb'], 1e-9),
+        'mean_log_spectral_distance': float(np.mean([s['log_spectral_distance'] for s in sentences])),
+        'mean_length_diff_ratio': float(np.mean([s['length_diff_ratio'] for s in sentences])),
+        'sentences': sentences,
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    """打印报告摘要"""
+    print("\n📊 fp32 vs 动态INT8 量化报告")
+    print("=" * 60)
+    print(f"音色: {report['voice']}  线程数: {report['threads']}  "
+          f"量化子模块: {', '.join(report['quantize_modules'])}")
+    print(f"模型大小: {report['fp32']['model_size_mb']:.1f} MB -> "
+          f"{report['int8']['model_size_mb']:.1f} MB ({report['size_reduction']:.0%} 减少)")
+    print(f"峰值内存: {report['fp32']['peak_rss_mb']:.1f} MB -> "
+          f"{report['int8']['peak_rss_mb']:.1f} MB ({report['peak_rss_reduction']:.0%} 减少)")
+    print(f"总延迟:   {report['fp32']['total_latency']:.2f} s -> "
+          f"{report['int8']['total_latency']:.2f} s ({report['speedup']:.2f}x)")
+    print(f"RTF:      {report['fp32']['rtf']:.3f} -> {report['int8']['rtf']:.3f}")
+    print(f"平均对数谱距离: {report['mean_log_spectral_distance']:.3f}")
+    print(f"平均时长偏差:   {report['mean_length_diff_ratio']:.1%}")
+    print("\n逐句结果:")
+    for s in report['sentences']:
+        print(f"  {s['speedup']:.2f}x | LSD {s['log_spectral_distance']:.3f} | "
+              f"时长偏差 {s['length_diff_ratio']:.1%} | {s['text'][:24]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='KModel动态INT8量化质量/延迟报告')
+    parser.add_argument('--config', default='tts_config.json', help='配置文件路径')
+    parser.add_argument('--voice', '-v', default='zf_001', help='评测音色')
+    parser.add_argument('--repeats', type=int, default=3, help='每句重复次数（取最快一次）')
+    parser.add_argument('--threads', type=int, help='torch线程数')
+    parser.add_argument('--output', '-o', help='报告JSON输出路径')
+    args = parser.parse_args()
+
+    report = build_report(args.config, args.voice, args.repeats, args.threads)
+    print_report(report)
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 报告已保存: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+引擎内存预算
+记录每个引擎副本的内存占用（张量字节数和加载前后的进程RSS变化），
+空闲超过TTL的副本自动卸载，请求到达时按需重新加载；
+加载会超出预算时先卸载其他空闲副本，仍不够则排队等待，超时后拒绝请求而不是OOM
+"""
+
+import gc
+import sys
+import time
+import threading
+from typing import Any, Dict, List, Optional
+
+import psutil
+
+
+class MemoryBudgetExceeded(Exception):
+    """在等待时间内无法腾出足够的内存加载引擎"""
+    pass
+
+
+def process_rss_bytes() -> int:
+    """当前进程的常驻内存"""
+    return psutil.Process().memory_info().rss
+
+
+def module_bytes(*modules) -> int:
+    """torch模块的参数和缓冲区字节数，None被忽略"""
+    total = 0
+    for module in modules:
+        if module is None:
+            continue
+        for tensor in list(module.parameters()) + list(module.buffers()):
+            total += tensor.numel() * tensor.element_size()
+    return total
+
+
+def release_memory(device: str = 'cpu'):
+    """回收引用并归还CUDA缓存的显存"""
+    gc.collect()
+    # 没有导入过torch的进程（如只用ONNX引擎）不可能占用CUDA缓存
+    torch = sys.modules.get('torch')
+    if torch is not None and str(device).startswith('cuda') and torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+class _Resident:
+    """预算中登记的一个引擎副本"""
+
+    def __init__(self, name: str, engine: Any, estimate_bytes: int):
+        self.name = name
+        self.label = f'{name}#{engine.replica_id}'
+        self.engine = engine
+        self.footprint = estimate_bytes
+        self.rss_delta = 0
+        # loaded / loading / unloading / unloaded
+        self.state = 'loaded' if engine.is_ready() else 'unloaded'
+        self.in_use = 0
+        self.last_used = time.monotonic()
+        self.loads = 0
+        self.unloads = 0
+
+
+class MemoryBudget:
+    """按内存预算管理引擎副本的加载和卸载"""
+
+    def __init__(self, max_memory_mb: float = 4096.0, idle_ttl: float = 600.0,
+                 check_interval: float = 30.0, wait_timeout: float = 30.0,
+                 keep_loaded: Optional[List[str]] = None):
+        """
+        Args:
+            max_memory_mb: 已加载副本的内存总和上限
+            idle_ttl: 副本空闲超过该秒数后卸载，0表示不按时间卸载
+            check_interval: 后台检查空闲副本的间隔（秒）
+            wait_timeout: 内存不足时请求最多等待的秒数，0表示立即拒绝
+            keep_loaded: 常驻不卸载的引擎名
+        """
+        self.max_bytes = int(max_memory_mb * 1024 * 1024)
+        self.idle_ttl = idle_ttl
+        self.check_interval = check_interval
+        self.wait_timeout = wait_timeout
+        self.keep_loaded = set(keep_loaded or [])
+        self._residents: Dict[int, _Resident] = {}
+        self._cond = threading.Condition()
+        self._stats = {'loads': 0, 'unloads': 0, 'idle_unloads': 0, 'pressure_unloads': 0,
+                       'waits': 0, 'rejected': 0}
+        self._running = False
+        self._reaper: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> 'MemoryBudget':
+        """从配置字典创建预算管理器"""
+        return cls(
+            max_memory_mb=config.get('max_memory_mb', 4096.0),
+            idle_ttl=config.get('idle_ttl', 600.0),
+            check_interval=config.get('check_interval', 30.0),
+            wait_timeout=config.get('wait_timeout', 30.0),
+            keep_loaded=config.get('keep_loaded', [])
+        )
+
+    def start(self):
+        """启动后台空闲检查线程"""
+        if self._running or self.idle_ttl <= 0:
+            return
+        self._running = True
+        self._reaper = threading.Thread(target=self._reaper_loop, name='memory-budget', daemon=True)
+        self._reaper.start()
+
+    def stop(self):
+        """停止后台线程"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._reaper is not None:
+            self._reaper.join(timeout=5)
+            self._reaper = None
+
+    def track(self, name: str, engine: Any, estimate_mb: float = 0.0, rss_delta: int = 0):
+        """登记一个已初始化的副本，记录其内存占用；超出预算时卸载其他空闲副本"""
+        resident = _Resident(name, engine, int(estimate_mb * 1024 * 1024))
+        if resident.state == 'loaded':
+            resident.footprint = max(engine.memory_footprint(), resident.footprint)
+            resident.rss_delta = rss_delta
+            resident.loads = 1
+        with self._cond:
+            self._residents[id(engine)] = resident
+            evicted = []
+            if self._used_bytes() > self.max_bytes:
+                evicted = self._evict_idle(self._used_bytes() - self.max_bytes, exclude=resident)
+        self._unload_all(evicted, 'pressure')
+        with self._cond:
+            if self._used_bytes() > self.max_bytes:
+                print(f"⚠️  已加载的引擎超出内存预算: {self._used_bytes() / 1048576:.0f}MB > "
+                      f"{self.max_bytes / 1048576:.0f}MB")
+
+    def is_tracked(self, engine: Any) -> bool:
+        """副本是否由预算管理（卸载后仍可按需加载）"""
+        return id(engine) in self._residents
+
+    def acquire(self, engine: Any):
+        """
+        请求使用一个副本，未加载时先腾出内存再加载；抛出异常时不占用副本，调用方无需release
+
+        Raises:
+            MemoryBudgetExceeded: 等待wait_timeout后仍无法腾出内存
+        """
+        resident = self._residents.get(id(engine))
+        if resident is None:
+            return
+        deadline = time.monotonic() + self.wait_timeout
+        with self._cond:
+            resident.in_use += 1
+            resident.last_used = time.monotonic()
+        try:
+            while True:
+                evicted = []
+                with self._cond:
+                    if resident.state == 'loaded':
+                        return
+                    if resident.state == 'unloaded':
+                        shortfall = self._used_bytes() + resident.footprint - self.max_bytes
+                        if shortfall > 0:
+                            evicted = self._evict_idle(shortfall, exclude=resident)
+                        else:
+                            resident.state = 'loading'
+                            break
+                    if not evicted:
+                        # 其他请求正在加载或卸载这个副本，或内存不足需要等待其他副本空闲
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._stats['rejected'] += 1
+                            raise MemoryBudgetExceeded(
+                                f"内存预算不足，无法加载 {resident.label} "
+                                f"(需要 {resident.footprint / 1048576:.0f}MB，"
+                                f"已用 {self._used_bytes() / 1048576:.0f}/{self.max_bytes / 1048576:.0f}MB)")
+                        self._stats['waits'] += 1
+                        self._cond.wait(min(remaining, 1.0))
+                        continue
+                # 卸载较慢，在锁外进行，期间其他请求仍可获取已加载的副本
+                self._unload_all(evicted, 'pressure')
+        except BaseException:
+            with self._cond:
+                resident.in_use -= 1
+                self._cond.notify_all()
+            raise
+
+        # 加载耗时较长，在锁外进行，期间该副本占用的预算已预留
+        self._load(resident)
+
+    def release(self, engine: Any):
+        """请求结束"""
+        resident = self._residents.get(id(engine))
+        if resident is None:
+            return
+        with self._cond:
+            resident.in_use -= 1
+            resident.last_used = time.monotonic()
+            self._cond.notify_all()
+
+    def _load(self, resident: _Resident):
+        """加载副本，失败时撤销acquire中计入的占用"""
+        print(f"🔄 重新加载引擎副本: {resident.label}")
+        rss_before = process_rss_bytes()
+        try:
+            loaded = resident.engine.initialize()
+        except Exception as e:
+            print(f"❌ {resident.label} 加载异常: {str(e)}")
+            loaded = False
+        with self._cond:
+            if loaded:
+                resident.state = 'loaded'
+                resident.footprint = resident.engine.memory_footprint() or resident.footprint
+                resident.rss_delta = max(0, process_rss_bytes() - rss_before)
+                resident.loads += 1
+                self._stats['loads'] += 1
+            else:
+                resident.state = 'unloaded'
+                resident.in_use -= 1
+            self._cond.notify_all()
+        if not loaded:
+            raise Exception(f"引擎副本加载失败: {resident.label}")
+
+    def _used_bytes(self) -> int:
+        """已加载、正在加载和正在卸载的副本占用，必须持有锁调用"""
+        return sum(r.footprint for r in self._residents.values()
+                   if r.state in ('loaded', 'loading', 'unloading'))
+
+    def _is_idle(self, resident: _Resident) -> bool:
+        return (resident.state == 'loaded' and resident.in_use == 0
+                and resident.engine.active_requests == 0 and resident.name not in self.keep_loaded)
+
+    def _unload_all(self, residents: List[_Resident], reason: str):
+        """卸载已标记为unloading的副本，不能持有锁调用"""
+        for resident in residents:
+            try:
+                resident.engine.unload()
+            except Exception as e:
+                print(f"❌ {resident.label} 卸载异常: {str(e)}")
+            with self._cond:
+                resident.state = 'unloaded'
+                resident.unloads += 1
+                self._stats['unloads'] += 1
+                self._stats[f'{reason}_unloads'] += 1
+                self._cond.notify_all()
+            print(f"💤 已卸载引擎副本 {resident.label} ({reason}), "
+                  f"释放约 {resident.footprint / 1048576:.0f}MB")
+
+    def _evict_idle(self, needed: int, exclude: Optional[_Resident] = None) -> List[_Resident]:
+        """
+        按最久未用的顺序选出空闲副本直到腾出needed字节，标记为unloading后返回，
+        由调用方释放锁后交给_unload_all；必须持有锁调用
+        """
+        freed, evicted = 0, []
+        candidates = sorted((r for r in self._residents.values() if r is not exclude and self._is_idle(r)),
+                            key=lambda r: r.last_used)
+        for resident in candidates:
+            if freed >= needed:
+                break
+            resident.state = 'unloading'
+            evicted.append(resident)
+            freed += resident.footprint
+        return evicted
+
+    def _reaper_loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait(self.check_interval)
+                if not self._running:
+                    return
+                now = time.monotonic()
+                expired = [r for r in self._residents.values()
+                           if self._is_idle(r) and now - r.last_used > self.idle_ttl]
+                for resident in expired:
+                    resident.state = 'unloading'
+            self._unload_all(expired, 'idle')
+
+    def get_stats(self) -> Dict[str, Any]:
+        """预算统计"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats['max_memory_mb'] = self.max_bytes / 1048576
+            stats['used_memory_mb'] = self._used_bytes() / 1048576
+            now = time.monotonic()
+            stats['replicas'] = {
+                r.label: {'state': r.state, 'footprint_mb': r.footprint / 1048576,
+                          'rss_delta_mb': r.rss_delta / 1048576, 'in_use': r.in_use,
+                          'idle_seconds': round(now - r.last_used, 1),
+                          'loads': r.loads, 'unloads': r.unloads}
+                for r in self._residents.values()
+            }
+        stats['process_rss_mb'] = process_rss_bytes() / 1048576
+        return stats
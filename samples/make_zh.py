@@ -5,11 +5,17 @@
 # pip install kokoro>=0.8.1 "misaki[zh]>=0.8.1"
 from kokoro import KModel, KPipeline
 from pathlib import Path
-import numpy as np
 import soundfile as sf
+import sys
 import torch
 import tqdm
 
+sys.path.append(str(Path(__file__).parent.parent))
+from audio_processing import AudioAssembler
+# HACK: Mitigate rushing caused by lack of training data beyond ~100 tokens
+# The default curve decreases speed piecewise-linearly as len_ps increases
+from speaking_rate import default_speed as speed_callable
+
 REPO_ID = 'hexgrad/Kokoro-82M-v1.1-zh'
 SAMPLE_RATE = 24000
 
@@ -56,31 +62,19 @@ def en_callable(text):
         return 'sˈOl'
     return next(en_pipeline(text)).phonemes
 
-# HACK: Mitigate rushing caused by lack of training data beyond ~100 tokens
-# Simple piecewise linear fn that decreases speed as len_ps increases
-def speed_callable(len_ps):
-    speed = 0.8
-    if len_ps <= 83:
-        speed = 1
-    elif len_ps < 183:
-        speed = 1 - (len_ps - 83) / 500
-    return speed * 1.1
-
 model = KModel(repo_id=REPO_ID).to(device).eval()
 zh_pipeline = KPipeline(lang_code='z', repo_id=REPO_ID, model=model, en_callable=en_callable)
 
 path = Path(__file__).parent
 
-wavs = []
-for paragraph in tqdm.tqdm(texts):
-    for i, sentence in enumerate(paragraph):
-        generator = zh_pipeline(sentence, voice=VOICE, speed=speed_callable)
-        f = path / f'zh{len(wavs):02}.wav'
-        result = next(generator)
-        wav = result.audio
-        sf.write(f, wav, SAMPLE_RATE)
-        if i == 0 and wavs and N_ZEROS > 0:
-            wav = np.concatenate([np.zeros(N_ZEROS), wav])
-        wavs.append(wav)
-
-sf.write(path / f'HEARME_{VOICE}.wav', np.concatenate(wavs), SAMPLE_RATE)
+# Sentences are written straight into the output file; without crossfades this matches plain concatenation
+with AudioAssembler(SAMPLE_RATE, sentence_pause_ms=0, crossfade_ms=0,
+                    output_path=str(path / f'HEARME_{VOICE}.wav')) as assembler:
+    for paragraph in tqdm.tqdm(texts):
+        for i, sentence in enumerate(paragraph):
+            generator = zh_pipeline(sentence, voice=VOICE, speed=speed_callable)
+            f = path / f'zh{assembler.segments:02}.wav'
+            result = next(generator)
+            wav = result.audio
+            sf.write(f, wav, SAMPLE_RATE)
+            assembler.add(wav, pause_samples=N_ZEROS if i == 0 else 0)
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+语速模型
+Kokoro在超过约100个音素的输入上会"抢读"（训练数据中这么长的样本很少），
+原先用手工调的分段线性函数按音素数降低语速。这里把它做成可配置的组件：
+未校准的音色沿用同一条曲线（节点可配置）；校准过的音色按实测的每音素秒数
+逐长度补偿，使长短片段的语速一致；一批片段的语速一次算出；
+还可以按目标时长反推语速，用于配音时对齐固定的时间槽
+"""
+
+import os
+import json
+import time
+import argparse
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Sequence
+
+import numpy as np
+
+# 原 speed_callable: 83个音素以内为1，到183个音素线性降到0.8，整体再乘1.1
+DEFAULT_LENGTH_CURVE = ((83, 1.0), (183, 0.8))
+DEFAULT_SPEED_SCALE = 1.1
+# 未校准时估算时长用的每音素秒数（speed=1）
+DEFAULT_SECONDS_PER_PHONEME = 0.075
+# 校准时测量的音素长度，覆盖到模型上限510
+CALIBRATION_LENGTHS = (16, 32, 64, 96, 128, 192, 256, 384, 510)
+# 校准用的探测文本，G2P后按需重复截取到各个长度
+CALIBRATION_TEXT = ("今天的天气很好，我们一起去公园散步吧。春天来了，花园里的花都开了，"
+                    "有红的、黄的、白的，非常漂亮。小朋友们在草地上奔跑，老人们坐在长椅上聊天，"
+                    "湖面上有几只小船慢慢地划过，远处的山上还能看到一座古老的寺庙。")
+
+
+def default_speed(len_ps: int) -> float:
+    """与原 speed_callable 相同的默认曲线，可直接作为KPipeline的speed参数"""
+    (x0, y0), (x1, y1) = DEFAULT_LENGTH_CURVE
+    return float(np.interp(len_ps, [x0, x1], [y0, y1])) * DEFAULT_SPEED_SCALE
+
+
+class SpeakingRateModel:
+    """按音色和音素数给出送入模型的speed"""
+
+    def __init__(self, speed_scale: float = DEFAULT_SPEED_SCALE,
+                 length_curve: Sequence[Sequence[float]] = DEFAULT_LENGTH_CURVE,
+                 rate_table: Optional[Dict[str, Dict[str, list]]] = None,
+                 rate_table_path: Optional[str] = None,
+                 target_seconds_per_phoneme: Optional[float] = None,
+                 default_seconds_per_phoneme: float = DEFAULT_SECONDS_PER_PHONEME,
+                 min_speed: float = 0.5, max_speed: float = 2.0,
+                 duration_tolerance: float = 0.05):
+        """
+        Args:
+            speed_scale: 整体语速倍率
+            length_curve: 未校准音色的 [(音素数, 倍率), ...] 节点，节点之间线性插值
+            rate_table: 音色 -> {"lengths": [...], "seconds_per_phoneme": [...]}，speed=1时实测
+            rate_table_path: 速率表文件，存在时加载，校准结果也写入这里
+            target_seconds_per_phoneme: 校准音色统一到的每音素秒数；为空时每个音色
+                保持自己在最短长度上的语速（再乘speed_scale），只补偿长片段的抢读
+            default_seconds_per_phoneme: 未校准音色估算时长用的每音素秒数
+            min_speed, max_speed: speed的上下限
+            duration_tolerance: 按目标时长合成时允许的相对误差，超出时修正一次
+        """
+        curve = sorted((float(n), float(v)) for n, v in length_curve)
+        self.curve_lengths = np.array([n for n, _ in curve])
+        self.curve_values = np.array([v for _, v in curve])
+        self.speed_scale = speed_scale
+        self.rate_table: Dict[str, Dict[str, list]] = dict(rate_table or {})
+        self.rate_table_path = Path(rate_table_path) if rate_table_path else None
+        self.target_seconds_per_phoneme = target_seconds_per_phoneme
+        self.default_seconds_per_phoneme = default_seconds_per_phoneme
+        self.min_speed = min_speed
+        self.max_speed = max_speed
+        self.duration_tolerance = duration_tolerance
+        if self.rate_table_path is not None and self.rate_table_path.exists():
+            self.load(self.rate_table_path)
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> 'SpeakingRateModel':
+        """从配置字典创建语速模型"""
+        return cls(
+            speed_scale=config.get('speed_scale', DEFAULT_SPEED_SCALE),
+            length_curve=config.get('length_curve', DEFAULT_LENGTH_CURVE),
+            rate_table_path=config.get('rate_table_path'),
+            target_seconds_per_phoneme=config.get('target_seconds_per_phoneme'),
+            default_seconds_per_phoneme=config.get('default_seconds_per_phoneme',
+                                                   DEFAULT_SECONDS_PER_PHONEME),
+            min_speed=config.get('min_speed', 0.5),
+            max_speed=config.get('max_speed', 2.0),
+            duration_tolerance=config.get('duration_tolerance', 0.05)
+        )
+
+    def is_calibrated(self, voice: str) -> bool:
+        return voice in self.rate_table
+
+    def seconds_per_phoneme(self, voice: str, lengths) -> np.ndarray:
+        """speed=1时每个音素的秒数，未校准的音色按默认值和长度曲线估算"""
+        lengths = np.asarray(lengths, dtype=np.float64)
+        entry = self.rate_table.get(voice)
+        if entry is None:
+            # 默认曲线的speed正是为了抵消抢读，未补偿时的每音素秒数按同一曲线缩短
+            curve = np.interp(lengths, self.curve_lengths, self.curve_values)
+            return self.default_seconds_per_phoneme * curve / self.curve_values[0]
+        return np.interp(lengths, entry['lengths'], entry['seconds_per_phoneme'])
+
+    def speeds(self, voice: str, lengths, speed: float = 1.0) -> np.ndarray:
+        """
+        一批片段的speed（向量化）
+
+        Args:
+            lengths: 各片段的音素数
+            speed: 在模型补偿之上的语速倍率
+        """
+        lengths = np.asarray(lengths, dtype=np.float64)
+        entry = self.rate_table.get(voice)
+        if entry is None:
+            base = np.interp(lengths, self.curve_lengths, self.curve_values) * self.speed_scale
+        else:
+            # duration与speed成反比: speed = 实测每音素秒数 / 目标每音素秒数
+            target = self.target_seconds_per_phoneme
+            if target is None:
+                target = entry['seconds_per_phoneme'][0] / self.speed_scale
+            base = self.seconds_per_phoneme(voice, lengths) / target
+        return np.clip(base * speed, self.min_speed, self.max_speed)
+
+    def for_voice(self, voice: str, speed: float = 1.0) -> Callable[[int], float]:
+        """KPipeline风格的 len_ps -> speed 函数"""
+        return lambda len_ps: float(self.speeds(voice, [len_ps], speed)[0])
+
+    def predict_duration(self, voice: str, lengths, speeds) -> float:
+        """按音素数估算一批片段以给定speed合成后的总时长（秒）"""
+        lengths = np.asarray(lengths, dtype=np.float64)
+        return float(np.sum(lengths * self.seconds_per_phoneme(voice, lengths)
+                            / np.asarray(speeds, dtype=np.float64)))
+
+    def speed_for_duration(self, voice: str, lengths, target_duration: float) -> float:
+        """
+        使一批片段总时长接近target_duration的语速倍率（作为speeds的speed参数）
+
+        各片段之间保持模型补偿后的相对语速，整体按同一倍率缩放
+        """
+        if target_duration <= 0:
+            raise ValueError(f"目标时长必须为正数: {target_duration}")
+        predicted = self.predict_duration(voice, lengths, self.speeds(voice, lengths))
+        return predicted / target_duration if predicted > 0 else 1.0
+
+    def speed_for_predicted(self, durations: Sequence[np.ndarray], base_speeds,
+                            target_frames: float, iterations: int = 40) -> float:
+        """
+        由时长预测器给出的帧数反推语速倍率（作为speeds的speed参数）
+        
+        Args:
+            durations: 各片段每个输入符号在speed=1时的帧数（取整前）
+            base_speeds: 各片段补偿后的speed，整体按同一倍率缩放
+            target_frames: 目标总帧数
+        
+        模型按 max(1, round(d / speed)) 取整，总帧数随倍率单调不增，按对数二分求解
+        """
+        base = np.asarray(base_speeds, dtype=np.float64)
+        if not len(base):
+            return 1.0
+        
+        def total_frames(scale):
+            speeds = np.clip(base * scale, self.min_speed, self.max_speed)
+            return sum(np.maximum(1, np.round(d / s)).sum() for d, s in zip(durations, speeds) if len(d))
+        
+        low, high = self.min_speed / base.max(), self.max_speed / base.min()
+        for _ in range(iterations):
+            middle = np.sqrt(low * high)
+            if total_frames(middle) > target_frames:
+                low = middle
+            else:
+                high = middle
+        return float(np.sqrt(low * high))
+
+    def saturated(self, speeds, faster: bool) -> bool:
+        """
+        片段的speed是否已全部到达上限（faster为True）或下限
+
+        此时再缩放语速倍率也不会改变时长，目标时长超出了可达范围
+        """
+        speeds = np.asarray(speeds, dtype=np.float64)
+        if not len(speeds):
+            return False
+        if faster:
+            return bool(np.all(speeds >= self.max_speed * (1 - 1e-6)))
+        return bool(np.all(speeds <= self.min_speed * (1 + 1e-6)))
+
+    def target_met(self, actual: float, target_duration: float,
+                   tolerance: Optional[float] = None) -> bool:
+        """实际时长与目标时长的相对误差是否在容差内"""
+        tolerance = self.duration_tolerance if tolerance is None else tolerance
+        return abs(actual / target_duration - 1) <= tolerance
+
+    def calibrate(self, voice: str, measure: Callable[[int], float],
+                  lengths: Sequence[int] = CALIBRATION_LENGTHS) -> Dict[str, list]:
+        """
+        校准一个音色
+
+        Args:
+            measure: 音素数 -> 以speed=1合成该长度输入得到的音频秒数
+            lengths: 测量的音素长度
+        """
+        lengths = sorted(set(int(n) for n in lengths if n > 0))
+        rates = [measure(n) / n for n in lengths]
+        entry = {'lengths': lengths, 'seconds_per_phoneme': [round(r, 6) for r in rates]}
+        self.rate_table[voice] = entry
+        return entry
+
+    def load(self, path: Optional[str] = None):
+        """加载速率表"""
+        path = Path(path) if path else self.rate_table_path
+        with open(path, 'r', encoding='utf-8') as f:
+            self.rate_table.update(json.load(f).get('voices', {}))
+
+    def save(self, path: Optional[str] = None):
+        """写入速率表，先写临时文件再rename"""
+        path = Path(path) if path else self.rate_table_path
+        if path is None:
+            raise ValueError("没有指定速率表路径")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'voices': dict(sorted(self.rate_table.items()))}, f,
+                      ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='校准Kokoro各音色的语速表')
+    parser.add_argument('--config', default='tts_config.json', help='配置文件路径')
+    parser.add_argument('--voices', nargs='+', help='待校准的音色，默认为全部中文音色')
+    parser.add_argument('--lengths', nargs='+', type=int, default=list(CALIBRATION_LENGTHS),
+                        help='测量的音素长度')
+    args = parser.parse_args()
+
+    from tts_engine_manager import TTSEngineManager
+
+    manager = TTSEngineManager(args.config)
+    if not manager.initialize_engines(['kokoro']).get('kokoro'):
+        print("❌ Kokoro引擎初始化失败")
+        return
+    engine = manager.get_engine('kokoro')
+    start_time = time.time()
+    table = engine.calibrate_speaking_rate(args.voices, args.lengths)
+    for voice, entry in table.items():
+        rates = entry['seconds_per_phoneme']
+        print(f"  {voice}: {rates[0]:.4f} -> {rates[-1]:.4f} s/音素 "
+              f"({entry['lengths'][0]} -> {entry['lengths'][-1]} 音素)")
+    print(f"✅ 已校准 {len(table)} 个音色, 耗时 {time.time() - start_time:.1f}s")
+    manager.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""把仓库根目录加入导入路径，直接运行 pytest 时也能导入顶层模块"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""磁盘音频缓存测试"""
+
+import numpy as np
+import pytest
+
+from audio_cache import DiskAudioCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return DiskAudioCache(str(tmp_path / 'cache'), max_size_mb=16)
+
+
+def test_roundtrip(cache):
+    audio = np.linspace(-1, 1, 100, dtype=np.float32)
+    cache.put('ab' * 16, audio, 24000)
+    cached, sample_rate = cache.get('ab' * 16)
+    assert sample_rate == 24000
+    np.testing.assert_array_equal(cached, audio)
+    cached *= 0.5  # 返回的数组可写
+
+
+@pytest.mark.parametrize('content', [
+    b'',                                   # 空文件
+    b'\x00\x00',                           # 头部截断
+    b'\x00\x00\x00\x00' + b'\x00' * 8,     # 采样率为0
+    b'\xc0\x5d\x00\x00' + b'\x00' * 7,     # 音频数据截断
+])
+def test_corrupt_entry_is_miss_and_deleted(cache, content):
+    key = 'cd' * 16
+    path = cache._path_for(key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+    assert cache.get(key) is None
+    assert not path.exists()
+    assert cache.get_stats()['corrupt'] == 1
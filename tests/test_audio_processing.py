@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""流式后处理测试"""
+
+import numpy as np
+
+from audio_processing import AudioPostProcessor, StreamingPostProcessor
+
+SAMPLE_RATE = 24000
+
+
+def _tone(amplitude: float, seconds: float = 0.5) -> np.ndarray:
+    t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    return (amplitude * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+
+def _stream(limit: bool, chunks):
+    processor = AudioPostProcessor(sample_rate=SAMPLE_RATE, trim=False, limit=limit)
+    post = StreamingPostProcessor(processor)
+    return post, [post.process(chunk) for chunk in chunks]
+
+
+def test_loud_chunk_after_quiet_is_not_limited():
+    quiet, loud = _tone(0.01), _tone(0.3)
+    post, limited = _stream(True, [quiet, loud])
+    _, unlimited = _stream(False, [quiet, loud])
+    # 关闭限幅时结果相同，说明没有任何采样点被限幅
+    np.testing.assert_allclose(limited[1], unlimited[1], rtol=0, atol=1e-6)
+    assert np.abs(limited[1]).max() <= post.processor.peak + 1e-6
+
+
+def test_gain_ramp_is_short():
+    quiet, loud = _tone(0.01), _tone(0.3)
+    post, outputs = _stream(True, [quiet, loud])
+    target = float(post.processor.normalization_gains([loud])[0])
+    np.testing.assert_allclose(outputs[1][post.ramp:], loud[post.ramp:] * target, rtol=1e-5)
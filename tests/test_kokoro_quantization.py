@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""动态量化测试：量化后必须能完成前向"""
+
+import os
+
+import pytest
+
+torch = pytest.importorskip('torch')
+
+from kokoro_quantization import quantize_model
+
+
+class FlattenLSTMEncoder(torch.nn.Module):
+    """与Kokoro的TextEncoder/DurationEncoder一样在前向中调用flatten_parameters"""
+
+    def __init__(self):
+        super().__init__()
+        self.lstm = torch.nn.LSTM(8, 4, batch_first=True, bidirectional=True)
+        self.proj = torch.nn.Linear(8, 8)
+
+    def forward(self, x):
+        self.lstm.flatten_parameters()
+        x, _ = self.lstm(x)
+        return self.proj(x)
+
+
+class TinyModel(torch.nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.text_encoder = FlattenLSTMEncoder()
+        self.predictor = FlattenLSTMEncoder()
+        self.decoder = torch.nn.Linear(8, 8)
+
+    def forward(self, x):
+        return self.decoder(self.predictor(self.text_encoder(x)))
+
+
+def test_quantized_model_runs_forward():
+    model = quantize_model(TinyModel().eval(), 'dynamic_int8', 'cpu',
+                           modules=('text_encoder', 'predictor'))
+    with torch.no_grad():
+        output = model(torch.randn(1, 5, 8))
+    assert output.shape == (1, 5, 8)
+    assert isinstance(model.text_encoder.lstm, torch.nn.LSTM)
+    assert type(model.text_encoder.proj) is not torch.nn.Linear
+    # 解码器保持fp32
+    assert type(model.decoder) is torch.nn.Linear
+
+
+def test_unknown_submodule():
+    with pytest.raises(ValueError):
+        quantize_model(TinyModel().eval(), 'dynamic_int8', 'cpu', modules=('bert',))
+
+
+@pytest.mark.skipif(not os.environ.get('KOKORO_MODEL_TESTS'),
+                    reason='需要下载Kokoro权重，设置 KOKORO_MODEL_TESTS=1 运行')
+def test_kmodel_forward_after_quantization():
+    kokoro = pytest.importorskip('kokoro')
+    model = kokoro.KModel(repo_id='hexgrad/Kokoro-82M-v1.1-zh').eval()
+    model = quantize_model(model, 'dynamic_int8', 'cpu')
+    phonemes = ''.join(p for p in 'ni2 hao3' if p in model.vocab)
+    with torch.no_grad():
+        audio = model(phonemes, torch.randn(1, 256))
+    assert audio.numel() > 0
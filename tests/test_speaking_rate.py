@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""语速模型测试"""
+
+import numpy as np
+import pytest
+
+from speaking_rate import SpeakingRateModel
+
+# 每帧0.025秒（24kHz下600个采样点）
+FRAMES_PER_SECOND = 40
+
+
+@pytest.fixture
+def model():
+    return SpeakingRateModel(min_speed=0.5, max_speed=2.0)
+
+
+def _durations():
+    # 3个片段，每个100个符号，speed=1时每个符号5帧，共37.5秒
+    return [np.full(100, 5.0) for _ in range(3)]
+
+
+@pytest.mark.parametrize('target_seconds', [5.0, 10.0])
+def test_unreachable_target_is_saturated(model, target_seconds):
+    base = np.ones(3)
+    scale = model.speed_for_predicted(_durations(), base, target_seconds * FRAMES_PER_SECOND)
+    speeds = np.clip(base * scale, model.min_speed, model.max_speed)
+    assert model.saturated(speeds, faster=True)
+    assert not model.saturated(speeds, faster=False)
+
+    # 语速已到上限，能达到的时长远长于目标
+    frames = sum(np.maximum(1, np.round(d / s)).sum() for d, s in zip(_durations(), speeds))
+    achieved = frames / FRAMES_PER_SECOND
+    assert achieved > target_seconds * 1.5
+    assert not model.target_met(achieved, target_seconds)
+
+
+def test_reachable_target_is_not_saturated(model):
+    base = np.ones(3)
+    scale = model.speed_for_predicted(_durations(), base, 30.0 * FRAMES_PER_SECOND)
+    speeds = np.clip(base * scale, model.min_speed, model.max_speed)
+    assert not model.saturated(speeds, faster=True)
+    frames = sum(np.maximum(1, np.round(d / s)).sum() for d, s in zip(_durations(), speeds))
+    assert model.target_met(frames / FRAMES_PER_SECOND, 30.0)
+
+
+def test_slow_limit(model):
+    assert model.saturated([0.5, 0.5], faster=False)
+    assert not model.saturated([0.5, 0.6], faster=False)
+    assert not model.saturated([], faster=True)
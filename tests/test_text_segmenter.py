@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""文本规范化测试"""
+
+import pytest
+
+from text_segmenter import TextNormalizer, number_to_chinese
+
+
+@pytest.fixture(scope='module')
+def normalizer():
+    return TextNormalizer()
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('温度-5℃', '温度负五摄氏度'),
+    ('温度−5℃', '温度负五摄氏度'),
+    ('气温-3.5℃到2℃', '气温负三点五摄氏度到二摄氏度'),
+    ('亏损-¥5', '亏损负五元'),
+    ('亏损¥-5', '亏损负五元'),
+    ('价格¥1,200', '价格一千二百元'),
+    ('重3kg', '重三千克'),
+])
+def test_units_and_currency(normalizer, text, expected):
+    assert normalizer.normalize(text) == expected
+
+
+def test_range_is_not_negative(normalizer):
+    assert '负' not in normalizer.normalize('5-10℃')
+
+
+def test_number_to_chinese_sign():
+    assert number_to_chinese('-12') == '负十二'
+    assert number_to_chinese('−0.5') == '负零点五'
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""TTSEngineManager 调度相关测试（使用不加载模型的假引擎）"""
+
+import asyncio
+import importlib
+import json
+import sys
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from tts_engine_manager import KokoroOnnxEngine, TTSEngine, TTSEngineManager, TTSResult
+from tts_scheduler import CancellationToken
+
+
+class BlockingEngine(TTSEngine):
+    """批量请求阻塞到release被设置，交互请求立即返回"""
+
+    def __init__(self, config):
+        super().__init__(dict(config, device='cpu'))
+        self.release = threading.Event()
+        self.bulk_started = threading.Semaphore(0)
+
+    def initialize(self) -> bool:
+        return True
+
+    def generate(self, text: str, **kwargs) -> TTSResult:
+        if kwargs.get('priority') == 'bulk':
+            self.bulk_started.release()
+            self.release.wait(5)
+        return TTSResult(audio=np.zeros(240, dtype=np.float32), sample_rate=24000,
+                         generation_time=0.0, engine='fake', text_length=len(text), audio_length=0.01)
+
+    def get_available_voices(self):
+        return {}
+
+    def is_ready(self) -> bool:
+        return True
+
+
+@pytest.fixture
+def manager(tmp_path):
+    config_path = tmp_path / 'config.json'
+    config_path.write_text(json.dumps({
+        'default_engine': 'fake',
+        'coalesce_requests': False,
+        'priority_lanes': {'bulk': {'max_concurrency': 1}},
+    }), encoding='utf-8')
+    manager = TTSEngineManager(str(config_path))
+    engine = BlockingEngine({})
+    manager.engines['fake'] = engine
+    manager.replicas['fake'] = [engine]
+    yield manager
+    engine.release.set()
+
+
+def test_interactive_not_queued_behind_bulk(manager):
+    engine = manager.engines['fake']
+    threads = [threading.Thread(target=manager.generate_speech, args=(f'批量{i}',),
+                                kwargs={'priority': 'bulk'}) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    assert engine.bulk_started.acquire(timeout=5)
+
+    start = time.monotonic()
+    result = manager.generate_speech('交互', priority='interactive')
+    assert time.monotonic() - start < 0.5
+    assert result.audio_length > 0
+    lanes = manager.priority_gate.get_stats()['lanes']
+    assert lanes['bulk']['active'] == 1 and lanes['bulk']['waiting'] == 3
+
+    engine.release.set()
+    for thread in threads:
+        thread.join(5)
+    assert manager.priority_gate.get_stats()['lanes']['bulk']['active'] == 0
+
+
+def test_onnx_engine_without_torch(monkeypatch, tmp_path):
+    # sys.modules中为None的模块在导入时抛出ImportError，模拟没有安装PyTorch的环境
+    monkeypatch.setitem(sys.modules, 'torch', None)
+    for name in ('tts_engine_manager', 'voice_cache', 'memory_budget', 'kokoro_quantization'):
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    manager_module = importlib.import_module('tts_engine_manager')
+
+    engine = manager_module.KokoroOnnxEngine({'onnx_path': str(tmp_path / 'kokoro.onnx'),
+                                              'num_threads': 2})
+    assert engine.device == 'cpu'
+    assert manager_module.resolve_device('auto') == 'cpu'
+    with pytest.raises(ValueError):
+        manager_module.resolve_device('cuda')
+    engine.apply_thread_settings()
+    engine.unload()
+    assert 'kokoro_quantization' not in sys.modules
+
+
+@pytest.mark.parametrize('extra', [{}, {'cancel_token': None}])
+def test_astream_early_exit_cancels(manager, monkeypatch, extra):
+    seen = {}
+
+    def fake_stream(text, engine_name=None, **kwargs):
+        seen['token'] = kwargs['cancel_token']
+        for _ in range(3):
+            yield np.zeros(240, dtype=np.float32)
+
+    monkeypatch.setattr(manager, 'stream_speech', fake_stream)
+
+    async def consume_one():
+        async for _ in manager.astream('测试', **extra):
+            break
+
+    asyncio.run(consume_one())
+    assert isinstance(seen['token'], CancellationToken)
+    assert seen['token'].cancelled
+
+
+def test_onnx_unreachable_target_duration(tmp_path, monkeypatch):
+    engine = KokoroOnnxEngine({'onnx_path': str(tmp_path / 'kokoro.onnx')})
+    rate_model = engine.rate_model
+    calls = []
+
+    def fake_segments(text, voice, language, cancel_token=None):
+        yield from [('片段', 'a' * 100)] * 3
+
+    def fake_synthesize(segment_text, phonemes, voice, scale):
+        calls.append(scale)
+        speed = rate_model.speeds(voice, [len(phonemes)], scale)[0]
+        seconds = len(phonemes) * rate_model.seconds_per_phoneme(voice, [len(phonemes)])[0] / speed
+        return np.zeros(int(seconds * engine.sample_rate), dtype=np.float32), []
+
+    monkeypatch.setattr(engine, '_segments', fake_segments)
+    monkeypatch.setattr(engine, '_synthesize', fake_synthesize)
+
+    result = engine.generate('测试', target_duration=1.0)
+    assert result.target_met is False
+    assert result.audio_length > 5.0
+    # 语速已到上限，不做无效的重合成
+    assert len(calls) == 3
+
+    result = engine.generate('测试', target_duration=result.audio_length * 1.5)
+    assert result.target_met is True
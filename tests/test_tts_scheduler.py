@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""优先级调度器测试"""
+
+import threading
+import time
+
+import pytest
+
+from tts_scheduler import CancellationToken, PriorityGate, PriorityScheduler, SynthesisCancelled
+
+
+def test_interactive_jumps_queued_bulk():
+    started, release = threading.Event(), threading.Event()
+    order = []
+
+    def dispatch(payload):
+        if payload == 'blocker':
+            started.set()
+            release.wait(5)
+        order.append(payload)
+        return payload
+
+    scheduler = PriorityScheduler(dispatch, num_workers=1)
+    scheduler.start()
+    try:
+        blocker = scheduler.submit('blocker', priority='bulk')
+        assert started.wait(5)
+        bulk = [scheduler.submit(f'bulk-{i}', priority='bulk') for i in range(3)]
+        interactive = scheduler.submit('interactive', priority='interactive')
+        release.set()
+        assert interactive.result(5) == 'interactive'
+        for future in [blocker, *bulk]:
+            future.result(5)
+    finally:
+        scheduler.stop(5)
+    assert order[:2] == ['blocker', 'interactive']
+    assert scheduler.get_stats()['priority_dispatches'] >= 1
+
+
+def test_bulk_concurrency_leaves_worker_for_interactive():
+    release = threading.Event()
+
+    def dispatch(payload):
+        if payload != 'interactive':
+            release.wait(5)
+        return payload
+
+    scheduler = PriorityScheduler(dispatch, num_workers=2, priorities={'bulk': {'max_concurrency': 1}})
+    scheduler.start()
+    try:
+        bulk = [scheduler.submit(i, priority='bulk') for i in range(4)]
+        # 批量通道只占一个工作线程，交互片段不必等待排队的批量片段
+        assert scheduler.submit('interactive', priority='interactive').result(2) == 'interactive'
+        assert not any(future.done() for future in bulk)
+        release.set()
+        assert [future.result(5) for future in bulk] == [0, 1, 2, 3]
+    finally:
+        scheduler.stop(5)
+
+
+def test_unknown_priority():
+    scheduler = PriorityScheduler(lambda payload: payload)
+    with pytest.raises(ValueError):
+        scheduler.submit('x', priority='urgent')
+
+
+def test_gate_interactive_not_queued_behind_bulk():
+    gate = PriorityGate({'bulk': 1})
+    release = threading.Event()
+    bulk_running = threading.Event()
+
+    def bulk_job():
+        with gate.slot('bulk'):
+            bulk_running.set()
+            release.wait(5)
+
+    threads = [threading.Thread(target=bulk_job) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    try:
+        assert bulk_running.wait(5)
+        # 一个批量任务在合成，其余三个在排队；交互请求立即拿到名额
+        start = time.monotonic()
+        with gate.slot('interactive'):
+            assert time.monotonic() - start < 0.1
+            lanes = gate.get_stats()['lanes']
+            assert lanes['bulk']['active'] == 1
+            assert lanes['interactive']['active'] == 1
+    finally:
+        release.set()
+        for thread in threads:
+            thread.join(5)
+    assert gate.get_stats()['lanes']['bulk']['active'] == 0
+
+
+def test_gate_cancel_while_waiting():
+    gate = PriorityGate({'bulk': 1})
+    token = CancellationToken()
+    with gate.slot('bulk'):
+        token.cancel()
+        with pytest.raises(SynthesisCancelled):
+            with gate.slot('bulk', token):
+                pass
+    assert gate.get_stats()['lanes']['bulk'] == {'max_concurrency': 1, 'active': 0, 'waiting': 0}
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""音色目录测试"""
+
+import json
+import threading
+
+from voice_validator import VoiceCatalog, VoiceFileInfo
+
+
+def test_refresh_rescans_only_when_stale(tmp_path, monkeypatch):
+    catalog = VoiceCatalog(str(tmp_path))
+    scans = []
+    original = catalog._scan
+    monkeypatch.setattr(catalog, '_scan', lambda *args: scans.append(1) or original(*args))
+
+    catalog.refresh(max_age=60)
+    catalog.refresh(max_age=60)
+    catalog.available()
+    assert len(scans) == 1
+
+    catalog.refresh(max_age=0)
+    assert len(scans) == 2
+
+
+def test_concurrent_cache_writes(tmp_path, capsys):
+    catalog = VoiceCatalog(str(tmp_path))
+    entries = {f'zf_{i:03d}': VoiceFileInfo(name=f'zf_{i:03d}', size=1, mtime_ns=1, valid=True)
+               for i in range(50)}
+    barrier = threading.Barrier(8)
+
+    def write():
+        barrier.wait()
+        for _ in range(20):
+            catalog._save_cache(entries)
+
+    threads = [threading.Thread(target=write) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert '无法写入' not in capsys.readouterr().out
+    with open(catalog.cache_path, encoding='utf-8') as f:
+        assert len(json.load(f)['voices']) == 50
+    assert not list(tmp_path.glob('.*.tmp'))
@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文本规范化与智能分段
+在送入KPipeline之前规范化数字、日期、单位，并按标点和从句边界
+把中英文文本切分为音素长度受控的片段
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+# Kokoro训练数据大多在 ~100 个音素以内，更长的片段会出现"抢读"
+DEFAULT_MAX_PHONEMES = 100
+# KModel 上下文长度为 512，去掉首尾两个边界token
+MODEL_MAX_PHONEMES = 510
+
+CN_DIGITS = '零一二三四五六七八九'
+CN_SMALL_UNITS = ['', '十', '百', '千']
+CN_LARGE_UNITS = ['', '万', '亿', '万亿']
+
+# 度量单位 (按长度降序匹配，避免 "m" 抢先匹配 "mm")
+UNIT_NAMES = {
+    'km/h': '公里每小时',
+    'm/s': '米每秒',
+    'km²': '平方公里',
+    'm²': '平方米',
+    'm³': '立方米',
+    'km': '公里',
+    'cm': '厘米',
+    'mm': '毫米',
+    'kg': '千克',
+    'mg': '毫克',
+    'ml': '毫升',
+    'mL': '毫升',
+    'GB': 'G',
+    'MB': '兆',
+    'KB': 'K',
+    'TB': 'T',
+    'Hz': '赫兹',
+    'kHz': '千赫兹',
+    'kW': '千瓦',
+    'kWh': '千瓦时',
+    '℃': '摄氏度',
+    '°C': '摄氏度',
+    '°F': '华氏度',
+    '°': '度',
+    'g': '克',
+    'm': '米',
+    'L': '升',
+    's': '秒',
+    'h': '小时',
+}
+
+CURRENCY_NAMES = {
+    '¥': '元',
+    '￥': '元',
+    '$': '美元',
+    '€': '欧元',
+    '£': '英镑',
+}
+
+# 句末标点与从句标点
+SENTENCE_PUNCTUATION = '。！？!?；;…'
+CLAUSE_PUNCTUATION = '，、,：:—'
+CLOSING_PUNCTUATION = '"\'”’」』）)】》'
+
+_CJK_RE = re.compile(r'[一-鿿]')
+_FULLWIDTH_DIGITS = str.maketrans('０１２３４５６７８９．％', '0123456789.%')
+
+
+def int_to_chinese(num: int) -> str:
+    """整数转中文读法，如 10086 -> 一万零八十六"""
+    if num == 0:
+        return CN_DIGITS[0]
+    if num < 0:
+        return '负' + int_to_chinese(-num)
+
+    groups = []
+    while num > 0:
+        groups.append(num % 10000)
+        num //= 10000
+
+    result = ''
+    need_zero = False
+    for i in range(len(groups) - 1, -1, -1):
+        group = groups[i]
+        if group == 0:
+            need_zero = bool(result)
+            continue
+        if result and (need_zero or group < 1000):
+            result += CN_DIGITS[0]
+        result += _group_to_chinese(group) + CN_LARGE_UNITS[i]
+        need_zero = False
+
+    # "一十二" 读作 "十二"
+    if result.startswith('一十'):
+        result = result[1:]
+    return result
+
+
+def _group_to_chinese(group: int) -> str:
+    """四位以内的数字转中文"""
+    digits = f'{group:04d}'
+    result = ''
+    zero = False
+    for pos, ch in enumerate(digits):
+        d = int(ch)
+        if d == 0:
+            zero = bool(result)
+            continue
+        if zero:
+            result += CN_DIGITS[0]
+            zero = False
+        result += CN_DIGITS[d] + CN_SMALL_UNITS[3 - pos]
+    return result
+
+
+def digits_to_chinese(digits: str) -> str:
+    """逐位读数字，如 2024 -> 二零二四"""
+    return ''.join(CN_DIGITS[int(d)] for d in digits if d.isdigit())
+
+
+def number_to_chinese(number: str) -> str:
+    """读数字串，支持小数、前导零和超长数字"""
+    number = number.replace(',', '')
+    negative = number.startswith(('-', '−'))
+    if negative:
+        number = number[1:]
+
+    if '.' in number:
+        integer, decimal = number.split('.', 1)
+        result = int_to_chinese(int(integer or '0')) + '点' + digits_to_chinese(decimal)
+    elif len(number) > 1 and number.startswith('0') or len(number) >= 11:
+        # 编号、电话号码等逐位读
+        result = digits_to_chinese(number)
+    else:
+        result = int_to_chinese(int(number))
+
+    return ('负' + result) if negative else result
+
+
+class TextNormalizer:
+    """中文文本规范化：数字、日期、时间、百分比、货币和度量单位"""
+
+    _DATE_RE = re.compile(r'(\d{4})\s*[-/.年]\s*(\d{1,2})\s*[-/.月]\s*(\d{1,2})\s*[日号]?')
+    _YEAR_RE = re.compile(r'(\d{4})\s*年')
+    _MONTH_DAY_RE = re.compile(r'(\d{1,2})\s*月\s*(\d{1,2})\s*[日号]')
+    _TIME_RE = re.compile(r'(?<![\d:])(\d{1,2}):(\d{2})(?::(\d{2}))?(?![\d:])')
+    _PERCENT_RE = re.compile(r'(-?\d+(?:\.\d+)?)\s*%')
+    _RANGE_RE = re.compile(r'(\d+(?:\.\d+)?)\s*[-~～]\s*(\d+(?:\.\d+)?)')
+    _NUMBER_RE = re.compile(r'(?<![A-Za-z\d.])-?\d{1,3}(?:,\d{3})+(?:\.\d+)?|(?<![A-Za-z\d.])-?\d+(?:\.\d+)?')
+
+    def __init__(self):
+        units = sorted(UNIT_NAMES, key=len, reverse=True)
+        unit_pattern = '|'.join(re.escape(u) for u in units)
+        # 单位后不能紧跟字母，避免把 "5 more" 读成 "五米ore"；
+        # 负号前不能是数字，"5-10℃" 是范围而不是 "5" 和 "-10℃"
+        self._unit_re = re.compile(
+            rf'((?:(?<![\d.])[-−])?\d+(?:\.\d+)?)\s*({unit_pattern})(?![A-Za-z])')
+        currencies = '|'.join(re.escape(c) for c in CURRENCY_NAMES)
+        # 负号可以写在货币符号前或后: "-¥5"、"¥-5"
+        self._currency_re = re.compile(
+            rf'((?<![\d.])[-−])?({currencies})\s*([-−]?\d+(?:,\d{{3}})*(?:\.\d+)?)')
+
+    def normalize(self, text: str) -> str:
+        """规范化文本"""
+        if not text:
+            return ''
+
+        text = text.translate(_FULLWIDTH_DIGITS)
+        text = self._DATE_RE.sub(self._replace_date, text)
+        text = self._YEAR_RE.sub(lambda m: digits_to_chinese(m.group(1)) + '年', text)
+        text = self._MONTH_DAY_RE.sub(
+            lambda m: f'{int_to_chinese(int(m.group(1)))}月{int_to_chinese(int(m.group(2)))}日', text)
+        text = self._TIME_RE.sub(self._replace_time, text)
+        text = self._PERCENT_RE.sub(lambda m: '百分之' + number_to_chinese(m.group(1)), text)
+        text = self._currency_re.sub(self._replace_currency, text)
+        text = self._unit_re.sub(
+            lambda m: number_to_chinese(m.group(1)) + UNIT_NAMES[m.group(2)], text)
+        text = self._RANGE_RE.sub(
+            lambda m: f'{number_to_chinese(m.group(1))}到{number_to_chinese(m.group(2))}', text)
+        text = self._NUMBER_RE.sub(lambda m: number_to_chinese(m.group(0)), text)
+        return text
+
+    @staticmethod
+    def _replace_date(match) -> str:
+        year, month, day = match.groups()
+        return (f'{digits_to_chinese(year)}年{int_to_chinese(int(month))}月'
+                f'{int_to_chinese(int(day))}日')
+
+    @staticmethod
+    def _replace_currency(match) -> str:
+        sign, currency, number = match.groups()
+        if sign:
+            number = '-' + number.lstrip('-−')
+        return number_to_chinese(number) + CURRENCY_NAMES[currency]
+
+    @staticmethod
+    def _replace_time(match) -> str:
+        hour, minute, second = match.groups()
+        result = f'{int_to_chinese(int(hour))}点'
+        if int(minute) > 0:
+            result += f'{int_to_chinese(int(minute))}分'
+        if second and int(second) > 0:
+            result += f'{int_to_chinese(int(second))}秒'
+        return result
+
+
+def estimate_phoneme_length(text: str) -> int:
+    """
+    估算文本的音素数量（与送入模型的音素串长度同一量级）
+
+    中文每个汉字约3个音素（声母、韵母、声调），英文按字母数估算，
+    标点和空格各计1个
+    """
+    length = 0
+    for ch in text:
+        if _CJK_RE.match(ch):
+            length += 3
+        elif not ch.isspace() or length:
+            length += 1
+    return length
+
+
+@dataclass
+class TextSegment:
+    """分段结果"""
+    text: str
+    index: int
+    paragraph: int
+    length: int = 0
+
+
+class TextSegmenter:
+    """按标点和从句边界切分文本，使每段音素数量不超过max_phonemes"""
+
+    def __init__(self, max_phonemes: int = DEFAULT_MAX_PHONEMES,
+                 normalize: bool = True, merge_short: bool = True,
+                 length_fn: Optional[Callable[[str], int]] = None):
+        self.max_phonemes = max(1, min(max_phonemes, MODEL_MAX_PHONEMES))
+        self.normalizer = TextNormalizer() if normalize else None
+        self.merge_short = merge_short
+        self.length_fn = length_fn or estimate_phoneme_length
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any],
+                    length_fn: Optional[Callable[[str], int]] = None) -> 'TextSegmenter':
+        """从配置字典创建分段器"""
+        return cls(
+            max_phonemes=config.get('max_phonemes', DEFAULT_MAX_PHONEMES),
+            normalize=config.get('normalize', True),
+            merge_short=config.get('merge_short', True),
+            length_fn=length_fn
+        )
+
+    def segment(self, text: str, normalize: Optional[bool] = None) -> List[TextSegment]:
+        """
+        切分文本
+
+        Args:
+            text: 输入文本，空行或换行视为段落边界
+            normalize: 是否规范化数字等，None时使用构造参数
+
+        Returns:
+            List[TextSegment]: 按原文顺序排列的片段
+        """
+        if normalize is None:
+            normalize = self.normalizer is not None
+        if normalize:
+            text = (self.normalizer or TextNormalizer()).normalize(text)
+
+        segments = []
+        paragraphs = [p.strip() for p in re.split(r'\n+', text) if p.strip()]
+        for paragraph_index, paragraph in enumerate(paragraphs):
+            pieces = []
+            for sentence in self.split_sentences(paragraph):
+                pieces.extend(self._split_long(sentence))
+            if self.merge_short:
+                pieces = self._merge(pieces)
+            for piece in pieces:
+                segments.append(TextSegment(
+                    text=piece,
+                    index=len(segments),
+                    paragraph=paragraph_index,
+                    length=self.length_fn(piece)
+                ))
+        return segments
+
+    @staticmethod
+    def split_sentences(text: str) -> List[str]:
+        """在句末标点处切分，标点和后随的引号括号保留在句尾"""
+        return TextSegmenter._split_at(text, SENTENCE_PUNCTUATION, english_period=True)
+
+    @staticmethod
+    def split_clauses(text: str) -> List[str]:
+        """在逗号、顿号、冒号等从句标点处切分"""
+        return TextSegmenter._split_at(text, CLAUSE_PUNCTUATION)
+
+    @staticmethod
+    def _split_at(text: str, marks: str, english_period: bool = False) -> List[str]:
+        pieces = []
+        start = 0
+        i = 0
+        n = len(text)
+        while i < n:
+            ch = text[i]
+            is_break = ch in marks
+            # 英文句号只在后接空白或结尾时算句末，避免切开小数和缩写
+            if english_period and ch == '.':
+                is_break = i + 1 >= n or text[i + 1].isspace()
+            if ch == ',' and i + 1 < n and text[i + 1].isdigit():
+                is_break = False
+            if is_break:
+                j = i + 1
+                while j < n and (text[j] in marks or text[j] in CLOSING_PUNCTUATION):
+                    j += 1
+                piece = text[start:j].strip()
+                if piece:
+                    pieces.append(piece)
+                start = i = j
+                continue
+            i += 1
+        tail = text[start:].strip()
+        if tail:
+            pieces.append(tail)
+        return pieces
+
+    def _split_long(self, sentence: str) -> List[str]:
+        """超长句子先按从句标点切，仍超长则按空白或字符硬切"""
+        if self.length_fn(sentence) <= self.max_phonemes:
+            return [sentence]
+
+        pieces = []
+        for clause in self.split_clauses(sentence):
+            if self.length_fn(clause) <= self.max_phonemes:
+                pieces.append(clause)
+            else:
+                pieces.extend(self._hard_split(clause))
+        return self._merge(pieces)
+
+    def _hard_split(self, text: str) -> List[str]:
+        """没有可用标点时，在词边界（英文空格）或汉字之间切分"""
+        tokens = re.findall(r'[A-Za-z\'\-]+\s*|\s+|.', text)
+        pieces = []
+        current = ''
+        for token in tokens:
+            candidate = current + token
+            if current and self.length_fn(candidate) > self.max_phonemes:
+                pieces.append(current.strip())
+                current = token
+            else:
+                current = candidate
+        if current.strip():
+            pieces.append(current.strip())
+        return pieces
+
+    def _merge(self, pieces: List[str]) -> List[str]:
+        """贪心合并相邻短片段，减少过碎的片段带来的停顿和调度开销"""
+        merged = []
+        for piece in pieces:
+            if merged:
+                joiner = ' ' if re.match(r'[A-Za-z]', piece) and re.search(r'[A-Za-z.,!?;:]$', merged[-1]) else ''
+                candidate = merged[-1] + joiner + piece
+                if self.length_fn(candidate) <= self.max_phonemes:
+                    merged[-1] = candidate
+                    continue
+            merged.append(piece)
+        return merged
+
+
+class IncrementalTextBuffer:
+    """
+    增量文本缓冲
+
+    LLM逐token产出的文本片段先放入缓冲，遇到句末标点即切出整句送去合成；
+    缓冲已足够长时在从句标点处提前切出，降低首段音频的延迟
+    """
+
+    def __init__(self, min_clause_length: int = 24, max_length: int = DEFAULT_MAX_PHONEMES,
+                 length_fn: Optional[Callable[[str], int]] = None):
+        """
+        Args:
+            min_clause_length: 在从句标点处切出所需的最小长度（估算音素数）
+            max_length: 缓冲超过该长度仍无标点时整体切出，交给分段器继续切分
+            length_fn: 长度估算函数
+        """
+        self.min_clause_length = min_clause_length
+        self.max_length = max_length
+        self.length_fn = length_fn or estimate_phoneme_length
+        self._buffer = ''
+
+    def push(self, fragment: str) -> List[str]:
+        """追加文本片段，返回已完整、可以合成的文本"""
+        self._buffer += fragment
+        ready = []
+        while True:
+            cut = self._find_boundary()
+            if cut is None:
+                break
+            text, self._buffer = self._buffer[:cut].strip(), self._buffer[cut:]
+            if text:
+                ready.append(text)
+        return ready
+
+    def flush(self) -> Optional[str]:
+        """取出缓冲中剩余的文本"""
+        text, self._buffer = self._buffer.strip(), ''
+        return text or None
+
+    def clear(self):
+        """丢弃缓冲"""
+        self._buffer = ''
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def _find_boundary(self) -> Optional[int]:
+        """返回第一个可切分位置（切分点之后的下标），没有则返回None"""
+        text = self._buffer
+        n = len(text)
+        for i, ch in enumerate(text):
+            is_sentence = ch in SENTENCE_PUNCTUATION or ch == '.'
+            is_clause = ch in CLAUSE_PUNCTUATION
+            if not (is_sentence or is_clause):
+                continue
+            # 半角 . , : 需要看到下一个字符，才能排除 3.14、1,000、10:30 这类数字
+            if ch in '.,:':
+                if i + 1 >= n:
+                    return None
+                if text[i + 1].isdigit() or (ch == '.' and not text[i + 1].isspace()):
+                    continue
+            if is_clause and self.length_fn(text[:i + 1]) < self.min_clause_length:
+                continue
+            j = i + 1
+            while j < n and (text[j] in SENTENCE_PUNCTUATION or text[j] in CLOSING_PUNCTUATION):
+                j += 1
+            return j
+
+        if self.length_fn(text) > self.max_length:
+            return n
+        return None
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TTS吞吐量基准测试
+扫描 (副本数 × 每副本线程数) 的组合，在并发负载下测量吞吐量和延迟，
+找出当前机器上吞吐量最优的部署布局
+"""
+
+import os
+import gc
+import json
+import time
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from tts_engine_manager import TTSEngineManager
+
+# 基准语料：长短混合，接近线上请求分布
+BENCHMARK_TEXTS = [
+    "你好，欢迎使用语音合成系统。",
+    "今天天气很好，我们一起去公园散步吧。",
+    "请注意，列车即将进站，请站在黄色安全线以内。",
+    "Kokoro 是一系列体积虽小但功能强大的 TTS 模型。",
+    "该模型是经过短期训练的结果，从专业数据集中添加了100名中文使用者。",
+    "由于该模型删除了许多声音，因此它并不是对其前身的严格升级，但它提前发布以收集有关新声音和标记化的反馈。",
+]
+
+
+def _write_layout_config(config: Dict[str, Any], engine_name: str, instances: int,
+                         threads: int, devices: Optional[List[str]] = None) -> str:
+    """
+    生成只启用目标引擎、并覆盖副本数和线程数的临时配置文件，instances为每个设备上的副本数；
+    同时关闭请求合并、优先级通道限流、合成缓存和预渲染库
+    """
+    layout = json.loads(json.dumps(config))
+    for name, engine_config in layout.get('tts_engines', {}).items():
+        engine_config['enabled'] = name == engine_name
+    engine_config = layout['tts_engines'][engine_name]
+    engine_config['instances'] = instances
+    engine_config['num_threads'] = threads
+    if devices:
+        engine_config['devices'] = devices
+    if 'intra_op_threads' in engine_config:
+        engine_config['intra_op_threads'] = threads
+    # 相同的压测文本会被请求合并或缓存命中，关闭后才是各布局真实的合成吞吐
+    layout['coalesce_requests'] = False
+    # 优先级通道的并发上限会限制压测并发，测的是布局本身的吞吐
+    layout['priority_lanes'] = {'enabled': False}
+    for section in ('audio_cache', 'prerendered_store'):
+        layout.setdefault(section, {})['enabled'] = False
+
+    fd, path = tempfile.mkstemp(suffix='.json', prefix='tts_layout_')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(layout, f, ensure_ascii=False)
+    return path
+
+
+def run_layout(config: Dict[str, Any], engine_name: str, instances: int, threads: int,
+               num_requests: int, concurrency: int, voice: str,
+               texts: List[str], devices: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+    """在一个布局下跑并发负载，返回吞吐量和延迟统计"""
+    config_path = _write_layout_config(config, engine_name, instances, threads, devices)
+    manager = TTSEngineManager(config_path)
+    try:
+        if not manager.initialize_engines([engine_name]).get(engine_name):
+            return None
+
+        # 每个副本预热一次
+        for engine in manager.replicas[engine_name]:
+            engine.generate(texts[0], voice=voice)
+
+        latencies: List[float] = []
+        audio_seconds = [0.0]
+        lock = threading.Lock()
+        counter = iter(range(num_requests))
+
+        def client():
+            while True:
+                with lock:
+                    index = next(counter, None)
+                if index is None:
+                    return
+                start = time.perf_counter()
+                result = manager.generate_speech(texts[index % len(texts)], engine_name, voice=voice)
+                elapsed = time.perf_counter() - start
+                with lock:
+                    latencies.append(elapsed)
+                    audio_seconds[0] += result.audio_length
+
+        wall_start = time.perf_counter()
+        clients = [threading.Thread(target=client) for _ in range(concurrency)]
+        for thread in clients:
+            thread.start()
+        for thread in clients:
+            thread.join()
+        wall_time = time.perf_counter() - wall_start
+
+        # 各副本处理的请求数，检查按排队深度的负载均衡是否均匀
+        served = {}
+        for engine in manager.replicas[engine_name]:
+            served[f'{engine.replica_id}@{engine.device}'] = engine.served_requests
+        return {
+            'instances': instances,
+            'threads': threads,
+            'devices': sorted({engine.device for engine in manager.replicas[engine_name]}),
+            'served_per_replica': served,
+            'concurrency': concurrency,
+            'requests': len(latencies),
+            'wall_time': wall_time,
+            'requests_per_second': len(latencies) / wall_time,
+            'audio_seconds_per_second': audio_seconds[0] / wall_time,
+            'latency_p50': float(np.percentile(latencies, 50)),
+            'latency_p95': float(np.percentile(latencies, 95)),
+        }
+    finally:
+        manager.shutdown()
+        del manager
+        gc.collect()
+        os.remove(config_path)
+
+
+def sweep(config_path: str = 'tts_config.json', engine_name: str = 'kokoro',
+          instances_list: Optional[List[int]] = None, threads_list: Optional[List[int]] = None,
+          num_requests: int = 24, concurrency: Optional[int] = None, voice: str = 'zf_001',
+          max_total_threads: Optional[int] = None,
+          devices: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    扫描所有 (副本数, 线程数) 组合
+
+    Args:
+        instances_list: 待测的每设备副本数
+        threads_list: 待测每副本intra-op线程数
+        concurrency: 并发客户端数，None时为副本数的2倍
+        max_total_threads: 跳过 副本数×线程数 超过该值的组合，默认CPU核数
+        devices: 覆盖配置中的设备列表，如 ["cpu", "cpu"] 或 ["cuda:0", "cuda:1"]
+
+    Returns:
+        List[Dict[str, Any]]: 各布局的统计，按吞吐量降序
+    """
+    with open(config_path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+
+    cpu_count = os.cpu_count() or 1
+    max_total_threads = max_total_threads or cpu_count
+    instances_list = instances_list or [1, 2, 4]
+    threads_list = threads_list or sorted({1, 2, 4, max(1, cpu_count // 2), cpu_count})
+
+    results = []
+    num_devices = len(devices) if devices else 1
+    for instances in instances_list:
+        for threads in threads_list:
+            replicas = instances * num_devices
+            if replicas * threads > max_total_threads:
+                print(f"⏭️  跳过 {replicas}×{threads}: 超过 {max_total_threads} 个线程")
+                continue
+            print(f"\n⏱️  测试布局: {replicas} 个副本 × {threads} 线程")
+            stats = run_layout(config, engine_name, instances, threads, num_requests,
+                               concurrency or replicas * 2, voice, BENCHMARK_TEXTS, devices)
+            if stats is None:
+                print("❌ 引擎初始化失败，跳过")
+                continue
+            print(f"   吞吐: {stats['audio_seconds_per_second']:.2f} 音频秒/秒, "
+                  f"{stats['requests_per_second']:.2f} 请求/秒, "
+                  f"P50 {stats['latency_p50']:.2f}s, P95 {stats['latency_p95']:.2f}s")
+            results.append(stats)
+
+    results.sort(key=lambda r: r['audio_seconds_per_second'], reverse=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='扫描副本数×线程数，寻找吞吐量最优布局')
+    parser.add_argument('--config', default='tts_config.json', help='配置文件路径')
+    parser.add_argument('--engine', '-e', default='kokoro', help='测试的引擎')
+    parser.add_argument('--instances', type=int, nargs='+', help='待测的每设备副本数，如 1 2 4')
+    parser.add_argument('--devices', nargs='+', help='副本设备列表，如 cpu cpu 或 cuda:0 cuda:1')
+    parser.add_argument('--threads', type=int, nargs='+', help='待测每副本线程数，如 1 2 4 8')
+    parser.add_argument('--requests', type=int, default=24, help='每个布局的请求总数')
+    parser.add_argument('--concurrency', type=int, help='并发客户端数，默认副本数×2')
+    parser.add_argument('--max-total-threads', type=int, help='总线程数上限，默认CPU核数')
+    parser.add_argument('--voice', '-v', default='zf_001', help='测试音色')
+    parser.add_argument('--output', '-o', help='结果JSON输出路径')
+    args = parser.parse_args()
+
+    results = sweep(args.config, args.engine, args.instances, args.threads, args.requests,
+                    args.concurrency, args.voice, args.max_total_threads, args.devices)
+    if not results:
+        print("❌ 没有成功的布局")
+        return
+
+    print("\n📊 布局排名 (按音频吞吐量)")
+    print("=" * 60)
+    for i, r in enumerate(results, 1):
+        print(f"  {i}. {r['instances']}×{r['threads']}: {r['audio_seconds_per_second']:.2f} 音频秒/秒 | "
+              f"P50 {r['latency_p50']:.2f}s | P95 {r['latency_p95']:.2f}s")
+    best = results[0]
+    print(f"\n🌟 推荐配置: \"instances\": {best['instances']}, \"num_threads\": {best['threads']}")
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"💾 结果已保存: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
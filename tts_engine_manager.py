@@ -9,20 +9,44 @@ import os
 import sys
 import json
 import time
-import torch
+import asyncio
+import threading
+import contextlib
 import numpy as np
-import soundfile as sf
 from pathlib import Path
-from typing import Dict, Any, Optional, List, Tuple
-from dataclasses import dataclass
+from typing import (Dict, Any, Optional, List, Tuple, Iterator, AsyncIterator, Iterable, Union,
+                    Sequence)
+from dataclasses import dataclass, replace, asdict
 from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from text_segmenter import TextSegmenter, TextSegment, MODEL_MAX_PHONEMES
+from tts_scheduler import (PriorityScheduler, PriorityGate, DEFAULT_PRIORITY, CancellationToken,
+                           SharedCancellationToken, SynthesisCancelled)
+from voice_cache import (VoiceStyleCache, load_voice_file, is_voice_mix, parse_voice_mix,
+                         canonical_voice)
+from audio_cache import (PrerenderedAudioStore, AudioCacheBackend, create_audio_cache,
+                         make_cache_key)
+from audio_processing import (StreamingResampler, resample, AudioPostProcessor,
+                              StreamingPostProcessor, AudioAssembler)
+from memory_budget import MemoryBudget, module_bytes, process_rss_bytes, release_memory
+from voice_validator import VoiceCatalog
+from speaking_rate import SpeakingRateModel, CALIBRATION_LENGTHS, CALIBRATION_TEXT
 
 # 添加stable_tts_module到路径
 sys.path.append(str(Path(__file__).parent / 'stable_tts_module'))
 
+@dataclass
+class TimedToken:
+    """带起止时间（秒）的文本单元，kind为 segment（分段）/ word（单词）/ phoneme（音素）"""
+    text: str
+    start: float
+    end: float
+    kind: str = 'phoneme'
+
 @dataclass
 class TTSResult:
-    """TTS生成结果"""
+    """TTS生成结果，timestamps为None表示没有时间信息（如缓存命中或引擎不支持）"""
     audio: np.ndarray
     sample_rate: int
     generation_time: float
@@ -30,17 +54,209 @@ class TTSResult:
     voice: Optional[str] = None
     text_length: int = 0
     audio_length: float = 0.0
+    timestamps: Optional[List[TimedToken]] = None
+    # 指定target_duration时实际时长是否在容差内；False表示语速已到上下限仍达不到目标
+    target_met: Optional[bool] = None
+
+def shift_timestamps(tokens: Optional[List[TimedToken]], offset: float,
+                     duration: Optional[float] = None) -> Optional[List[TimedToken]]:
+    """把时间戳整体平移offset秒，并裁剪到 [0, duration]"""
+    if tokens is None:
+        return None
+    limit = float('inf') if duration is None else duration
+    return [replace(token, start=min(max(token.start + offset, 0.0), limit),
+                    end=min(max(token.end + offset, 0.0), limit))
+            for token in tokens]
+
+def timestamps_to_dict(tokens: Optional[List[TimedToken]]) -> Optional[Dict[str, List[Dict[str, Any]]]]:
+    """按类型分组并转换为可JSON序列化的字典: {"segments": [...], "words": [...], "phonemes": [...]}"""
+    if tokens is None:
+        return None
+    grouped = {'segments': [], 'words': [], 'phonemes': []}
+    for token in tokens:
+        item = asdict(token)
+        item.pop('kind')
+        item['start'], item['end'] = round(item['start'], 3), round(item['end'], 3)
+        grouped[f'{token.kind}s'].append(item)
+    return grouped
+    
+def to_numpy(audio) -> np.ndarray:
+    """把pipeline输出的音频张量转换为numpy数组"""
+    # 没有导入过torch时不可能收到张量
+    torch = sys.modules.get('torch')
+    if torch is not None and torch.is_tensor(audio):
+        return audio.detach().cpu().numpy()
+    return np.asarray(audio)
+
+# Kokoro解码器每帧输出的采样点数（24kHz）
+FRAME_SAMPLES = 600
+
+# 标记当前线程是否为asyncio接口线程池的工作线程
+_async_worker = threading.local()
+
+
+def _mark_async_worker():
+    _async_worker.active = True
+
+@dataclass
+class SegmentJob:
+    """待合成的单个片段"""
+    text: str
+    voice: str
+    language: str
+    speed: Any = 1.0
+    phonemes: Optional[str] = None
+    length: int = 0
+    cancel_token: Optional[CancellationToken] = None
+
+@dataclass
+class SegmentAudio:
+    """单个片段的合成结果，pred_dur为时长预测器输出的每个输入符号的帧数（含首尾的边界符）"""
+    text: str
+    phonemes: str
+    audio: np.ndarray
+    pred_dur: Optional[Any] = None
+    tokens: Optional[List[Any]] = None
+    
+    def timestamps(self, offset: float, sample_rate: int,
+                   vocab: Optional[Dict[str, int]] = None) -> List[TimedToken]:
+        """
+        由时长预测结果推出本片段的时间戳，offset为片段在整段音频中的起始秒数
+        
+        模型会丢弃词表外的音素，预测的帧数与去掉这些音素后的输入一一对应；
+        帧边界按实际音频长度缩放，不依赖每帧的采样点数
+        """
+        duration = len(self.audio) / sample_rate
+        timed = [TimedToken(self.text, offset, offset + duration, 'segment')]
+        # 英文pipeline已经按同样的时长预测给出了单词级时间
+        for token in self.tokens or []:
+            if getattr(token, 'start_ts', None) is not None and getattr(token, 'end_ts', None) is not None:
+                timed.append(TimedToken(token.text, offset + token.start_ts,
+                                        offset + token.end_ts, 'word'))
+        if self.pred_dur is None or not self.phonemes:
+            return timed
+        
+        phonemes = [p for p in self.phonemes if vocab is None or p in vocab]
+        frames = to_numpy(self.pred_dur).astype(np.float64).reshape(-1)
+        if len(frames) != len(phonemes) + 2 or frames.sum() <= 0:
+            return timed
+        edges = offset + np.concatenate([[0.0], np.cumsum(frames)]) * (duration / frames.sum())
+        # frames[0] 是起始边界符，第i个音素对应 frames[i + 1]
+        timed.extend(TimedToken(p, float(edges[i + 1]), float(edges[i + 2]), 'phoneme')
+                     for i, p in enumerate(phonemes) if not p.isspace())
+        return timed
+
+def optional_torch():
+    """按需导入torch，未安装时返回None；ONNX引擎在没有PyTorch的环境也能运行"""
+    try:
+        import torch
+    except ImportError:
+        return None
+    return torch
+
+def resolve_device(device: Optional[str] = 'auto') -> str:
+    """
+    解析设备名: 'auto' 优先CUDA，其次CPU；'cuda' / 'cuda:N' / 'mps' / 'cpu' 原样使用
+    
+    指定的加速器不存在时抛出ValueError，由调用方决定跳过还是回退
+    """
+    device = str(device or 'auto').strip().lower()
+    torch = optional_torch() if device != 'cpu' else None
+    if device == 'auto':
+        return 'cuda' if torch is not None and torch.cuda.is_available() else 'cpu'
+    if device.startswith('cuda'):
+        if torch is None or not torch.cuda.is_available():
+            raise ValueError(f"CUDA不可用，无法使用设备 {device}")
+        index = device.partition(':')[2]
+        if index and (not index.isdigit() or int(index) >= torch.cuda.device_count()):
+            raise ValueError(f"设备 {device} 不存在，共有 {torch.cuda.device_count()} 块GPU")
+    elif device == 'mps':
+        if torch is None or not (hasattr(torch.backends, 'mps') and torch.backends.mps.is_available()):
+            raise ValueError("MPS不可用")
+    elif device != 'cpu':
+        raise ValueError(f"未知的设备: {device}")
+    return device
+
+def categorize_voices(names) -> Dict[str, List[str]]:
+    """按前缀把音色名分为女声、男声和英文"""
+    voices = {
+        'female': [],
+        'male': [],
+        'english': []
+    }
+    
+    for name in names:
+        if name.startswith('zf_'):
+            voices['female'].append(name)
+        elif name.startswith('zm_'):
+            voices['male'].append(name)
+        elif name.startswith(('af_', 'bf_')):
+            voices['english'].append(name)
+    
+    # 排序
+    for category in voices:
+        voices[category].sort()
     
+    return voices
+
 class TTSEngine(ABC):
     """TTS引擎抽象基类"""
     
+    # 能否由时长预测结果给出时间戳
+    provides_timestamps = False
+    # generate的默认参数，计算缓存键时补齐，省略参数和显式传入默认值的请求得到同一个键
+    default_params: Dict[str, Any] = {}
+    
     def __init__(self, config: Dict[str, Any]):
         self.config = config
         self.enabled = config.get('enabled', True)
         self.sample_rate = config.get('sample_rate', 24000)
         self.description = config.get('description', '')
         self.supported_languages = config.get('supported_languages', [])
-        self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        # 管理器为每个副本填入具体设备
+        self.device = resolve_device(config.get('device', 'auto'))
+        # 每个副本固定的intra-op线程预算，None表示沿用PyTorch默认值
+        self.num_threads = config.get('num_threads')
+        self.replica_id = 0
+        self.active_requests = 0
+        self.served_requests = 0
+        # 取消统计：被取消的请求数，以及因此免于合成的片段数和音素数
+        self._cancel_lock = threading.Lock()
+        self.cancel_stats = {'cancelled_requests': 0, 'skipped_segments': 0, 'skipped_phonemes': 0}
+        
+    def apply_thread_settings(self):
+        """在当前线程应用本引擎的intra-op线程数，避免多个请求争抢同一批核心"""
+        if not self.num_threads and not self.device.startswith('cuda:'):
+            return
+        torch = optional_torch()
+        if torch is None:
+            return
+        if self.num_threads and torch.get_num_threads() != self.num_threads:
+            torch.set_num_threads(self.num_threads)
+        # 多GPU时让本线程上未显式指定设备的CUDA操作也落在本副本的GPU上
+        if self.device.startswith('cuda:') and torch.cuda.current_device() != torch.device(self.device).index:
+            torch.cuda.set_device(self.device)
+    
+    def check_target_duration(self, actual: float, **kwargs) -> Optional[bool]:
+        """
+        指定了target_duration时返回实际时长是否在容差内，没有指定时返回None
+
+        达不到时（语速已到上下限）打印目标和实际可达的时长，而不是静默返回
+        """
+        target_duration = kwargs.get('target_duration')
+        rate_model = getattr(self, 'rate_model', None)
+        if not target_duration or rate_model is None:
+            return None
+        met = rate_model.target_met(actual, target_duration, kwargs.get('duration_tolerance'))
+        if not met:
+            print(f"⚠️  无法达到目标时长 {target_duration:.2f}s（语速范围 "
+                  f"{rate_model.min_speed}-{rate_model.max_speed}），实际 {actual:.2f}s")
+        return met
+    
+    def queue_depth(self) -> int:
+        """排队深度：进行中的请求数，加上调度器中尚未派发的片段数"""
+        scheduler = getattr(self, 'scheduler', None)
+        return self.active_requests + (scheduler.pending() if scheduler is not None else 0)
         
     @abstractmethod
     def initialize(self) -> bool:
@@ -52,6 +268,31 @@ class TTSEngine(ABC):
         """生成语音"""
         pass
         
+    def stream(self, text: str, **kwargs) -> Iterator[np.ndarray]:
+        """逐段产出音频"""
+        for audio, _ in self.stream_timed(text, **kwargs):
+            yield audio
+    
+    def stream_timed(self, text: str, 
+                     **kwargs) -> Iterator[Tuple[np.ndarray, Optional[List[TimedToken]]]]:
+        """逐段产出 (音频, 相对本块起点的时间戳)，不支持分段的引擎一次产出完整结果"""
+        result = self.generate(text, **kwargs)
+        yield result.audio, result.timestamps
+    
+    def record_cancellation(self, requests: int = 0, segments: int = 0, phonemes: int = 0):
+        """记录取消带来的节省"""
+        with self._cancel_lock:
+            self.cancel_stats['cancelled_requests'] += requests
+            self.cancel_stats['skipped_segments'] += segments
+            self.cancel_stats['skipped_phonemes'] += phonemes
+    
+    def check_cancelled(self, cancel_token: Optional[CancellationToken], 
+                        remaining: int = 0, phonemes: int = 0):
+        """已取消时记录剩余未合成的工作量并抛出SynthesisCancelled"""
+        if cancel_token is not None and cancel_token.cancelled:
+            self.record_cancellation(1, remaining, phonemes)
+            cancel_token.raise_if_cancelled()
+        
     @abstractmethod
     def get_available_voices(self) -> Dict[str, List[str]]:
         """获取可用音色"""
@@ -61,27 +302,68 @@ class TTSEngine(ABC):
     def is_ready(self) -> bool:
         """检查引擎是否准备就绪"""
         pass
+    
+    def shutdown(self):
+        """释放后台线程等资源"""
+        pass
+    
+    def memory_footprint(self) -> int:
+        """模型等常驻内存的估计字节数"""
+        return 0
+    
+    def unload(self):
+        """释放模型占用的内存，之后可再次调用initialize()重新加载"""
+        self.shutdown()
+        self.release_models()
+        release_memory(self.device)
+    
+    def release_models(self):
+        """丢弃模型引用，由unload调用"""
+        pass
 
 class KokoroEngine(TTSEngine):
     """Kokoro TTS引擎"""
     
+    provides_timestamps = True
+    default_params = {'voice': 'zf_001', 'language': 'zh'}
+    
     def __init__(self, config: Dict[str, Any]):
         super().__init__(config)
         self.model = None
         self.zh_pipeline = None
         self.en_pipelines = None
         self.repo_id = config.get('repo_id', 'hexgrad/Kokoro-82M-v1.1-zh')
+        self.quantize = config.get('quantize', 'none')
+        # 只量化这些子模块，解码器默认保持fp32
+        self.quantize_modules = config.get('quantize_modules')
+        self.segmentation_config = config.get('segmentation', {})
+        self.segmenter = TextSegmenter.from_config(self.segmentation_config)
+        self.scheduler_config = config.get('scheduler', {})
+        self.scheduler = None
+        self.voice_cache = None
+        self.voice_catalog: Optional[VoiceCatalog] = None
+        # 按音色和音素数补偿长片段的"抢读"
+        self.rate_model = SpeakingRateModel.from_config(config.get('speaking_rate', {}))
+        self.duration_stats = {'targeted_requests': 0, 'corrected_requests': 0}
+        self._duration_lock = threading.Lock()
         
     def initialize(self) -> bool:
         """初始化Kokoro引擎"""
         try:
             from kokoro import KModel, KPipeline
+            from kokoro_quantization import quantize_model
             
             print(f"🚀 正在初始化Kokoro引擎... (设备: {self.device})")
             
             # 加载模型
             self.model = KModel(repo_id=self.repo_id).to(self.device).eval()
             
+            # 可选的动态INT8量化 (仅CPU)，需在创建pipeline之前完成
+            if self.quantize not in (None, 'none'):
+                self.model = quantize_model(self.model, self.quantize, self.device,
+                                            self.quantize_modules)
+                print(f"⚙️  模型量化模式: {self.quantize}")
+            
             # 初始化中文pipeline
             en_pipeline = KPipeline(lang_code='a', repo_id=self.repo_id, model=False)
             def en_callable(text):
@@ -99,6 +381,22 @@ class KokoroEngine(TTSEngine):
                                          repo_id=self.repo_id, model=self.model) 
                                for british in (False, True)]
             
+            # 设备常驻的音色风格表缓存
+            voice_cache_config = self.config.get('voice_cache', {})
+            self.voice_cache = VoiceStyleCache.from_config(
+                voice_cache_config,
+                loader=lambda voice: load_voice_file(voice, fallback=self.zh_pipeline.load_voice),
+                device=self.device)
+            if voice_cache_config.get('preload_hot', True):
+                self.voice_cache.preload()
+            
+            # 按优先级分道的片段调度器
+            if self.scheduler_config.get('enabled', False):
+                self.scheduler = PriorityScheduler.from_config(
+                    self.scheduler_config, self.dispatch_job,
+                    initializer=self.apply_thread_settings)
+                self.scheduler.start()
+            
             print("✅ Kokoro引擎初始化完成")
             return True
             
@@ -109,32 +407,194 @@ class KokoroEngine(TTSEngine):
             print(f"❌ Kokoro引擎初始化失败: {str(e)}")
             return False
     
+    def is_chinese(self, voice: str, language: str = 'zh') -> bool:
+        """判断是否走中文pipeline"""
+        return language == 'zh' or voice.startswith(('zf_', 'zm_'))
+    
+    def segment_text(self, text: str, voice: str = 'zf_001', 
+                     language: str = 'zh') -> List[TextSegment]:
+        """切分文本，中文同时规范化数字、日期和单位"""
+        if not self.segmentation_config.get('enabled', True):
+            return [TextSegment(text=text, index=0, paragraph=0,
+                                length=self.segmenter.length_fn(text))]
+        # 英文的数字读法由misaki的英文G2P处理
+        return self.segmenter.segment(text, normalize=self.is_chinese(voice, language)
+                                      and self.segmenter.normalizer is not None)
+    
+    def prepare_segment(self, segment: TextSegment, voice: str = 'zf_001', 
+                        language: str = 'zh', speed: float = 1.0,
+                        cancel_token: Optional[CancellationToken] = None) -> SegmentJob:
+        """为片段做G2P，得到送入模型的音素串和长度，speed由assign_speeds统一设置"""
+        phonemes = None
+        length = segment.length
+        if self.is_chinese(voice, language):
+            phonemes, _ = self.zh_pipeline.g2p(segment.text)
+            if len(phonemes) > MODEL_MAX_PHONEMES:
+                print(f"⚠️  片段音素数 {len(phonemes)} 超过 {MODEL_MAX_PHONEMES}，已截断")
+                phonemes = phonemes[:MODEL_MAX_PHONEMES]
+            length = len(phonemes)
+        return SegmentJob(text=segment.text, voice=voice, language=language,
+                          speed=speed, phonemes=phonemes, length=length,
+                          cancel_token=cancel_token)
+    
+    def assign_speeds(self, jobs: List[SegmentJob], voice: str, speed: Optional[float] = None,
+                      target_duration: Optional[float] = None) -> float:
+        """
+        一次算出一批片段的speed，返回整体语速倍率
+        
+        target_duration指定时由时长预测器反推倍率（见fit_target_duration），忽略speed。
+        中文片段已有音素串，按语速模型补偿长度；英文片段由KPipeline自行G2P，只使用倍率
+        """
+        lengths = [job.length for job in jobs]
+        if target_duration:
+            speed = self.fit_target_duration(jobs, voice, target_duration)
+        speed = speed or 1.0
+        for job, value in zip(jobs, self.rate_model.speeds(voice, lengths, speed)):
+            job.speed = float(value) if job.phonemes is not None else speed
+        return speed
+    
+    def predict_durations(self, jobs: List[SegmentJob]) -> List[Optional[np.ndarray]]:
+        """
+        只运行时长预测部分（BERT、文本编码器和时长LSTM，不经过解码器），
+        得到speed=1时每个输入符号（含首尾边界符）取整前的帧数；英文片段没有音素串，返回None
+        """
+        import torch
+        model = self.model
+        durations = []
+        self.apply_thread_settings()
+        with torch.no_grad():
+            for job in jobs:
+                if job.phonemes is None or not job.phonemes:
+                    durations.append(None if job.phonemes is None else np.zeros(0))
+                    continue
+                # 与KModel.forward_with_tokens相同，单条输入没有padding
+                ids = [i for i in map(model.vocab.get, job.phonemes) if i is not None]
+                input_ids = torch.LongTensor([[0, *ids, 0]]).to(self.device)
+                input_lengths = torch.full((1,), input_ids.shape[-1], device=self.device,
+                                           dtype=torch.long)
+                text_mask = torch.zeros_like(input_ids, dtype=torch.bool)
+                ref_s = self.voice_cache.style(job.voice, len(job.phonemes))
+                bert_dur = model.bert(input_ids, attention_mask=(~text_mask).int())
+                d_en = model.bert_encoder(bert_dur).transpose(-1, -2)
+                d = model.predictor.text_encoder(d_en, ref_s[:, 128:], input_lengths, text_mask)
+                x, _ = model.predictor.lstm(d)
+                duration = torch.sigmoid(model.predictor.duration_proj(x)).sum(axis=-1)
+                durations.append(to_numpy(duration).astype(np.float64).reshape(-1))
+        return durations
+    
+    def fit_target_duration(self, jobs: List[SegmentJob], voice: str,
+                            target_duration: float) -> float:
+        """
+        一次前向的时长预测反推语速倍率，使合成后的总时长接近target_duration（秒）
+        
+        英文片段和没有时长预测器的模型按语速模型的每音素秒数估算
+        """
+        if target_duration <= 0:
+            raise ValueError(f"目标时长必须为正数: {target_duration}")
+        lengths = [job.length for job in jobs]
+        if not hasattr(self.model, 'predictor'):
+            return self.rate_model.speed_for_duration(voice, lengths, target_duration)
+        
+        base = self.rate_model.speeds(voice, lengths)
+        durations = self.predict_durations(jobs)
+        for i, job in enumerate(jobs):
+            if durations[i] is None:
+                seconds = self.rate_model.predict_duration(voice, [job.length], [1.0])
+                durations[i] = np.array([seconds * self.sample_rate / FRAME_SAMPLES])
+                base[i] = 1.0
+        return self.rate_model.speed_for_predicted(durations, base,
+                                                   target_duration * self.sample_rate / FRAME_SAMPLES)
+    
+    def calibrate_speaking_rate(self, voices: Optional[List[str]] = None,
+                                lengths: Sequence[int] = CALIBRATION_LENGTHS,
+                                save: bool = True) -> Dict[str, Dict[str, list]]:
+        """
+        以speed=1实测各音色在不同音素长度上的每音素秒数，写入语速模型的速率表
+        
+        只校准走中文pipeline的音色，英文片段只使用语速倍率
+        """
+        if voices is None:
+            voices = [voice for names in self.get_available_voices().values() for voice in names
+                      if self.is_chinese(voice, language='')]
+        phonemes, _ = self.zh_pipeline.g2p(CALIBRATION_TEXT)
+        probe = phonemes * (MODEL_MAX_PHONEMES // len(phonemes) + 1)
+        lengths = [n for n in lengths if 0 < n <= MODEL_MAX_PHONEMES]
+        self.apply_thread_settings()
+        
+        def measure(voice, n):
+            output = self.model(probe[:n], self.voice_cache.style(voice, n), 1.0, return_output=True)
+            return len(output.audio) / self.sample_rate
+        
+        table = {}
+        for voice in voices:
+            table[voice] = self.rate_model.calibrate(voice, lambda n: measure(voice, n), lengths)
+        if save and self.rate_model.rate_table_path is not None:
+            self.rate_model.save()
+        return table
+    
+    def dispatch_job(self, job: SegmentJob) -> List[SegmentAudio]:
+        """调度器派发的单个片段，返回一个或多个音频块；已取消请求的片段直接跳过"""
+        if job.cancel_token is not None and job.cancel_token.cancelled:
+            self.record_cancellation(segments=1, phonemes=job.length)
+            return []
+        return self._synthesize_job(job)
+    
+    def _synthesize_job(self, job: SegmentJob) -> List[SegmentAudio]:
+        """合成单个片段"""
+        if job.phonemes is not None:
+            if not job.phonemes:
+                return []
+            # 与KPipeline.infer一致: 按音素数选择风格向量，风格表常驻设备无需拷贝
+            ref_s = self.voice_cache.style(job.voice, len(job.phonemes))
+            output = self.model(job.phonemes, ref_s, job.speed, return_output=True)
+            return [SegmentAudio(text=job.text, phonemes=job.phonemes,
+                                 audio=to_numpy(output.audio), pred_dur=output.pred_dur)]
+        
+        british = job.voice.startswith('bf_')
+        voice = job.voice
+        if is_voice_mix(voice):
+            # KPipeline不支持带权重的混合写法，直接传入CPU上的混合风格表
+            voice = self.voice_cache.get_table(voice).cpu()
+        return [SegmentAudio(text=result.graphemes, phonemes=result.phonemes,
+                             audio=to_numpy(result.audio), pred_dur=result.pred_dur,
+                             tokens=result.tokens)
+                for result in self.en_pipelines[british](job.text, voice=voice, speed=job.speed)
+                if result.audio is not None]
+    
     def generate(self, text: str, voice: str = 'zf_001', language: str = 'zh', 
                 **kwargs) -> TTSResult:
-        """生成语音"""
-        start_time = time.time()
+        """
+        生成语音，按分段顺序逐段送入pipeline后拼接
         
-        def speed_callable(len_ps):
-            speed = 0.8
-            if len_ps <= 83:
-                speed = 1
-            elif len_ps < 183:
-                speed = 1 - (len_ps - 83) / 500
-            return speed * 1.1
+        voice可以是单个音色，也可以是混合描述如 'zf_001:0.6,zf_004:0.4'；
+        speed为语速倍率；target_duration（秒）指定时由时长预测器反推语速只合成一次，
+        实际时长误差超过duration_tolerance时才修正重合成一次
+        """
+        start_time = time.time()
+        cancel_token = kwargs.get('cancel_token')
         
         try:
-            if language == 'zh' or voice.startswith(('zf_', 'zm_')):
-                # 中文生成
-                generator = self.zh_pipeline(text, voice=voice, speed=speed_callable)
-                result = next(generator)
-                wav = result.audio
-            else:
-                # 英文生成
-                british = voice.startswith('bf_')
-                generator = self.en_pipelines[british](text, voice=voice)
-                result = next(generator)
-                wav = result.audio
+            segments = self.segment_text(text, voice, language)
+            jobs = []
+            for i, segment in enumerate(segments):
+                self.check_cancelled(cancel_token, len(segments) - i)
+                jobs.append(self.prepare_segment(segment, voice, language,
+                                                 cancel_token=cancel_token))
+            scale = self.assign_speeds(jobs, voice, kwargs.get('speed'),
+                                       kwargs.get('target_duration'))
             
+            chunks = self._run_jobs(jobs, **kwargs)
+            if kwargs.get('target_duration'):
+                chunks = self._correct_duration(jobs, chunks, voice, scale, **kwargs)
+            
+            pieces = [piece for pieces in chunks for piece in pieces]
+            wav = (np.concatenate([piece.audio for piece in pieces]) if pieces
+                   else np.zeros(0, dtype=np.float32))
+            timestamps, offset = [], 0
+            for piece in pieces:
+                timestamps.extend(piece.timestamps(offset / self.sample_rate, self.sample_rate,
+                                                   self.vocab))
+                offset += len(piece.audio)
             generation_time = time.time() - start_time
             
             return TTSResult(
@@ -144,46 +604,375 @@ class KokoroEngine(TTSEngine):
                 engine='kokoro',
                 voice=voice,
                 text_length=len(text),
-                audio_length=len(wav) / self.sample_rate
+                audio_length=len(wav) / self.sample_rate,
+                timestamps=timestamps,
+                target_met=self.check_target_duration(len(wav) / self.sample_rate, **kwargs)
             )
             
+        except SynthesisCancelled:
+            raise
         except Exception as e:
             raise Exception(f"Kokoro生成失败: {str(e)}")
     
-    def get_available_voices(self) -> Dict[str, List[str]]:
-        """获取可用音色"""
-        voices_dir = Path(__file__).parent / 'voices'
-        if not voices_dir.exists():
-            return {'female': [], 'male': [], 'english': []}
+    def _run_jobs(self, jobs: List[SegmentJob], **kwargs) -> List[List[SegmentAudio]]:
+        """合成一批片段，有调度器时交给调度器派发"""
+        cancel_token = kwargs.get('cancel_token')
+        if self.scheduler is not None:
+            # 各片段进入所在优先级通道排队，高优先级请求可以插到排队的片段之前
+            futures = [self.scheduler.submit(job, job.length,
+                                             priority=kwargs.get('priority', DEFAULT_PRIORITY))
+                       for job in jobs]
+            chunks = []
+            for future in futures:
+                if cancel_token is not None and cancel_token.cancelled:
+                    # 仍在排队的片段直接撤销，已派发的由dispatch_job跳过
+                    skipped = [job for job, f in zip(jobs, futures) if f.cancel()]
+                    self.check_cancelled(cancel_token, len(skipped),
+                                         sum(job.length for job in skipped))
+                chunks.append(future.result())
+        else:
+            self.apply_thread_settings()
+            chunks = []
+            for i, job in enumerate(jobs):
+                self.check_cancelled(cancel_token, len(jobs) - i,
+                                     sum(job.length for job in jobs[i:]))
+                chunks.append(self._synthesize_job(job))
+        return chunks
+    
+    def _correct_duration(self, jobs: List[SegmentJob], chunks: List[List[SegmentAudio]], voice: str,
+                          scale: float, **kwargs) -> List[List[SegmentAudio]]:
+        """实际时长与目标的相对误差超过容差时，按实测偏差缩放语速重新合成一次，取更接近的结果"""
+        target_duration = kwargs['target_duration']
+        tolerance = kwargs.get('duration_tolerance', self.rate_model.duration_tolerance)
+        actual = sum(len(piece.audio) for pieces in chunks for piece in pieces) / self.sample_rate
+        corrected = actual > 0 and abs(actual / target_duration - 1) > tolerance
+        with self._duration_lock:
+            self.duration_stats['targeted_requests'] += 1
+            self.duration_stats['corrected_requests'] += int(corrected)
+        if not corrected:
+            return chunks
+        if self.rate_model.saturated([job.speed for job in jobs], faster=actual > target_duration):
+            # 语速已到上下限，重合成得到的还是同样的时长
+            return chunks
         
-        voice_files = list(voices_dir.glob('*.pt'))
+        self.assign_speeds(jobs, voice, scale * actual / target_duration)
+        retry = self._run_jobs(jobs, **kwargs)
+        retry_actual = sum(len(piece.audio) for pieces in retry for piece in pieces) / self.sample_rate
+        return retry if abs(retry_actual - target_duration) < abs(actual - target_duration) else chunks
+    
+    def stream_timed(self, text: str, voice: str = 'zf_001', language: str = 'zh', 
+                     **kwargs) -> Iterator[Tuple[np.ndarray, Optional[List[TimedToken]]]]:
+        """
+        逐段生成语音，每个片段合成完立即产出 (音频, 时间戳)
         
-        voices = {
-            'female': [],
-            'male': [],
-            'english': []
-        }
+        G2P和合成都是惰性的，调用方停止迭代（或关闭生成器）或取消令牌后
+        不再合成后续片段。指定target_duration时先对全部片段做G2P和时长预测，
+        已产出的音频无法重新合成，因此不做修正
+        """
+        cancel_token = kwargs.get('cancel_token')
+        speed = kwargs.get('speed')
+        segments = self.segment_text(text, voice, language)
+        jobs = None
+        if kwargs.get('target_duration'):
+            # 反推语速需要全部片段的音素数，先完成G2P
+            jobs = [self.prepare_segment(segment, voice, language, cancel_token=cancel_token)
+                    for segment in segments]
+            speed = self.assign_speeds(jobs, voice, speed, kwargs['target_duration'])
+        for i, segment in enumerate(segments):
+            self.check_cancelled(cancel_token, len(segments) - i)
+            if jobs is not None:
+                job = jobs[i]
+            else:
+                job = self.prepare_segment(segment, voice, language, cancel_token=cancel_token)
+                self.assign_speeds([job], voice, speed)
+            if self.scheduler is not None:
+                pieces = self.scheduler.submit(job, job.length,
+                                               priority=kwargs.get('priority', DEFAULT_PRIORITY)).result()
+            else:
+                self.apply_thread_settings()
+                pieces = self._synthesize_job(job)
+            self.check_cancelled(cancel_token, len(segments) - i - 1)
+            for piece in pieces:
+                yield piece.audio, piece.timestamps(0.0, self.sample_rate, self.vocab)
+    
+    @property
+    def vocab(self) -> Optional[Dict[str, int]]:
+        """模型词表，用于把时长预测结果对齐到音素"""
+        return getattr(self.model, 'vocab', None)
+    
+    def get_available_voices(self) -> Dict[str, List[str]]:
+        """获取可用音色，按音色目录过滤掉损坏的文件"""
+        if self.voice_catalog is None:
+            self.voice_catalog = VoiceCatalog(str(Path(__file__).parent / 'voices'))
+        self.voice_catalog.refresh()
+        return categorize_voices(self.voice_catalog.available())
+    
+    def is_ready(self) -> bool:
+        """检查引擎是否准备就绪"""
+        return self.model is not None and self.zh_pipeline is not None
+    
+    def shutdown(self):
+        """停止调度器"""
+        if self.scheduler is not None:
+            self.scheduler.stop()
+            self.scheduler = None
+    
+    def memory_footprint(self) -> int:
+        """模型参数加上设备常驻的音色风格表"""
+        voices = self.voice_cache.memory_bytes() if self.voice_cache is not None else 0
+        return module_bytes(self.model) + voices
+    
+    def release_models(self):
+        """pipeline也持有模型引用，一并丢弃"""
+        self.model = None
+        self.zh_pipeline = None
+        self.en_pipelines = None
+        self.voice_cache = None
+
+class KokoroOnnxEngine(TTSEngine):
+    """基于onnxruntime的Kokoro引擎，运行export_kokoro.py导出的模型 (CPU)"""
+    
+    provides_timestamps = True
+    default_params = {'voice': 'zf_001', 'language': 'zh'}
+    
+    def __init__(self, config: Dict[str, Any]):
+        super().__init__(config)
+        self.device = 'cpu'
+        self.session = None
+        self.zh_g2p = None
+        self.en_g2ps = None
+        self.vocab: Dict[str, int] = {}
+        self.voices: Dict[str, np.ndarray] = {}
+        self.onnx_path = Path(config.get('onnx_path', './exports/kokoro.onnx'))
+        self.vocab_path = Path(config.get('vocab_path', self.onnx_path.parent / 'vocab.json'))
+        self.voices_dir = Path(config.get('voices_dir', self.onnx_path.parent / 'voices'))
+        self.intra_op_threads = config.get('intra_op_threads', self.num_threads or 0)
+        self.inter_op_threads = config.get('inter_op_threads', 0)
+        self.segmenter = TextSegmenter.from_config(config.get('segmentation', {}))
+        self.rate_model = SpeakingRateModel.from_config(config.get('speaking_rate', {}))
+        self.duration_stats = {'targeted_requests': 0, 'corrected_requests': 0}
+        self._duration_lock = threading.Lock()
+    
+    def initialize(self) -> bool:
+        """初始化onnxruntime会话和G2P"""
+        try:
+            import onnxruntime as ort
+            from misaki import en, zh
+            
+            print(f"🚀 正在初始化Kokoro ONNX引擎... (模型: {self.onnx_path})")
+            
+            if not self.onnx_path.exists():
+                print(f"❌ ONNX模型文件不存在: {self.onnx_path}")
+                return False
+            
+            options = ort.SessionOptions()
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            # 0 表示由onnxruntime自行决定线程数
+            options.intra_op_num_threads = self.intra_op_threads
+            options.inter_op_num_threads = self.inter_op_threads
+            if self.inter_op_threads > 1:
+                options.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+            self.session = ort.InferenceSession(str(self.onnx_path), options,
+                                                providers=['CPUExecutionProvider'])
+            
+            with open(self.vocab_path, 'r', encoding='utf-8') as f:
+                self.vocab = json.load(f)
+            
+            self.en_g2ps = [en.G2P(trf=False, british=british, fallback=None)
+                            for british in (False, True)]
+            def en_callable(text):
+                if text == 'Kokoro':
+                    return 'kˈOkəɹO'
+                elif text == 'Sol':
+                    return 'sˈOl'
+                return self.en_g2ps[0](text)[0]
+            self.zh_g2p = zh.ZHG2P(version='1.1', en_callable=en_callable)
+            
+            print("✅ Kokoro ONNX引擎初始化完成")
+            return True
+            
+        except ImportError as e:
+            print(f"❌ onnxruntime或misaki未安装: {str(e)}")
+            return False
+        except Exception as e:
+            print(f"❌ Kokoro ONNX引擎初始化失败: {str(e)}")
+            return False
+    
+    def _load_voice(self, voice: str) -> np.ndarray:
+        """加载.npy音色包 [510, 1, 256]，混合音色描述按权重对各音色包加权求和后缓存"""
+        voice = canonical_voice(voice)
+        if voice not in self.voices:
+            if is_voice_mix(voice):
+                mix = parse_voice_mix(voice)
+                stacked = np.stack([np.asarray(self._load_voice(name), dtype=np.float32)
+                                    for name, _ in mix])
+                weights = np.array([weight for _, weight in mix], dtype=np.float32)
+                return self.voices.setdefault(voice, np.tensordot(weights, stacked, axes=1))
+            voice_file = self.voices_dir / f'{voice}.npy'
+            if not voice_file.exists():
+                raise Exception(f"音色不存在: {voice_file}")
+            self.voices[voice] = np.load(voice_file, mmap_mode='r')
+        return self.voices[voice]
+    
+    def _phonemize(self, text: str, voice: str, language: str) -> str:
+        """G2P得到音素串"""
+        if language == 'zh' or voice.startswith(('zf_', 'zm_')):
+            phonemes, _ = self.zh_g2p(text)
+        else:
+            phonemes, _ = self.en_g2ps[voice.startswith('bf_')](text)
+        return phonemes[:MODEL_MAX_PHONEMES]
+    
+    def _segments(self, text: str, voice: str, language: str,
+                  cancel_token: Optional[CancellationToken] = None) -> Iterator[Tuple[str, str]]:
+        """惰性分段并G2P，产出 (片段文本, 音素串)，跳过没有音素的片段"""
+        chinese = language == 'zh' or voice.startswith(('zf_', 'zm_'))
+        segments = self.segmenter.segment(text, normalize=chinese)
+        for i, segment in enumerate(segments):
+            self.check_cancelled(cancel_token, len(segments) - i)
+            phonemes = self._phonemize(segment.text, voice, language)
+            if phonemes:
+                yield segment.text, phonemes
+    
+    def _synthesize(self, segment_text: str, phonemes: str, voice: str,
+                    scale: float) -> Tuple[np.ndarray, List[TimedToken]]:
+        """合成单个片段，speed为语速模型补偿后再乘整体倍率scale"""
+        pack = self._load_voice(voice)
+        input_ids = [0, *(self.vocab[p] for p in phonemes if p in self.vocab), 0]
+        audio, pred_dur = self.session.run(None, {
+            'input_ids': np.array([input_ids], dtype=np.int64),
+            'ref_s': np.asarray(pack[len(phonemes) - 1], dtype=np.float32).reshape(1, -1),
+            'speed': self.rate_model.speeds(voice, [len(phonemes)], scale).astype(np.float32),
+        })
+        piece = SegmentAudio(text=segment_text, phonemes=phonemes, audio=audio, pred_dur=pred_dur)
+        return audio, piece.timestamps(0.0, self.sample_rate, self.vocab)
+    
+    def _speed_scale(self, segments: List[Tuple[str, str]], voice: str, **kwargs) -> float:
+        """
+        整体语速倍率；指定target_duration时按语速模型的每音素秒数反推
+        （导出的ONNX图只有完整前向，无法单独运行时长预测器）
+        """
+        if kwargs.get('target_duration'):
+            return self.rate_model.speed_for_duration(voice, [len(p) for _, p in segments],
+                                                      kwargs['target_duration'])
+        return kwargs.get('speed') or 1.0
+    
+    def _render(self, segments: List[Tuple[str, str]], voice: str, scale: float,
+                cancel_token: Optional[CancellationToken] = None
+                ) -> List[Tuple[np.ndarray, List[TimedToken]]]:
+        """合成全部片段"""
+        pieces = []
+        for i, (segment_text, phonemes) in enumerate(segments):
+            self.check_cancelled(cancel_token, len(segments) - i,
+                                 sum(len(p) for _, p in segments[i:]))
+            pieces.append(self._synthesize(segment_text, phonemes, voice, scale))
+        return pieces
+    
+    def _correct_duration(self, pieces: List[Tuple[np.ndarray, List[TimedToken]]],
+                          segments: List[Tuple[str, str]], voice: str, scale: float,
+                          **kwargs) -> List[Tuple[np.ndarray, List[TimedToken]]]:
+        """与KokoroEngine相同：误差超过容差时按实测偏差缩放语速重合成一次，取更接近的结果"""
+        target_duration = kwargs['target_duration']
+        tolerance = kwargs.get('duration_tolerance', self.rate_model.duration_tolerance)
+        actual = sum(len(audio) for audio, _ in pieces) / self.sample_rate
+        corrected = actual > 0 and abs(actual / target_duration - 1) > tolerance
+        with self._duration_lock:
+            self.duration_stats['targeted_requests'] += 1
+            self.duration_stats['corrected_requests'] += int(corrected)
+        if not corrected:
+            return pieces
+        speeds = self.rate_model.speeds(voice, [len(p) for _, p in segments], scale)
+        if self.rate_model.saturated(speeds, faster=actual > target_duration):
+            # 语速已到上下限，重合成得到的还是同样的时长
+            return pieces
         
-        for voice_file in voice_files:
-            name = voice_file.stem
-            if name.startswith('zf_'):
-                voices['female'].append(name)
-            elif name.startswith('zm_'):
-                voices['male'].append(name)
-            elif name.startswith(('af_', 'bf_')):
-                voices['english'].append(name)
+        retry = self._render(segments, voice, scale * actual / target_duration,
+                             kwargs.get('cancel_token'))
+        retry_actual = sum(len(audio) for audio, _ in retry) / self.sample_rate
+        return retry if abs(retry_actual - target_duration) < abs(actual - target_duration) else pieces
+    
+    def generate(self, text: str, voice: str = 'zf_001', language: str = 'zh', 
+                **kwargs) -> TTSResult:
+        """
+        生成语音
         
-        # 排序
-        for category in voices:
-            voices[category].sort()
+        voice可以是混合描述如 'zf_001:0.6,zf_004:0.4'；target_duration（秒）指定时
+        按语速模型估算语速，误差超过duration_tolerance时修正重合成一次
+        """
+        start_time = time.time()
         
-        return voices
+        try:
+            segments = list(self._segments(text, voice, language, kwargs.get('cancel_token')))
+            scale = self._speed_scale(segments, voice, **kwargs)
+            pieces = self._render(segments, voice, scale, kwargs.get('cancel_token'))
+            if kwargs.get('target_duration'):
+                pieces = self._correct_duration(pieces, segments, voice, scale, **kwargs)
+            
+            wavs, timestamps, offset = [], [], 0
+            for audio, chunk_timestamps in pieces:
+                wavs.append(audio)
+                timestamps.extend(shift_timestamps(chunk_timestamps, offset / self.sample_rate))
+                offset += len(audio)
+            wav = np.concatenate(wavs) if wavs else np.zeros(0, dtype=np.float32)
+            generation_time = time.time() - start_time
+            
+            return TTSResult(
+                audio=wav,
+                sample_rate=self.sample_rate,
+                generation_time=generation_time,
+                engine='kokoro_onnx',
+                voice=voice,
+                text_length=len(text),
+                audio_length=len(wav) / self.sample_rate,
+                timestamps=timestamps,
+                target_met=self.check_target_duration(len(wav) / self.sample_rate, **kwargs)
+            )
+            
+        except SynthesisCancelled:
+            raise
+        except Exception as e:
+            raise Exception(f"Kokoro ONNX生成失败: {str(e)}")
+    
+    def stream_timed(self, text: str, voice: str = 'zf_001', language: str = 'zh', 
+                     **kwargs) -> Iterator[Tuple[np.ndarray, Optional[List[TimedToken]]]]:
+        """
+        逐段生成语音，产出 (音频, 时间戳)
+        
+        指定target_duration时先对全部片段做G2P以估算语速，已产出的音频无法重新合成，因此不做修正
+        """
+        cancel_token = kwargs.get('cancel_token')
+        self._load_voice(voice)
+        segments = self._segments(text, voice, language, cancel_token)
+        scale = kwargs.get('speed') or 1.0
+        if kwargs.get('target_duration'):
+            segments = list(segments)
+            scale = self._speed_scale(segments, voice, **kwargs)
+        for segment_text, phonemes in segments:
+            self.check_cancelled(cancel_token)
+            yield self._synthesize(segment_text, phonemes, voice, scale)
+    
+    def get_available_voices(self) -> Dict[str, List[str]]:
+        """获取已导出的音色"""
+        return categorize_voices(f.stem for f in self.voices_dir.glob('*.npy'))
     
     def is_ready(self) -> bool:
         """检查引擎是否准备就绪"""
-        return self.model is not None and self.zh_pipeline is not Noneclass StableTTSEngine(TTSEngine):
+        return self.session is not None and self.zh_g2p is not None
+    
+    def memory_footprint(self) -> int:
+        """onnxruntime会话的权重约等于模型文件大小，音色包为mmap不计入"""
+        return self.onnx_path.stat().st_size if self.session is not None else 0
+    
+    def release_models(self):
+        self.session = None
+        self.zh_g2p = None
+        self.en_g2ps = None
+        self.voices.clear()
+
+class StableTTSEngine(TTSEngine):
     """StableTTS引擎"""
     
+    default_params = {'language': 'chinese'}
+    
     def __init__(self, config: Dict[str, Any]):
         super().__init__(config)
         self.api_model = None
@@ -246,6 +1035,10 @@ class KokoroEngine(TTSEngine):
         }
         
         try:
+            # 单次推理无法中途打断，只在开始前检查
+            self.check_cancelled(kwargs.get('cancel_token'), 1)
+            self.apply_thread_settings()
+            
             # 检查参考音频文件
             if not Path(ref_audio).exists():
                 raise Exception(f"参考音频文件不存在: {ref_audio}")
@@ -261,10 +1054,7 @@ class KokoroEngine(TTSEngine):
             generation_time = time.time() - start_time
             
             # 转换为numpy数组
-            if torch.is_tensor(audio_output):
-                wav = audio_output.squeeze().numpy()
-            else:
-                wav = np.array(audio_output).squeeze()
+            wav = to_numpy(audio_output).squeeze()
             
             return TTSResult(
                 audio=wav,
@@ -276,6 +1066,8 @@ class KokoroEngine(TTSEngine):
                 audio_length=len(wav) / self.sample_rate
             )
             
+        except SynthesisCancelled:
+            raise
         except Exception as e:
             raise Exception(f"StableTTS生成失败: {str(e)}")
     
@@ -297,6 +1089,22 @@ class KokoroEngine(TTSEngine):
     def is_ready(self) -> bool:
         """检查引擎是否准备就绪"""
         return self.api_model is not None
+    
+    def memory_footprint(self) -> int:
+        """TTS模型和声码器的参数"""
+        torch = sys.modules.get('torch')
+        return (module_bytes(self.api_model)
+                if torch is not None and isinstance(self.api_model, torch.nn.Module) else 0)
+    
+    def release_models(self):
+        self.api_model = None
+
+# 配置中的引擎名 -> 引擎类
+ENGINE_TYPES = {
+    'kokoro': KokoroEngine,
+    'kokoro_onnx': KokoroOnnxEngine,
+    'stable_tts': StableTTSEngine,
+}
 
 class TTSEngineManager:
     """TTS引擎管理器"""
@@ -305,7 +1113,54 @@ class TTSEngineManager:
         self.config_path = config_path
         self.config = self._load_config()
         self.engines: Dict[str, TTSEngine] = {}
+        self.replicas: Dict[str, List[TTSEngine]] = {}
         self.default_engine = self.config.get('default_engine', 'kokoro')
+        self._load_lock = threading.Lock()
+        
+        # 预渲染音频库，命中时无需合成
+        self.prerendered_store: Optional[PrerenderedAudioStore] = None
+        store_config = self.config.get('prerendered_store', {})
+        if store_config.get('enabled', False):
+            self.load_prerendered_store(store_config.get('path', './prerendered'),
+                                        store_config.get('mmap', True))
+        
+        # 合成结果缓存，磁盘后端可在多个worker进程/主机间共享
+        self.audio_cache: Optional[AudioCacheBackend] = None
+        cache_config = self.config.get('audio_cache', {})
+        if cache_config.get('enabled', False):
+            try:
+                self.audio_cache = create_audio_cache(cache_config)
+            except (OSError, ValueError) as e:
+                print(f"❌ 音频缓存初始化失败: {str(e)}")
+        
+        # 相同请求合并：同一缓存键、同一优先级的并发请求只合成一次，其余等待同一结果
+        self.coalesce_requests = self.config.get('coalesce_requests', True)
+        self._inflight: Dict[Tuple[str, str], Tuple[Future, SharedCancellationToken]] = {}
+        self._inflight_lock = threading.Lock()
+        self._coalesce_stats = {'leaders': 0, 'coalesced': 0}
+        
+        # 请求级优先级通道：按通道限制同时合成的请求数，不依赖片段调度器
+        lanes_config = self.config.get('priority_lanes', {})
+        self.priority_gate: Optional[PriorityGate] = None
+        if lanes_config.get('enabled', True):
+            self.priority_gate = PriorityGate.from_config(lanes_config)
+        
+        # 合成结果后处理（静音裁剪、响度归一化、限幅），按采样率懒创建
+        self.postprocess_config = self.config.get('postprocess', {})
+        self._postprocessors: Dict[int, AudioPostProcessor] = {}
+        
+        # asyncio接口使用的线程池，限制同时在事件循环之外执行的合成数；
+        # 长文本的逐句并发使用单独的线程池，池内任务都不再等待其他线程池任务，嵌套调用不会死锁
+        self.async_workers = self.config.get('async_workers', 4)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._long_form_executor: Optional[ThreadPoolExecutor] = None
+        
+        # 内存预算：空闲副本超时卸载、按需重新加载，内存不足时排队或拒绝
+        self.memory_budget: Optional[MemoryBudget] = None
+        budget_config = self.config.get('memory_budget', {})
+        if budget_config.get('enabled', False):
+            self.memory_budget = MemoryBudget.from_config(budget_config)
+            self.memory_budget.start()
         
     def _load_config(self) -> Dict[str, Any]:
         """加载配置文件"""
@@ -319,13 +1174,16 @@ class TTSEngineManager:
             print(f"❌ 配置文件格式错误: {str(e)}")
             return {}
     
-    def initialize_engines(self) -> Dict[str, bool]:
-        """初始化所有启用的引擎"""
+    def initialize_engines(self, engine_names: Optional[List[str]] = None) -> Dict[str, bool]:
+        """初始化所有启用的引擎，engine_names可限定只初始化其中一部分"""
         results = {}
         
         engines_config = self.config.get('tts_engines', {})
         
         for engine_name, engine_config in engines_config.items():
+            if engine_names is not None and engine_name not in engine_names:
+                continue
+            
             if not engine_config.get('enabled', False):
                 print(f"⏭️  跳过未启用的引擎: {engine_name}")
                 results[engine_name] = False
@@ -333,58 +1191,597 @@ class TTSEngineManager:
             
             print(f"\n🔧 正在初始化引擎: {engine_name}")
             
-            try:
-                if engine_name == 'kokoro':
-                    engine = KokoroEngine(engine_config)
-                elif engine_name == 'stable_tts':
-                    engine = StableTTSEngine(engine_config)
-                else:
-                    print(f"❌ 未知的引擎类型: {engine_name}")
-                    results[engine_name] = False
-                    continue
-                
-                if engine.initialize():
-                    self.engines[engine_name] = engine
-                    results[engine_name] = True
-                    print(f"✅ {engine_name} 引擎初始化成功")
-                else:
-                    results[engine_name] = False
-                    print(f"❌ {engine_name} 引擎初始化失败")
-                    
-            except Exception as e:
-                print(f"❌ {engine_name} 引擎初始化异常: {str(e)}")
+            engine_class = ENGINE_TYPES.get(engine_name)
+            if engine_class is None:
+                print(f"❌ 未知的引擎类型: {engine_name}")
+                results[engine_name] = False
+                continue
+            
+            self._configure_interop_threads(engine_config.get('interop_threads'))
+            
+            # devices中每个设备创建instances个副本，每个副本独立加载模型，使用固定的线程预算
+            placements = self._replica_devices(engine_name, engine_config)
+            replicas = []
+            for replica_id, device in enumerate(placements):
+                try:
+                    engine = engine_class(dict(engine_config, device=device))
+                    engine.replica_id = replica_id
+                    rss_before = process_rss_bytes()
+                    if engine.initialize():
+                        replicas.append(engine)
+                        if self.memory_budget is not None:
+                            self.memory_budget.track(engine_name, engine,
+                                                     engine_config.get('memory_estimate_mb', 0.0),
+                                                     max(0, process_rss_bytes() - rss_before))
+                    else:
+                        print(f"❌ {engine_name} 副本 {replica_id} ({device}) 初始化失败")
+                except Exception as e:
+                    print(f"❌ {engine_name} 副本 {replica_id} ({device}) 初始化异常: {str(e)}")
+            
+            if replicas:
+                self.engines[engine_name] = replicas[0]
+                self.replicas[engine_name] = replicas
+                results[engine_name] = True
+                devices = ', '.join(sorted({engine.device for engine in replicas}))
+                print(f"✅ {engine_name} 引擎初始化成功 ({len(replicas)}/{len(placements)} 个副本, "
+                      f"设备: {devices})")
+            else:
                 results[engine_name] = False
+                print(f"❌ {engine_name} 引擎初始化失败")
         
         return results
     
+    def _replica_devices(self, engine_name: str, engine_config: Dict[str, Any]) -> List[str]:
+        """
+        按配置展开每个副本的设备
+        
+        "devices": ["cuda:0", "cuda:1", "cpu"] 每个设备一个副本（同一设备可重复出现），
+        "instances" 为每个设备上的副本数；不可用的设备跳过
+        """
+        devices = engine_config.get('devices') or [engine_config.get('device', 'auto')]
+        if isinstance(devices, str):
+            devices = [devices]
+        instances = max(1, engine_config.get('instances', 1))
+        placements = []
+        for device in devices:
+            try:
+                placements.extend([resolve_device(device)] * instances)
+            except ValueError as e:
+                print(f"⚠️  {engine_name}: 跳过设备 {device}: {str(e)}")
+        return placements
+    
+    def _configure_interop_threads(self, interop_threads: Optional[int]):
+        """设置inter-op线程数，PyTorch只允许在进程内首次并行前设置一次"""
+        torch = optional_torch() if interop_threads else None
+        if torch is None or torch.get_num_interop_threads() == interop_threads:
+            return
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError as e:
+            print(f"⚠️  无法设置inter-op线程数: {str(e)}")
+    
     def get_engine(self, engine_name: str = None) -> Optional[TTSEngine]:
-        """获取指定引擎"""
+        """获取指定引擎，有多个副本时返回排队最浅的副本"""
         if engine_name is None:
             engine_name = self.default_engine
         
-        return self.engines.get(engine_name)
+        replicas = self.replicas.get(engine_name)
+        if not replicas:
+            return self.engines.get(engine_name)
+        with self._load_lock:
+            return min(replicas, key=lambda engine: engine.queue_depth())
+    
+    def _acquire_engine(self, engine_name: str = None) -> TTSEngine:
+        """选出排队最浅的副本并计入一个进行中的请求，选择和计数在同一把锁内完成"""
+        name = engine_name or self.default_engine
+        replicas = self.replicas.get(name) or ([self.engines[name]] if name in self.engines else [])
+        if not replicas:
+            available = ', '.join(self.get_available_engines())
+            raise Exception(f"引擎不可用: {name}. 可用引擎: {available}")
+        with self._load_lock:
+            # 优先已加载的副本，避免在有可用副本时触发重新加载
+            engine = min(replicas, key=lambda engine: (not engine.is_ready(), engine.queue_depth()))
+            engine.active_requests += 1
+            engine.served_requests += 1
+        try:
+            if self.memory_budget is not None:
+                self.memory_budget.acquire(engine)
+        except BaseException:
+            # acquire失败时已撤销预算中的占用，这里只撤销请求计数
+            with self._load_lock:
+                engine.active_requests -= 1
+            raise
+        if not engine.is_ready():
+            self._release_engine(engine)
+            raise Exception(f"引擎未准备就绪: {name}")
+        return engine
+    
+    def _release_engine(self, engine: TTSEngine):
+        with self._load_lock:
+            engine.active_requests -= 1
+        if self.memory_budget is not None:
+            self.memory_budget.release(engine)
     
     def get_available_engines(self) -> List[str]:
         """获取可用的引擎列表"""
         return list(self.engines.keys())
     
-    def generate_speech(self, text: str, engine_name: str = None, **kwargs) -> TTSResult:
-        """生成语音"""
+    def load_prerendered_store(self, path: str, use_mmap: bool = True) -> bool:
+        """内存映射预渲染音频库"""
+        try:
+            self.prerendered_store = PrerenderedAudioStore(path, use_mmap)
+            print(f"📦 已加载预渲染音频库: {path} ({len(self.prerendered_store)} 条)")
+            return True
+        except FileNotFoundError:
+            print(f"⚠️  预渲染音频库不存在: {path}")
+            return False
+        except (OSError, ValueError) as e:
+            print(f"❌ 预渲染音频库加载失败: {str(e)}")
+            return False
+    
+    def cache_key(self, text: str, engine_name: str = None,
+                  params: Optional[Dict[str, Any]] = None) -> str:
+        """请求的缓存键，补齐引擎的默认参数；预渲染和在线请求必须用同一方法计算"""
+        name = engine_name or self.default_engine
+        engine = self.engines.get(name)
+        defaults = engine.default_params if engine is not None else {}
+        merged = dict(defaults)
+        merged.update({k: v for k, v in (params or {}).items() if v is not None})
+        return make_cache_key(name, text, merged)
+    
+    def _lookup_cached(self, key: str, text: str, engine_name: str, 
+                       params: Dict[str, Any]) -> Optional[TTSResult]:
+        """依次在预渲染音频库和合成结果缓存中查找"""
+        audio, sample_rate, voice = None, None, params.get('voice')
+        hit = self.prerendered_store.get(key) if self.prerendered_store is not None else None
+        if hit is not None:
+            audio, entry = hit
+            sample_rate, voice = entry['sample_rate'], entry.get('voice', voice)
+        elif self.audio_cache is not None:
+            cached = self.audio_cache.get(key)
+            if cached is not None:
+                audio, sample_rate = cached
+        if audio is None:
+            return None
+        return TTSResult(
+            audio=audio,
+            sample_rate=sample_rate,
+            generation_time=0.0,
+            engine=engine_name,
+            voice=voice,
+            text_length=len(text),
+            audio_length=len(audio) / sample_rate
+        )
+    
+    def generate_speech(self, text: str, engine_name: str = None, 
+                        output_rate: Optional[int] = None, postprocess: Optional[bool] = None,
+                        timestamps: bool = False, **kwargs) -> TTSResult:
+        """
+        生成语音，优先使用预渲染音频和缓存
+        
+        output_rate指定时把结果重采样到该采样率；postprocess覆盖配置中的后处理开关。
+        缓存和请求合并都针对引擎原生的未处理音频，不同输出参数的请求共享同一份合成结果。
+        缓存中只有音频，timestamps为True且引擎能给出时间戳时跳过缓存重新合成
+        """
+        result = self._generate_native(text, engine_name, timestamps, **kwargs)
+        return self._finalize([result], postprocess, [output_rate])[0]
+    
+    def _skip_cache_for_timestamps(self, timestamps: bool, engine_name: str = None) -> bool:
+        """需要时间戳、而缓存结果没有时间戳但引擎可以给出时，不使用缓存"""
+        if not timestamps:
+            return False
         engine = self.get_engine(engine_name)
-        if engine is None:
-            available = ', '.join(self.get_available_engines())
-            raise Exception(f"引擎不可用: {engine_name or self.default_engine}. 可用引擎: {available}")
+        return engine is not None and engine.provides_timestamps
+    
+    def _postprocess_enabled(self, postprocess: Optional[bool]) -> bool:
+        return self.postprocess_config.get('enabled', False) if postprocess is None else postprocess
+    
+    def _get_postprocessor(self, sample_rate: int) -> AudioPostProcessor:
+        """按采样率获取后处理器"""
+        with self._load_lock:
+            if sample_rate not in self._postprocessors:
+                self._postprocessors[sample_rate] = AudioPostProcessor.from_config(
+                    self.postprocess_config, sample_rate)
+            return self._postprocessors[sample_rate]
+    
+    def _finalize(self, results: List[TTSResult], postprocess: Optional[bool],
+                  output_rates: List[Optional[int]]) -> List[TTSResult]:
+        """后处理（同采样率的结果一批处理）并重采样，返回新的结果对象"""
+        results = list(results)
+        if self._postprocess_enabled(postprocess):
+            for sample_rate in {result.sample_rate for result in results}:
+                indices = [i for i, result in enumerate(results) if result.sample_rate == sample_rate]
+                processed, offsets = self._get_postprocessor(sample_rate).process_batch_with_offsets(
+                    [results[i].audio for i in indices])
+                for i, audio, offset in zip(indices, processed, offsets):
+                    # 开头裁掉的静音使时间戳整体提前
+                    results[i] = replace(results[i], audio=audio,
+                                         audio_length=len(audio) / sample_rate,
+                                         timestamps=shift_timestamps(results[i].timestamps,
+                                                                     -offset / sample_rate,
+                                                                     len(audio) / sample_rate))
+        for i, (result, output_rate) in enumerate(zip(results, output_rates)):
+            if output_rate and output_rate != result.sample_rate:
+                results[i] = replace(result, sample_rate=output_rate,
+                                     audio=resample(result.audio, result.sample_rate, output_rate))
+        return results
+    
+    def _generate_native(self, text: str, engine_name: str = None, timestamps: bool = False,
+                         **kwargs) -> TTSResult:
+        """以引擎原生采样率生成语音"""
+        key = self.cache_key(text, engine_name, kwargs)
+        cached = self._lookup_cached(key, text, engine_name or self.default_engine, kwargs)
+        if cached is not None and not self._skip_cache_for_timestamps(timestamps, engine_name):
+            return cached
         
-        if not engine.is_ready():
-            raise Exception(f"引擎未准备就绪: {engine_name or self.default_engine}")
+        if not self.coalesce_requests:
+            return self._synthesize(key, text, engine_name, **kwargs)
+        
+        # 只在同一优先级内合并，交互请求不会排在批量请求的通道里等待
+        flight_key = (key, kwargs.get('priority', DEFAULT_PRIORITY))
+        cancel_token = kwargs.get('cancel_token')
+        with self._inflight_lock:
+            flight = self._inflight.get(flight_key)
+            is_leader = flight is None
+            if is_leader:
+                flight = self._inflight[flight_key] = (Future(), SharedCancellationToken())
+                self._coalesce_stats['leaders'] += 1
+            else:
+                self._coalesce_stats['coalesced'] += 1
+            future, shared_token = flight
+            # 合成只在所有等待者都取消后才中止
+            shared_token.add(cancel_token)
+        
+        if not is_leader:
+            # 与正在进行的合成共享结果（包括异常），本请求取消时只是不再等待
+            try:
+                while True:
+                    try:
+                        return future.result(timeout=None if cancel_token is None else 0.05)
+                    except FutureTimeoutError:
+                        cancel_token.raise_if_cancelled()
+            except SynthesisCancelled:
+                # 共享的合成在本请求加入前已被全部取消，本请求未取消时重新发起
+                if cancel_token is not None and cancel_token.cancelled:
+                    raise
+                return self._generate_native(text, engine_name, timestamps, **kwargs)
+        
+        try:
+            result = self._synthesize(key, text, engine_name,
+                                      **dict(kwargs, cancel_token=shared_token))
+            future.set_result(result)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            # 结果已写入缓存后才移除，之后到达的请求直接命中缓存
+            with self._inflight_lock:
+                self._inflight.pop(flight_key, None)
+        # 发起者自己已取消、但合成为其他等待者完成时，对发起者仍报告取消
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+        return result
+    
+    def _lane_slot(self, **kwargs):
+        """占用请求所在优先级通道的名额，未启用时为空操作"""
+        if self.priority_gate is None:
+            return contextlib.nullcontext()
+        return self.priority_gate.slot(kwargs.get('priority', DEFAULT_PRIORITY),
+                                       kwargs.get('cancel_token'))
+    
+    def _synthesize(self, key: str, text: str, engine_name: str = None, **kwargs) -> TTSResult:
+        """在排队最浅的副本上合成，并写入缓存"""
+        with self._lane_slot(**kwargs):
+            engine = self._acquire_engine(engine_name)
+            try:
+                result = engine.generate(text, **kwargs)
+            finally:
+                self._release_engine(engine)
+        
+        if self.audio_cache is not None:
+            self.audio_cache.put(key, result.audio, result.sample_rate)
+        return result
+    
+    def stream_speech(self, text: str, engine_name: str = None, 
+                      output_rate: Optional[int] = None, postprocess: Optional[bool] = None,
+                      **kwargs) -> Iterator[np.ndarray]:
+        """
+        逐段生成语音（同步生成器）
+        
+        缓存命中时一次产出完整音频；完整迭代结束后结果写入缓存；
+        后处理逐块进行，output_rate指定时逐块流式重采样，块边界处无伪影
+        """
+        chunks = self._stream_output(text, engine_name, output_rate, postprocess, False, **kwargs)
+        try:
+            for chunk, _ in chunks:
+                if len(chunk):
+                    yield chunk
+        finally:
+            chunks.close()
+    
+    def stream_speech_timed(self, text: str, engine_name: str = None, 
+                            output_rate: Optional[int] = None, postprocess: Optional[bool] = None,
+                            **kwargs) -> Iterator[Tuple[np.ndarray, Optional[List[TimedToken]]]]:
+        """
+        同stream_speech，每块附带该块合成出的时间戳（相对整条流开头的秒数）
+        
+        重采样会延迟输出，时间戳随产生它的片段一起产出，可能早于对应的音频块；
+        时间戳为None表示本块没有新的时间戳（或引擎不支持）
+        """
+        return self._stream_output(text, engine_name, output_rate, postprocess, True, **kwargs)
+    
+    def _stream_output(self, text: str, engine_name: str, output_rate: Optional[int],
+                       postprocess: Optional[bool], timestamps: bool,
+                       **kwargs) -> Iterator[Tuple[np.ndarray, Optional[List[TimedToken]]]]:
+        """依次经过后处理和重采样，产出 (音频, 时间戳)"""
+        chunks = self._stream_native(text, engine_name, timestamps, **kwargs)
+        stages = []
+        post: Optional[StreamingPostProcessor] = None
+        pending: Optional[List[TimedToken]] = None
+        native_offset = 0
+        try:
+            for chunk, sample_rate, chunk_timestamps in chunks:
+                if not stages:
+                    if self._postprocess_enabled(postprocess):
+                        post = StreamingPostProcessor(self._get_postprocessor(sample_rate))
+                        stages.append(post)
+                    if output_rate and output_rate != sample_rate:
+                        stages.append(StreamingResampler(sample_rate, output_rate))
+                start = native_offset
+                native_offset += len(chunk)
+                for stage in stages:
+                    chunk = stage.process(chunk)
+                if chunk_timestamps is not None:
+                    # 流开头裁掉的静音使之后的时间整体提前
+                    head = post.trimmed_head if post is not None else 0
+                    pending = (pending or []) + shift_timestamps(chunk_timestamps,
+                                                                 (start - head) / sample_rate)
+                if len(chunk):
+                    yield chunk, pending
+                    pending = None
+            # 依次冲刷各级，前一级的尾部还要经过后面的各级
+            for i, stage in enumerate(stages):
+                tail = stage.flush()
+                for next_stage in stages[i + 1:]:
+                    tail = next_stage.process(tail)
+                if len(tail):
+                    yield tail, pending
+                    pending = None
+            if pending:
+                yield np.zeros(0, dtype=np.float32), pending
+        finally:
+            chunks.close()
+    
+    def _stream_native(self, text: str, engine_name: str = None, timestamps: bool = False,
+                       **kwargs) -> Iterator[Tuple[np.ndarray, int, Optional[List[TimedToken]]]]:
+        """以引擎原生采样率逐段产出 (音频, 采样率, 相对本块起点的时间戳)"""
+        key = self.cache_key(text, engine_name, kwargs)
+        cached = self._lookup_cached(key, text, engine_name or self.default_engine, kwargs)
+        if cached is not None and not self._skip_cache_for_timestamps(timestamps, engine_name):
+            yield cached.audio, cached.sample_rate, cached.timestamps
+            return
+        
+        with self._lane_slot(**kwargs):
+            engine = self._acquire_engine(engine_name)
+            try:
+                chunks = []
+                for chunk, chunk_timestamps in engine.stream_timed(text, **kwargs):
+                    chunks.append(chunk)
+                    yield chunk, engine.sample_rate, chunk_timestamps
+            finally:
+                self._release_engine(engine)
+        
+        if self.audio_cache is not None and chunks:
+            self.audio_cache.put(key, np.concatenate(chunks), engine.sample_rate)
+    
+    def generate_long_form(self, text: Union[str, Sequence[Union[str, Sequence[str]]]],
+                           engine_name: str = None, output_path: Optional[str] = None,
+                           sentence_pause_ms: Optional[float] = None,
+                           paragraph_pause_ms: Optional[float] = None,
+                           crossfade_ms: Optional[float] = None, **kwargs) -> TTSResult:
+        """
+        合成长文本并拼接为一个音频
+        
+        Args:
+            text: 整篇文本（换行分段），或段落列表（每段为文本或句子列表）
+            output_path: 指定时边合成边写入WAV/FLAC文件，返回的audio为空数组
+            sentence_pause_ms / paragraph_pause_ms / crossfade_ms: 覆盖配置中的拼接参数
+            **kwargs: 传给generate_speech的参数（音色、output_rate、postprocess等）
+        
+        句子按顺序提交到长文本专用线程池，最多async_workers句同时在合成，拼接顺序与原文一致；
+        该线程池与asyncio接口的线程池分开，从asyncio线程池中调用也不会占满同一个池而死锁
+        """
+        start_time = time.time()
+        if isinstance(text, str):
+            paragraphs = [p.strip() for p in text.splitlines() if p.strip()]
+        else:
+            paragraphs = list(text)
+        sentences = []
+        for paragraph in paragraphs:
+            pieces = TextSegmenter.split_sentences(paragraph) if isinstance(paragraph, str) else paragraph
+            sentences.extend((piece, 'paragraph' if i == 0 else 'sentence')
+                             for i, piece in enumerate(pieces) if piece.strip())
         
-        return engine.generate(text, **kwargs)
+        executor = self._get_long_form_executor()
+        submit = lambda sentence: executor.submit(self.generate_speech, sentence, engine_name, **kwargs)
+        window = max(1, self.async_workers)
+        futures = [submit(sentence) for sentence, _ in sentences[:window]]
+        assembler: Optional[AudioAssembler] = None
+        result = None
+        timestamps: Optional[List[TimedToken]] = []
+        try:
+            for i, (_, pause) in enumerate(sentences):
+                result = futures[i].result()
+                futures[i] = None
+                if i + window < len(sentences):
+                    futures.append(submit(sentences[i + window][0]))
+                if assembler is None:
+                    assembler = AudioAssembler.from_config(
+                        self.config.get('long_form', {}), result.sample_rate,
+                        sentence_pause_ms=sentence_pause_ms, paragraph_pause_ms=paragraph_pause_ms,
+                        crossfade_ms=crossfade_ms, output_path=output_path)
+                start = assembler.add(result.audio, pause)
+                if timestamps is not None and result.timestamps is not None:
+                    timestamps.extend(shift_timestamps(result.timestamps, start / result.sample_rate))
+                else:
+                    timestamps = None
+        except BaseException:
+            for future in futures:
+                if future is not None:
+                    future.cancel()
+            raise
+        finally:
+            audio = assembler.finish() if assembler is not None else np.zeros(0, dtype=np.float32)
+        
+        sample_rate = result.sample_rate if result is not None else self.get_engine(engine_name).sample_rate
+        return TTSResult(
+            audio=audio,
+            sample_rate=sample_rate,
+            generation_time=time.time() - start_time,
+            engine=engine_name or self.default_engine,
+            voice=kwargs.get('voice'),
+            text_length=sum(len(sentence) for sentence, _ in sentences),
+            audio_length=len(assembler) / sample_rate if assembler is not None else 0.0,
+            timestamps=timestamps
+        )
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """懒创建asyncio接口的线程池"""
+        with self._load_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.async_workers,
+                                                    thread_name_prefix='tts-async',
+                                                    initializer=_mark_async_worker)
+            return self._executor
+    
+    def _get_long_form_executor(self) -> ThreadPoolExecutor:
+        """懒创建长文本逐句合成的线程池"""
+        with self._load_lock:
+            if self._long_form_executor is None:
+                self._long_form_executor = ThreadPoolExecutor(max_workers=max(1, self.async_workers),
+                                                              thread_name_prefix='tts-long-form')
+            return self._long_form_executor
+    
+    async def _run_blocking(self, func, *args):
+        """
+        在asyncio线程池中执行阻塞调用；当前已在该线程池的工作线程上
+        （如在池内任务里又跑了一个事件循环）时直接执行，避免等待同一个有界线程池而死锁
+        """
+        if getattr(_async_worker, 'active', False):
+            return func(*args)
+        return await asyncio.wrap_future(self._get_executor().submit(func, *args))
+    
+    async def astream(self, text: str, engine_name: str = None, 
+                      **kwargs) -> AsyncIterator[np.ndarray]:
+        """
+        异步逐段生成语音: async for chunk in manager.astream(text, voice='zf_001')
+        
+        每个片段在线程池中合成，不阻塞事件循环；任务被取消或提前退出迭代时，
+        正在合成的片段完成后即停止，不再合成后续片段
+        """
+        # 迭代提前结束时通过令牌让已入队的片段也被跳过
+        # 显式传入的None同样换成新令牌，否则退出时无法取消
+        cancel_token = kwargs.get('cancel_token') or CancellationToken()
+        kwargs['cancel_token'] = cancel_token
+        chunks = self.stream_speech(text, engine_name, **kwargs)
+        end = object()
+        pending: Optional[Future] = None
+        finished = False
+        try:
+            while True:
+                if getattr(_async_worker, 'active', False):
+                    chunk = next(chunks, end)
+                else:
+                    pending = self._get_executor().submit(next, chunks, end)
+                    chunk = await asyncio.wrap_future(pending)
+                    pending = None
+                if chunk is end:
+                    finished = True
+                    break
+                yield chunk
+        finally:
+            if not finished:
+                cancel_token.cancel()
+            if pending is not None and not pending.done():
+                # 生成器正在线程池中执行，不能在此关闭，等当前片段完成后再关闭
+                pending.add_done_callback(lambda _: chunks.close())
+            else:
+                chunks.close()
+    
+    async def agenerate(self, text: str, engine_name: str = None, **kwargs) -> TTSResult:
+        """异步生成完整语音"""
+        return await self._run_blocking(lambda: self.generate_speech(text, engine_name, **kwargs))
+    
+    async def agenerate_many(self, requests: Iterable[Union[str, Dict[str, Any]]], 
+                             engine_name: str = None, max_concurrency: int = 4,
+                             **kwargs) -> List[TTSResult]:
+        """
+        并发生成多条语音，结果顺序与输入一致
+        
+        Args:
+            requests: 文本，或 {"text": ..., 其他参数} 字典（覆盖公共参数）
+            max_concurrency: 同时进行的合成数上限
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        postprocess = kwargs.pop('postprocess', None)
+        
+        jobs = []
+        for request in requests:
+            params = dict(kwargs)
+            if isinstance(request, dict):
+                params.update(request)
+                text = params.pop('text')
+            else:
+                text = request
+            jobs.append((text, params.pop('engine', engine_name), params))
+        output_rates = [params.pop('output_rate', None) for _, _, params in jobs]
+        
+        async def run(text, name, params):
+            async with semaphore:
+                return await self.agenerate(text, name, postprocess=False, **params)
+        
+        results = await asyncio.gather(*(run(*job) for job in jobs))
+        # 全部完成后整批后处理
+        return await self._run_blocking(self._finalize, results, postprocess, output_rates)
+    
+    def shutdown(self):
+        """停止所有引擎副本"""
+        if self.memory_budget is not None:
+            self.memory_budget.stop()
+        for executor in (self._executor, self._long_form_executor):
+            if executor is not None:
+                executor.shutdown(wait=False)
+        self._executor = None
+        self._long_form_executor = None
+        for replicas in self.replicas.values():
+            for engine in replicas:
+                engine.shutdown()
+        self.engines.clear()
+        self.replicas.clear()
+    
+    def _sum_cancel_stats(self, engine_name: str) -> Dict[str, int]:
+        """汇总各副本的取消统计"""
+        totals: Dict[str, int] = {}
+        for engine in self.replicas.get(engine_name) or [self.engines[engine_name]]:
+            with engine._cancel_lock:
+                for name, value in engine.cancel_stats.items():
+                    totals[name] = totals.get(name, 0) + value
+        return totals
+    
+    def get_coalesce_stats(self) -> Dict[str, int]:
+        """请求合并统计"""
+        with self._inflight_lock:
+            stats = dict(self._coalesce_stats)
+            stats['inflight'] = len(self._inflight)
+        return stats
     
     def get_all_voices(self) -> Dict[str, Dict[str, List[str]]]:
         """获取所有引擎的音色信息"""
         all_voices = {}
         for engine_name, engine in self.engines.items():
-            if engine.is_ready():
+            # 因内存预算卸载的引擎收到请求时会重新加载，音色仍然可用
+            if engine.is_ready() or (self.memory_budget is not None
+                                     and self.memory_budget.is_tracked(engine)):
                 all_voices[engine_name] = engine.get_available_voices()
         return all_voices
     
@@ -395,7 +1792,9 @@ class TTSEngineManager:
             'default_engine': self.default_engine,
             'engine_details': {}
         }
-        
+        # 只用ONNX引擎时不为查询线程数导入torch
+        torch = sys.modules.get('torch')
+
         for engine_name, engine in self.engines.items():
             info['available_engines'].append(engine_name)
             info['engine_details'][engine_name] = {
@@ -403,9 +1802,35 @@ class TTSEngineManager:
                 'sample_rate': engine.sample_rate,
                 'supported_languages': engine.supported_languages,
                 'is_ready': engine.is_ready(),
-                'device': engine.device
+                'device': engine.device,
+                'quantize': engine.config.get('quantize', 'none'),
+                'instances': len(self.replicas.get(engine_name, [engine])),
+                'num_threads': engine.num_threads or (torch.get_num_threads() if torch else None),
+                'replicas': [{'replica_id': replica.replica_id, 'device': replica.device,
+                              'active_requests': replica.active_requests,
+                              'queue_depth': replica.queue_depth()}
+                             for replica in self.replicas.get(engine_name, [engine])]
             }
+            if getattr(engine, 'scheduler', None) is not None:
+                info['engine_details'][engine_name]['scheduler'] = engine.scheduler.get_stats()
+            info['engine_details'][engine_name]['cancellation'] = self._sum_cancel_stats(engine_name)
+            if getattr(engine, 'duration_stats', None) is not None:
+                info['engine_details'][engine_name]['target_duration'] = {
+                    name: sum(replica.duration_stats[name]
+                              for replica in self.replicas.get(engine_name, [engine]))
+                    for name in engine.duration_stats}
+            if getattr(engine, 'voice_cache', None) is not None:
+                info['engine_details'][engine_name]['voice_cache'] = engine.voice_cache.get_stats()
         
+        info['coalescing'] = self.get_coalesce_stats()
+        if self.priority_gate is not None:
+            info['priority_lanes'] = self.priority_gate.get_stats()
+        if self.memory_budget is not None:
+            info['memory_budget'] = self.memory_budget.get_stats()
+        if self.audio_cache is not None:
+            info['audio_cache'] = self.audio_cache.get_stats()
+        if self.prerendered_store is not None:
+            info['prerendered_entries'] = len(self.prerendered_store)
         return info
 
 if __name__ == '__main__':
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TTS请求调度器
+按优先级分道（interactive / normal / bulk）派发待合成片段，道内先进先出；
+长文本的每个片段单独入队，高优先级请求在片段边界即可插到排队的低优先级片段之前。
+每个片段单独前向（Kokoro没有带padding和mask的批量前向），因此不做按长度分桶或攒批。
+
+PriorityGate在请求级限制各通道同时占用引擎的请求数，不依赖片段调度器，对所有引擎生效
+"""
+
+import itertools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+# 优先级从高到低
+PRIORITY_CLASSES = ('interactive', 'normal', 'bulk')
+DEFAULT_PRIORITY = 'normal'
+
+
+class SynthesisCancelled(Exception):
+    """请求已被调用方取消"""
+    pass
+
+
+class CancellationToken:
+    """
+    协作式取消令牌
+
+    调用方（如断开的Web连接、被打断的对话轮次）调用 cancel()，
+    合成方在片段之间和批处理的每一步之间检查，尽早释放工作线程
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self.cancelled:
+            raise SynthesisCancelled('请求已取消')
+
+
+class SharedCancellationToken(CancellationToken):
+    """
+    多个请求共享同一次合成时使用的令牌：只有全部参与者都取消后才视为取消，
+    任一参与者没有令牌（不可取消）时永不取消
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._tokens: List[CancellationToken] = []
+        self._uncancellable = False
+        self._lock = threading.Lock()
+
+    def add(self, token: Optional[CancellationToken]):
+        """加入一个参与者的令牌"""
+        with self._lock:
+            if token is None:
+                self._uncancellable = True
+            else:
+                self._tokens.append(token)
+
+    @property
+    def cancelled(self) -> bool:
+        if self._event.is_set():
+            return True
+        with self._lock:
+            return (not self._uncancellable and bool(self._tokens)
+                    and all(token.cancelled for token in self._tokens))
+
+
+class PriorityGate:
+    """
+    按优先级通道限制同时合成的请求数
+
+    每个通道最多 max_concurrency 个请求同时占用引擎，未配置上限的通道不限；
+    批量通道的上限保证交互请求不会排在大量批量任务之后
+    """
+
+    def __init__(self, limits: Optional[Dict[str, Optional[int]]] = None):
+        limits = limits or {}
+        self.limits = {name: limits.get(name) for name in PRIORITY_CLASSES}
+        self._active = {name: 0 for name in PRIORITY_CLASSES}
+        self._waiting = {name: 0 for name in PRIORITY_CLASSES}
+        self._stats = {'admitted': 0, 'queued': 0}
+        self._cond = threading.Condition()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> 'PriorityGate':
+        """从配置字典创建，如 {"bulk": {"max_concurrency": 1}}"""
+        return cls({name: config.get(name, {}).get('max_concurrency') for name in PRIORITY_CLASSES})
+
+    @contextmanager
+    def slot(self, priority: str = DEFAULT_PRIORITY,
+             cancel_token: Optional[CancellationToken] = None) -> Iterator[None]:
+        """占用所在通道的一个名额，排队期间取消时抛出SynthesisCancelled"""
+        if priority not in self.limits:
+            raise ValueError(f'未知的优先级: {priority}，可选: {", ".join(PRIORITY_CLASSES)}')
+        limit = self.limits[priority]
+        with self._cond:
+            if limit is not None and self._active[priority] >= limit:
+                self._stats['queued'] += 1
+                self._waiting[priority] += 1
+                try:
+                    while self._active[priority] >= limit:
+                        if cancel_token is not None:
+                            cancel_token.raise_if_cancelled()
+                        self._cond.wait(None if cancel_token is None else 0.05)
+                finally:
+                    self._waiting[priority] -= 1
+            self._active[priority] += 1
+            self._stats['admitted'] += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._active[priority] -= 1
+                self._cond.notify_all()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """各通道的上限、进行中和排队的请求数"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats['lanes'] = {name: {'max_concurrency': self.limits[name], 'active': self._active[name],
+                                     'waiting': self._waiting[name]}
+                              for name in PRIORITY_CLASSES}
+        return stats
+
+
+@dataclass
+class ScheduledItem:
+    """调度队列中的一个片段"""
+    seq: int
+    payload: Any
+    length: int = 0
+    enqueue_time: float = 0.0
+    future: Future = field(default_factory=Future)
+    priority: str = DEFAULT_PRIORITY
+
+
+@dataclass
+class PriorityLane:
+    """一个优先级通道"""
+    name: str
+    max_concurrency: int
+    queue: Deque[ScheduledItem] = field(default_factory=deque)
+    inflight: int = 0
+
+
+class PriorityScheduler:
+    """
+    按优先级分道的片段调度器
+
+    dispatch_fn 接收一个payload并返回其结果。工作线程每次从优先级最高、
+    有排队且未达并发上限的通道取出最早入队的片段；低优先级通道的并发上限
+    保证总有工作线程留给高优先级请求
+    """
+
+    def __init__(self, dispatch_fn: Callable[[Any], Any], num_workers: int = 1,
+                 name: str = 'tts-scheduler',
+                 priorities: Optional[Dict[str, Dict[str, Any]]] = None,
+                 initializer: Optional[Callable[[], None]] = None):
+        self.dispatch_fn = dispatch_fn
+        # 每个工作线程启动时调用一次，例如设置线程本地的torch线程数
+        self.initializer = initializer
+        self.num_workers = max(1, num_workers)
+        self.name = name
+
+        priorities = priorities or {}
+        self._lanes: List[PriorityLane] = [
+            PriorityLane(name=lane_name,
+                         max_concurrency=max(1, priorities.get(lane_name, {}).get(
+                             'max_concurrency', self.num_workers)))
+            for lane_name in PRIORITY_CLASSES]
+        self._lane_by_name = {lane.name: lane for lane in self._lanes}
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._workers: List[threading.Thread] = []
+        self._running = False
+        self._stats = {
+            'submitted': 0,
+            'dispatched': 0,
+            # 派发时有更低优先级的片段仍在排队，即发生了插队
+            'priority_dispatches': 0,
+            'queue_wait_sum': 0.0,
+        }
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], dispatch_fn: Callable[[Any], Any],
+                    initializer: Optional[Callable[[], None]] = None) -> 'PriorityScheduler':
+        """从配置字典创建调度器"""
+        return cls(
+            dispatch_fn=dispatch_fn,
+            num_workers=config.get('num_workers', 1),
+            priorities=config.get('priorities'),
+            initializer=initializer
+        )
+
+    def start(self):
+        """启动工作线程"""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        for i in range(self.num_workers):
+            worker = threading.Thread(target=self._worker_loop, name=f'{self.name}-{i}', daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def stop(self, timeout: Optional[float] = None):
+        """停止调度器，已入队的片段会先全部派发完"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        for worker in self._workers:
+            worker.join(timeout)
+        self._workers = []
+
+    def submit(self, payload: Any, length: int = 0, priority: str = DEFAULT_PRIORITY) -> Future:
+        """
+        提交一个片段
+
+        Args:
+            payload: 交给dispatch_fn的数据
+            length: 音素长度，只用于统计
+            priority: 优先级通道 interactive / normal / bulk
+
+        Returns:
+            Future: 完成后得到dispatch_fn的结果
+        """
+        lane = self._lane_by_name.get(priority)
+        if lane is None:
+            raise ValueError(f'未知的优先级: {priority}，可选: {", ".join(PRIORITY_CLASSES)}')
+
+        item = ScheduledItem(seq=next(self._seq), payload=payload, length=length,
+                             enqueue_time=time.monotonic(), priority=lane.name)
+        with self._cond:
+            if not self._running:
+                raise RuntimeError('调度器未启动')
+            lane.queue.append(item)
+            self._stats['submitted'] += 1
+            self._cond.notify()
+        return item.future
+
+    def pending(self) -> int:
+        """当前排队的片段数"""
+        with self._cond:
+            return sum(len(lane.queue) for lane in self._lanes)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """调度统计"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats['pending'] = sum(len(lane.queue) for lane in self._lanes)
+            stats['lanes'] = {lane.name: {'pending': len(lane.queue), 'inflight': lane.inflight}
+                              for lane in self._lanes}
+        queue_wait_sum = stats.pop('queue_wait_sum')
+        stats['avg_queue_wait_ms'] = (queue_wait_sum / stats['dispatched'] * 1000
+                                      if stats['dispatched'] else 0.0)
+        return stats
+
+    def _select(self) -> Optional[ScheduledItem]:
+        """取出下一个片段，必须持有锁调用"""
+        for index, lane in enumerate(self._lanes):
+            if lane.queue and lane.inflight < lane.max_concurrency:
+                item = lane.queue.popleft()
+                if any(lower.queue for lower in self._lanes[index + 1:]):
+                    self._stats['priority_dispatches'] += 1
+                self._stats['dispatched'] += 1
+                self._stats['queue_wait_sum'] += time.monotonic() - item.enqueue_time
+                lane.inflight += 1
+                return item
+        return None
+
+    def _worker_loop(self):
+        if self.initializer is not None:
+            self.initializer()
+        while True:
+            with self._cond:
+                while True:
+                    item = self._select()
+                    if item is not None:
+                        break
+                    if not self._running and not any(lane.queue for lane in self._lanes):
+                        return
+                    self._cond.wait()
+            try:
+                self._run(item)
+            finally:
+                with self._cond:
+                    self._lane_by_name[item.priority].inflight -= 1
+                    self._cond.notify_all()
+
+    def _run(self, item: ScheduledItem):
+        """执行一个片段并回填Future"""
+        if not item.future.set_running_or_notify_cancel():
+            return
+        try:
+            result = self.dispatch_fn(item.payload)
+        except BaseException as e:
+            item.future.set_exception(e)
+            return
+        item.future.set_result(result)
@@ -12,9 +12,11 @@ import argparse
 import soundfile as sf
 from pathlib import Path
 from typing import Optional, Dict, Any
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # 导入引擎管理器
 from tts_engine_manager import TTSEngineManager, TTSResult
+from audio_cache import PrerenderedStoreWriter, load_manifest, NON_AUDIO_PARAMS
 
 class UnifiedTTSApp:
     """统一TTS应用程序"""
@@ -169,6 +171,77 @@ class UnifiedTTSApp:
             print(f"❌ 语音合成失败: {str(e)}")
             return None
     
+    def precompute(self, manifest: str, store_path: str, workers: int = 4,
+                   voice: str = None) -> Dict[str, int]:
+        """
+        把清单中的提示语并行合成写入预渲染音频库
+        
+        本命令在独立进程中使用自己的引擎，bulk优先级只在本进程内生效，
+        不会为同机的Web服务让路；需要与Web流量共存时通过Web服务的 /api/batch 提交
+        
+        Args:
+            manifest: 清单文件 (.jsonl 或 每行一条文本)
+            store_path: 音频库目录，已存在时追加
+            workers: 并发合成线程数
+            voice: 清单未指定音色时使用的音色
+        """
+        items = list(load_manifest(manifest, voice))
+        stats = {'total': len(items), 'rendered': 0, 'skipped': 0, 'failed': 0}
+        print(f"\n📦 预渲染 {len(items)} 条提示语 -> {store_path}")
+        
+        start_time = time.time()
+        with PrerenderedStoreWriter(store_path) as writer:
+            def render(item: Dict[str, Any]) -> str:
+                # 输出格式参数不参与键计算，库中只存原生音频，取出时再后处理和重采样
+                params = {k: v for k, v in item.items() if k not in NON_AUDIO_PARAMS}
+                text = params.pop('text')
+                engine_name = params.pop('engine', None) or self.manager.default_engine
+                key = self.manager.cache_key(text, engine_name, params)
+                if key in writer:
+                    return 'skipped'
+                result = self.manager.generate_speech(text, engine_name, output_rate=None,
+                                                      postprocess=False, priority='bulk', **params)
+                writer.add(key, result.audio, result.sample_rate, text=text,
+                           engine=engine_name, voice=result.voice)
+                return 'rendered'
+            
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {executor.submit(render, item): item for item in items}
+                for done, future in enumerate(as_completed(futures), 1):
+                    try:
+                        stats[future.result()] += 1
+                    except Exception as e:
+                        stats['failed'] += 1
+                        print(f"❌ 合成失败: {futures[future]['text'][:30]} ({str(e)})")
+                    if done % 50 == 0:
+                        writer.flush()
+                        print(f"   进度: {done}/{len(items)}")
+        
+        print(f"✅ 预渲染完成: 新增 {stats['rendered']}，跳过 {stats['skipped']}，"
+              f"失败 {stats['failed']}，耗时 {time.time() - start_time:.1f} 秒")
+        return stats
+    
+    def generate_long_form(self, text_file: str, engine_name: str = None, voice: str = None,
+                           output_file: str = None, **engine_params) -> Optional[TTSResult]:
+        """合成长文本文件，边合成边写入输出文件"""
+        try:
+            text = Path(text_file).read_text(encoding='utf-8')
+            if output_file is None:
+                output_file = self.output_dir / f"{Path(text_file).stem}.wav"
+            Path(output_file).parent.mkdir(parents=True, exist_ok=True)
+            if voice:
+                engine_params['voice'] = voice
+            
+            print(f"\n📖 长文本合成: {text_file} ({len(text)} 字符)")
+            result = self.manager.generate_long_form(text, engine_name, output_path=str(output_file),
+                                                     **engine_params)
+            print(f"✅ 已写入: {output_file}")
+            print(f"音频时长: {result.audio_length:.1f} 秒 | 生成时间: {result.generation_time:.1f} 秒")
+            return result
+        except Exception as e:
+            print(f"❌ 长文本合成失败: {str(e)}")
+            return None
+    
     def interactive_mode(self):
         """交互模式"""
         print("\n🎤 进入交互模式")
@@ -237,12 +310,19 @@ def main():
     parser = argparse.ArgumentParser(description='统一TTS应用程序')
     parser.add_argument('--config', default='tts_config.json', help='配置文件路径')
     parser.add_argument('--text', '-t', help='要合成的文本')
+    parser.add_argument('--text-file', help='长文本文件，按段落拼接并直接写入输出文件')
     parser.add_argument('--engine', '-e', help='指定TTS引擎')
     parser.add_argument('--voice', '-v', help='指定音色')
     parser.add_argument('--output', '-o', help='输出文件路径')
     parser.add_argument('--interactive', '-i', action='store_true', help='交互模式')
     parser.add_argument('--list-voices', action='store_true', help='列出所有音色')
     parser.add_argument('--status', action='store_true', help='显示系统状态')
+    parser.add_argument('--priority', choices=['interactive', 'normal', 'bulk'], default='normal',
+                        help='调度优先级（只在本进程内生效），与Web服务共存的批量任务请提交到 /api/batch')
+    parser.add_argument('--output-rate', type=int, help='输出采样率，如 8000/16000/44100/48000')
+    parser.add_argument('--precompute', metavar='MANIFEST', help='预渲染清单中的提示语')
+    parser.add_argument('--store', default='./prerendered', help='预渲染音频库目录')
+    parser.add_argument('--workers', type=int, default=4, help='预渲染并发数')
     
     # StableTTS参数
     parser.add_argument('--step', type=int, default=25, help='StableTTS推理步数')
@@ -264,6 +344,14 @@ def main():
         app.show_status()
     elif args.list_voices:
         app.list_voices()
+    elif args.text_file:
+        engine_params = {'priority': args.priority}
+        if args.output_rate:
+            engine_params['output_rate'] = args.output_rate
+        app.generate_long_form(args.text_file, args.engine, args.voice, args.output,
+                               **engine_params)
+    elif args.precompute:
+        app.precompute(args.precompute, args.store, args.workers, args.voice)
     elif args.text:
         # 准备引擎参数
         engine_params = {}
@@ -275,6 +363,9 @@ def main():
             engine_params['length_scale'] = args.length_scale
         if args.cfg:
             engine_params['cfg'] = args.cfg
+        engine_params['priority'] = args.priority
+        if args.output_rate:
+            engine_params['output_rate'] = args.output_rate
         
         app.generate_speech(
             text=args.text,
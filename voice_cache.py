@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+音色风格向量缓存
+Kokoro音色包是按音素数索引的风格表 [510, 1, 256]，缓存把整张表常驻在
+模型所在设备上，查找风格向量只是一次O(1)索引，不再有每次调用的主机到设备拷贝；
+热门音色常驻，冷门音色在超过内存上限时按LRU淘汰；
+支持 "zf_001:0.6,zf_004:0.4" 形式的混合音色，加权和只计算一次并缓存
+"""
+
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# 混合音色描述的解析不依赖PyTorch，ONNX引擎也会用到，torch在用到张量时才导入
+if TYPE_CHECKING:
+    import torch
+
+DEFAULT_VOICES_DIR = Path(__file__).parent / 'voices'
+
+
+def is_voice_mix(voice: str) -> bool:
+    """是否为混合音色描述"""
+    return ',' in voice or ':' in voice
+
+
+def parse_voice_mix(spec: str) -> List[Tuple[str, float]]:
+    """
+    解析混合音色描述，权重归一化为和为1
+
+    "zf_001:0.6,zf_004:0.4" -> [('zf_001', 0.6), ('zf_004', 0.4)]
+    "zf_001,zf_004"         -> 等权重平均（与KPipeline的逗号写法一致）
+    """
+    weights: Dict[str, float] = {}
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, weight = part.partition(':')
+        name = name.strip()
+        try:
+            value = float(weight) if weight.strip() else 1.0
+        except ValueError:
+            raise ValueError(f"音色权重格式错误: {part}")
+        if not name or value < 0:
+            raise ValueError(f"音色混合描述无效: {part}")
+        weights[name] = weights.get(name, 0.0) + value
+
+    total = sum(weights.values())
+    if not weights or total <= 0:
+        raise ValueError(f"音色混合描述无效: {spec}")
+    return [(name, weight / total) for name, weight in weights.items()]
+
+
+def canonical_voice(voice: str) -> str:
+    """混合音色的规范写法（按音色名排序、固定精度），作为缓存键"""
+    if not is_voice_mix(voice):
+        return voice
+    mix = parse_voice_mix(voice)
+    if len(mix) == 1:
+        return mix[0][0]
+    return ','.join(f'{name}:{weight:.4f}' for name, weight in sorted(mix))
+
+
+class VoiceStyleCache:
+    """按音色缓存设备常驻的风格表"""
+
+    def __init__(self, loader: Callable[[str], 'torch.Tensor'], device: str = 'cpu',
+                 max_memory_mb: float = 32.0, hot_voices: Optional[Iterable[str]] = None):
+        """
+        Args:
+            loader: 音色名 -> CPU上的音色包张量
+            device: 风格表常驻的设备
+            max_memory_mb: 冷门音色的内存上限，热门音色不计入淘汰
+            hot_voices: 常驻不淘汰的音色
+        """
+        self.loader = loader
+        self.device = device
+        self.max_bytes = int(max_memory_mb * 1024 * 1024)
+        self.hot_voices = set(hot_voices or [])
+        self._tables: 'OrderedDict[str, torch.Tensor]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], loader: Callable[[str], 'torch.Tensor'],
+                    device: str = 'cpu') -> 'VoiceStyleCache':
+        """从配置字典创建缓存"""
+        return cls(
+            loader=loader,
+            device=device,
+            max_memory_mb=config.get('max_memory_mb', 32.0),
+            hot_voices=config.get('hot_voices', [])
+        )
+
+    def get_table(self, voice: str) -> 'torch.Tensor':
+        """返回设备常驻的风格表，未命中时加载并搬到设备上；混合音色按加权和计算"""
+        voice = canonical_voice(voice)
+        with self._lock:
+            table = self._tables.get(voice)
+            if table is not None:
+                self._tables.move_to_end(voice)
+                self._stats['hits'] += 1
+                return table
+            self._stats['misses'] += 1
+
+        # 加载放在锁外，避免慢速磁盘/网络IO阻塞其他音色的查找
+        if is_voice_mix(voice):
+            table = self._blend(parse_voice_mix(voice))
+        else:
+            import torch
+            table = self.loader(voice).to(self.device, dtype=torch.float32).contiguous()
+        with self._lock:
+            table = self._tables.setdefault(voice, table)
+            self._tables.move_to_end(voice)
+            self._evict()
+        return table
+
+    def _blend(self, mix: List[Tuple[str, float]]) -> 'torch.Tensor':
+        """把各音色的风格表堆叠后一次性做加权和"""
+        import torch
+        stacked = torch.stack([self.get_table(name) for name, _ in mix])
+        weights = torch.tensor([weight for _, weight in mix], dtype=stacked.dtype,
+                               device=stacked.device)
+        return torch.tensordot(weights, stacked, dims=1).contiguous()
+
+    def style(self, voice: str, length: int) -> 'torch.Tensor':
+        """按音素数取风格向量 [1, 256]，与KPipeline.infer的 pack[len(ps)-1] 一致"""
+        table = self.get_table(voice)
+        return table[min(max(length, 1), table.shape[0]) - 1]
+
+    def preload(self, voices: Optional[Iterable[str]] = None):
+        """预加载音色，默认预加载全部热门音色"""
+        for voice in voices if voices is not None else sorted(self.hot_voices):
+            try:
+                self.get_table(voice)
+            except Exception as e:
+                print(f"⚠️  预加载音色失败 {voice}: {str(e)}")
+
+    def memory_bytes(self, include_hot: bool = True) -> int:
+        """当前缓存占用的字节数"""
+        with self._lock:
+            return sum(t.numel() * t.element_size() for v, t in self._tables.items()
+                       if include_hot or v not in self.hot_voices)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """缓存统计"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['resident_voices'] = len(self._tables)
+            stats['blended_voices'] = sum(1 for v in self._tables if is_voice_mix(v))
+            stats['hot_voices'] = sorted(self.hot_voices & set(self._tables))
+        stats['memory_mb'] = self.memory_bytes() / (1024 * 1024)
+        return stats
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._tables.clear()
+
+    def _evict(self):
+        """按LRU淘汰冷门音色直到低于上限，必须持有锁调用"""
+        cold = [v for v in self._tables if v not in self.hot_voices]
+        used = sum(self._tables[v].numel() * self._tables[v].element_size() for v in cold)
+        # 至少保留刚加载的那个音色
+        for voice in cold[:-1]:
+            if used <= self.max_bytes:
+                break
+            table = self._tables.pop(voice)
+            used -= table.numel() * table.element_size()
+            self._stats['evictions'] += 1
+
+
+def load_voice_file(voice: str, voices_dir: Path = DEFAULT_VOICES_DIR,
+                    fallback: Optional[Callable[[str], 'torch.Tensor']] = None) -> 'torch.Tensor':
+    """优先从本地voices目录加载音色包，没有时交给fallback（如KPipeline.load_voice）"""
+    voice_file = voices_dir / f'{voice}.pt'
+    if voice_file.exists():
+        import torch
+        return torch.load(voice_file, map_location='cpu', weights_only=True)
+    if fallback is None:
+        raise FileNotFoundError(f"音色文件不存在: {voice_file}")
+    return fallback(voice)
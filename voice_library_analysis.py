@@ -6,8 +6,10 @@ Kokoro TTS 中文版 - 声音库分析工具
 """
 
 import os
+import time
 from pathlib import Path
-import torch
+
+from voice_validator import VoiceCatalog
 
 def analyze_voice_library():
     """
@@ -59,17 +61,20 @@ def analyze_voice_library():
     total_size = sum(f.stat().st_size for f in voice_files) / (1024 * 1024)  # MB
     print(f"\n💾 声音库总大小: {total_size:.1f} MB")
     
-    # 检查文件完整性
+    # 检查文件完整性：只解析zip结构和张量元数据，并行进行，未变化的文件使用缓存结果
     print("\n🔍 文件完整性检查:")
+    start_time = time.time()
+    catalog = VoiceCatalog(str(voices_dir))
+    entries = catalog.scan(verify_crc=True)
     corrupted_files = []
-    for voice_file in voice_files:
-        try:
-            # 尝试加载文件检查是否损坏
-            torch.load(voice_file, map_location='cpu')
-            print(f"  ✅ {voice_file.name}")
-        except Exception as e:
-            print(f"  ❌ {voice_file.name} - 错误: {str(e)}")
-            corrupted_files.append(voice_file.name)
+    for name, info in sorted(entries.items()):
+        if info.valid:
+            print(f"  ✅ {name}.pt {info.shape} {info.dtype}")
+        else:
+            print(f"  ❌ {name}.pt - 错误: {info.error}")
+            corrupted_files.append(f"{name}.pt")
+    print(f"  ⏱️  检查 {catalog.last_scan['checked']} 个, 缓存 {catalog.last_scan['cached']} 个, "
+          f"耗时 {time.time() - start_time:.2f}s")
     
     if corrupted_files:
         print(f"\n⚠️  发现 {len(corrupted_files)} 个损坏文件")
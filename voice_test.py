@@ -3,67 +3,160 @@
 """
 Kokoro TTS 语音模型性能测试脚本
 测试不同语音模型的合成效果和性能
+
+所有音色共用一个模型。每个音色的RTF分布、首块延迟、每字音频时长（语速）和音色包内存
+在串行阶段逐个测得，不受其他合成争抢核心的干扰；之后可选的并行阶段只报告整体吞吐。
+结果写入JSON，可与上一次的结果做A/B对比
 """
 
-import kokoro
-import torchaudio
 import os
+import json
 import time
+import argparse
+import platform
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
 from pathlib import Path
+from typing import Any, Dict, List, Optional
 import warnings
 
+import kokoro
+import numpy as np
+import psutil
+import soundfile as sf
+import torch
+
+from voice_validator import VoiceCatalog
+
 # 忽略警告
 warnings.filterwarnings("ignore")
 
+VOICES_DIR = Path(__file__).parent / 'voices'
+
+
+def _percentile(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q)) if values else 0.0
+
+
 class VoiceModelTester:
     def __init__(self, device='cpu'):
-        """初始化测试器"""
+        """初始化测试器，一个pipeline（一份模型）供所有音色和线程共用"""
         print("正在初始化Kokoro TTS测试器...")
         self.pipeline = kokoro.KPipeline('z', device=device)
         self.sample_rate = 24000
         self.device = device
+        # 串行测量时使用的intra-op线程数，并行阶段结束后恢复
+        self.num_threads = torch.get_num_threads()
+        self._load_lock = threading.Lock()
         print(f"初始化完成，使用设备: {device}")
-    
-    def test_voice_model(self, text, voice, output_dir='voice_tests'):
-        """测试单个语音模型"""
+
+    def load_voice(self, voice):
+        """
+        加载音色包，返回 (音色包字节数, 加载前后进程RSS的变化)
+
+        RSS是整个进程的，只有在没有其他合成并行时测得的变化才有意义
+        """
+        with self._load_lock:
+            rss_before = psutil.Process().memory_info().rss
+            pack = self.pipeline.load_voice(voice)
+            rss_delta = psutil.Process().memory_info().rss - rss_before
+        return pack.numel() * pack.element_size(), max(0, rss_delta)
+
+    def _synthesize(self, text, voice):
+        """逐块迭代pipeline，记录首块延迟，不保留中间结果列表"""
+        start_time = time.perf_counter()
+        first_chunk_time = None
+        chunks = []
+        phonemes_count = 0
+        for result in self.pipeline(text, voice=voice):
+            if result.audio is None:
+                continue
+            if first_chunk_time is None:
+                first_chunk_time = time.perf_counter() - start_time
+            chunks.append(result.audio.numpy() if torch.is_tensor(result.audio) else result.audio)
+            phonemes_count += len(result.phonemes)
+        synthesis_time = time.perf_counter() - start_time
+        audio = np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.float32)
+        return audio, synthesis_time, first_chunk_time, phonemes_count
+
+    def load_voices(self, voices: List[str]) -> Dict[str, Any]:
+        """
+        逐个加载音色包并测量内存，在合成测试之前调用
+
+        Returns:
+            Dict[str, Any]: 音色 -> (音色包字节数, RSS变化)，加载失败时为异常
+        """
+        memory = {}
+        for voice in voices:
+            try:
+                memory[voice] = self.load_voice(voice)
+            except Exception as e:
+                memory[voice] = e
+        return memory
+
+    def test_voice_model(self, text, voice, output_dir=None, runs=3, memory=None):
+        """
+        测试单个语音模型
+
+        Args:
+            runs: 重复合成次数，用于得到RTF分布
+            output_dir: 指定时保存最后一次合成的音频
+            memory: load_voices测得的 (音色包字节数, RSS变化)，为空时在这里加载测量
+        """
+        start_time = time.time()
         try:
-            start_time = time.time()
-            
-            # 生成语音
-            results = list(self.pipeline(text, voice=voice))
-            
-            if not results:
+            if isinstance(memory, Exception):
+                raise memory
+            voice_bytes, rss_delta = memory if memory is not None else self.load_voice(voice)
+            rtfs, synthesis_times, first_chunk_times = [], [], []
+            audio, phonemes_count = None, 0
+            for _ in range(max(1, runs)):
+                audio, synthesis_time, first_chunk_time, phonemes_count = self._synthesize(text, voice)
+                if not len(audio):
+                    break
+                synthesis_times.append(synthesis_time)
+                first_chunk_times.append(first_chunk_time)
+                rtfs.append(synthesis_time / (len(audio) / self.sample_rate))
+
+            if audio is None or not len(audio):
                 return {
                     'voice': voice,
                     'success': False,
                     'error': '没有生成结果',
                     'duration': 0,
-                    'synthesis_time': 0
+                    'synthesis_time': time.time() - start_time
                 }
-            
-            result = results[0]
-            audio = result.audio
-            synthesis_time = time.time() - start_time
-            
+
             # 计算音频时长
             audio_duration = len(audio) / self.sample_rate
-            
-            # 保存音频文件
-            os.makedirs(output_dir, exist_ok=True)
-            output_path = os.path.join(output_dir, f"test_{voice}.wav")
-            torchaudio.save(output_path, audio.unsqueeze(0), self.sample_rate)
-            
-            return {
+
+            result = {
                 'voice': voice,
                 'success': True,
                 'audio_duration': audio_duration,
-                'synthesis_time': synthesis_time,
-                'speed_ratio': audio_duration / synthesis_time,
-                'output_path': output_path,
-                'phonemes_count': len(result.phonemes),
+                'synthesis_time': float(np.median(synthesis_times)),
+                'speed_ratio': audio_duration / float(np.median(synthesis_times)),
+                'rtf_median': float(np.median(rtfs)),
+                'rtf_p90': _percentile(rtfs, 90),
+                'rtf_runs': rtfs,
+                'first_chunk_latency': float(np.median(first_chunk_times)),
+                'seconds_per_char': audio_duration / max(1, len(text)),
+                'seconds_per_phoneme': audio_duration / max(1, phonemes_count),
+                'voice_memory_mb': voice_bytes / (1024 * 1024),
+                'rss_delta_mb': rss_delta / (1024 * 1024),
+                'phonemes_count': phonemes_count,
                 'audio_samples': len(audio)
             }
-            
+
+            # 保存音频文件
+            if output_dir:
+                os.makedirs(output_dir, exist_ok=True)
+                output_path = os.path.join(output_dir, f"test_{voice}.wav")
+                sf.write(output_path, audio, self.sample_rate)
+                result['output_path'] = output_path
+            return result
+
         except Exception as e:
             return {
                 'voice': voice,
@@ -71,109 +164,254 @@ class VoiceModelTester:
                 'error': str(e),
                 'synthesis_time': time.time() - start_time
             }
-    
-    def benchmark_voices(self, text="这是一个语音合成测试，用来评估不同语音模型的性能和质量。"):
-        """批量测试推荐的语音模型"""
-        # 推荐的语音模型列表
-        recommended_voices = [
-            'af_heart',    # 女声，温暖
-            'zf_001',      # 女声，标准
-            'zf_004',      # 女声，清晰
-            'zm_009',      # 男声，沉稳
-            'zm_012',      # 男声，自然
-        ]
-        
-        print(f"开始测试 {len(recommended_voices)} 个推荐语音模型...")
+
+    def benchmark_voices(self, text="这是一个语音合成测试，用来评估不同语音模型的性能和质量。",
+                         voices: Optional[List[str]] = None, runs: int = 3,
+                         output_dir: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        逐个测试语音模型，每个音色独占全部intra-op线程，测得的RTF和首块延迟可以在音色间比较
+
+        Args:
+            voices: 待测音色，默认为音色目录中校验通过的全部音色
+            runs: 每个音色重复合成的次数
+        """
+        if voices is None:
+            voices = VoiceCatalog(str(VOICES_DIR)).available()
+        if not voices:
+            print("❌ 没有可测试的音色")
+            return []
+
+        print(f"开始测试 {len(voices)} 个语音模型 (串行, 每个音色 {runs} 次)...")
         print(f"测试文本: {text}")
         print("="*60)
-        
+
+        torch.set_num_threads(self.num_threads)
+        memory = self.load_voices(voices)
+
+        # 预热，避免首个音色承担初始化开销
+        self._synthesize(text, voices[0])
+
         results = []
-        for voice in recommended_voices:
-            print(f"正在测试语音模型: {voice}")
-            result = self.test_voice_model(text, voice)
+        for done, voice in enumerate(voices, 1):
+            result = self.test_voice_model(text, voice, output_dir, runs, memory[voice])
             results.append(result)
-            
             if result['success']:
-                print(f"  ✅ 成功 - 音频时长: {result['audio_duration']:.2f}s, "
-                      f"合成耗时: {result['synthesis_time']:.2f}s, "
-                      f"速度比: {result['speed_ratio']:.1f}x")
+                print(f"  [{done}/{len(voices)}] ✅ {result['voice']}: "
+                      f"RTF {result['rtf_median']:.3f} (P90 {result['rtf_p90']:.3f}), "
+                      f"首块 {result['first_chunk_latency'] * 1000:.0f}ms, "
+                      f"{result['seconds_per_char']:.3f}s/字")
             else:
-                print(f"  ❌ 失败 - {result['error']}")
-            print()
-        
+                print(f"  [{done}/{len(voices)}] ❌ {result['voice']}: {result['error']}")
+
+        results.sort(key=lambda r: r['voice'])
         return results
-    
-    def generate_report(self, results):
+
+    def measure_throughput(self, text, voices: List[str], workers: int = 4) -> Optional[Dict[str, Any]]:
+        """
+        并行合成全部音色各一次，只报告整体吞吐；并行时各合成争抢核心，
+        单个请求的耗时不代表该音色的延迟，因此不记入逐音色结果
+
+        Args:
+            workers: 并行线程数，intra-op线程按CPU核数平均分配
+        """
+        workers = max(1, min(workers, len(voices)))
+        if workers < 2:
+            return None
+        if self.device == 'cpu':
+            # 各线程共用进程的intra-op线程池，按并行度分配避免超额订阅
+            torch.set_num_threads(max(1, (os.cpu_count() or 1) // workers))
+
+        print(f"\n并行吞吐测试 ({workers} 线程, {len(voices)} 个音色各 1 次)...")
+        audio_seconds, failures = 0.0, 0
+        start_time = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(self._synthesize, text, voice) for voice in voices]
+                for future in as_completed(futures):
+                    try:
+                        audio = future.result()[0]
+                    except Exception:
+                        failures += 1
+                        continue
+                    audio_seconds += len(audio) / self.sample_rate
+        finally:
+            torch.set_num_threads(self.num_threads)
+        wall_time = time.perf_counter() - start_time
+
+        return {
+            'workers': workers,
+            'requests': len(voices) - failures,
+            'failures': failures,
+            'wall_time': wall_time,
+            'audio_seconds': audio_seconds,
+            # 每秒墙钟时间合成的音频秒数
+            'audio_seconds_per_second': audio_seconds / wall_time if wall_time > 0 else 0.0,
+            'requests_per_second': (len(voices) - failures) / wall_time if wall_time > 0 else 0.0,
+        }
+
+    def generate_report(self, results, throughput: Optional[Dict[str, Any]] = None):
         """生成测试报告"""
         successful_results = [r for r in results if r['success']]
-        
+
         if not successful_results:
             print("❌ 所有测试都失败了")
             return
-        
+
         print("\n" + "="*60)
         print("🎤 语音模型性能测试报告")
         print("="*60)
-        
+
         # 统计信息
         total_tests = len(results)
         successful_tests = len(successful_results)
         success_rate = (successful_tests / total_tests) * 100
-        
+
         print(f"📊 测试统计:")
         print(f"  总测试数: {total_tests}")
         print(f"  成功数: {successful_tests}")
         print(f"  成功率: {success_rate:.1f}%")
         print()
-        
+
+        # 各项指标在音色间的分布
+        print(f"📈 指标分布 (P10 / P50 / P90):")
+        metrics = [
+            ('RTF', 'rtf_median', '{:.3f}'),
+            ('首块延迟(ms)', 'first_chunk_latency', '{:.0f}', 1000),
+            ('每字时长(s)', 'seconds_per_char', '{:.3f}'),
+            ('每音素时长(s)', 'seconds_per_phoneme', '{:.3f}'),
+            ('音色内存(MB)', 'voice_memory_mb', '{:.2f}'),
+        ]
+        for label, key, fmt, *scale in metrics:
+            values = [r[key] * (scale[0] if scale else 1) for r in successful_results]
+            print(f"  {label}: " + ' / '.join(fmt.format(_percentile(values, q)) for q in (10, 50, 90)))
+        print()
+
         # 性能排名
-        print(f"⚡ 合成速度排名 (越高越快):")
-        speed_sorted = sorted(successful_results, key=lambda x: x['speed_ratio'], reverse=True)
-        for i, result in enumerate(speed_sorted, 1):
-            print(f"  {i}. {result['voice']}: {result['speed_ratio']:.1f}x 实时")
+        print(f"⚡ 合成速度排名 (RTF越低越快，前10):")
+        speed_sorted = sorted(successful_results, key=lambda x: x['rtf_median'])
+        for i, result in enumerate(speed_sorted[:10], 1):
+            print(f"  {i}. {result['voice']}: RTF {result['rtf_median']:.3f} "
+                  f"({result['speed_ratio']:.1f}x 实时)")
         print()
-        
-        # 详细结果
-        print(f"📋 详细测试结果:")
-        for result in successful_results:
-            print(f"\n🎵 {result['voice']}:")
-            print(f"  音频时长: {result['audio_duration']:.2f} 秒")
-            print(f"  合成耗时: {result['synthesis_time']:.2f} 秒")
-            print(f"  速度比例: {result['speed_ratio']:.1f}x 实时")
-            print(f"  音频采样: {result['audio_samples']:,} samples")
-            print(f"  音素数量: {result['phonemes_count']}")
-            print(f"  输出文件: {result['output_path']}")
-        
+
+        # 语速差异最大的音色
+        rate_sorted = sorted(successful_results, key=lambda x: x['seconds_per_char'])
+        print(f"🗣️  语速: 最快 {rate_sorted[0]['voice']} ({rate_sorted[0]['seconds_per_char']:.3f}s/字), "
+              f"最慢 {rate_sorted[-1]['voice']} ({rate_sorted[-1]['seconds_per_char']:.3f}s/字)")
+
+        if throughput:
+            print(f"🚀 并行吞吐 ({throughput['workers']} 线程): "
+                  f"{throughput['audio_seconds_per_second']:.2f} 音频秒/秒, "
+                  f"{throughput['requests_per_second']:.2f} 请求/秒")
+
         # 推荐
         print(f"\n🌟 推荐使用:")
         if speed_sorted:
             fastest = speed_sorted[0]
             print(f"  最快合成: {fastest['voice']} ({fastest['speed_ratio']:.1f}x 实时)")
-        
-        # 平均性能
-        avg_speed = sum(r['speed_ratio'] for r in successful_results) / len(successful_results)
-        avg_duration = sum(r['audio_duration'] for r in successful_results) / len(successful_results)
-        avg_synthesis = sum(r['synthesis_time'] for r in successful_results) / len(successful_results)
-        
-        print(f"\n📈 平均性能:")
-        print(f"  平均音频时长: {avg_duration:.2f} 秒")
-        print(f"  平均合成耗时: {avg_synthesis:.2f} 秒")
-        print(f"  平均速度比例: {avg_speed:.1f}x 实时")
+
+        failed = [r for r in results if not r['success']]
+        if failed:
+            print(f"\n❌ 失败的音色:")
+            for result in failed:
+                print(f"  {result['voice']}: {result['error']}")
+
+    def save_results(self, results, output_path, text, workers, runs,
+                     throughput: Optional[Dict[str, Any]] = None):
+        """写入机器可读的结果，用于回归跟踪"""
+        data = {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'device': self.device,
+            'torch_version': torch.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'text': text,
+            'workers': workers,
+            'runs': runs,
+            'num_threads': self.num_threads,
+            'throughput': throughput,
+            'results': results,
+        }
+        Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        print(f"💾 结果已保存: {output_path}")
+
+
+def compare_results(baseline_path, results, threshold=0.1):
+    """
+    与基准结果做A/B对比，列出RTF、首块延迟或语速变化超过threshold（相对值）的音色
+
+    Returns:
+        List[Dict]: 超出阈值的变化
+    """
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {r['voice']: r for r in json.load(f)['results'] if r['success']}
+
+    changes = []
+    for result in results:
+        before = baseline.get(result['voice'])
+        if not result['success'] or before is None:
+            continue
+        for key in ('rtf_median', 'first_chunk_latency', 'seconds_per_char'):
+            if not before.get(key):
+                continue
+            change = result[key] / before[key] - 1
+            if abs(change) > threshold:
+                changes.append({'voice': result['voice'], 'metric': key, 'before': before[key],
+                                'after': result[key], 'change': change})
+
+    print(f"\n🆚 与基准对比 ({baseline_path}, 阈值 ±{threshold * 100:.0f}%):")
+    common = [r for r in results if r['success'] and r['voice'] in baseline]
+    if common:
+        before = np.median([baseline[r['voice']]['rtf_median'] for r in common])
+        after = np.median([r['rtf_median'] for r in common])
+        print(f"  RTF中位数: {before:.3f} -> {after:.3f} ({(after / before - 1) * 100:+.1f}%)")
+    if not changes:
+        print("  ✅ 没有超出阈值的变化")
+    for change in sorted(changes, key=lambda c: -abs(c['change'])):
+        mark = '⚠️ ' if change['change'] > 0 else '✅'
+        print(f"  {mark} {change['voice']} {change['metric']}: {change['before']:.3f} -> "
+              f"{change['after']:.3f} ({change['change'] * 100:+.1f}%)")
+    return changes
+
 
 def main():
+    parser = argparse.ArgumentParser(description='Kokoro TTS 语音模型性能测试')
+    parser.add_argument('--voices', nargs='+', help='待测音色，默认为音色目录中的全部音色')
+    parser.add_argument('--workers', '-w', type=int, default=4,
+                        help='并行吞吐测试的线程数，1表示不做并行测试')
+    parser.add_argument('--runs', type=int, default=3, help='每个音色重复合成的次数')
+    parser.add_argument('--text', default="这是一个语音合成测试，用来评估不同语音模型的性能和质量。",
+                        help='测试文本')
+    parser.add_argument('--device', default='cpu', help='计算设备')
+    parser.add_argument('--output', '-o', default='voice_tests/benchmark.json', help='结果JSON路径')
+    parser.add_argument('--baseline', help='用于A/B对比的基准结果JSON')
+    parser.add_argument('--threshold', type=float, default=0.1, help='对比时报告的相对变化阈值')
+    parser.add_argument('--save-audio', action='store_true', help='保存每个音色的音频到 voice_tests/')
+    args = parser.parse_args()
+
     print("🎤 Kokoro TTS 语音模型性能测试")
     print("="*60)
-    
+
     # 初始化测试器
-    tester = VoiceModelTester(device='cpu')
-    
-    # 运行基准测试
-    results = tester.benchmark_voices()
-    
+    tester = VoiceModelTester(device=args.device)
+
+    # 运行基准测试：逐音色指标串行测得，并行只测整体吞吐
+    results = tester.benchmark_voices(args.text, args.voices, args.runs,
+                                      'voice_tests' if args.save_audio else None)
+    voices = [r['voice'] for r in results if r['success']]
+    throughput = tester.measure_throughput(args.text, voices, args.workers) if voices else None
+
     # 生成报告
-    tester.generate_report(results)
-    
-    print("\n✅ 测试完成！查看 voice_tests/ 目录获取生成的音频文件。")
+    tester.generate_report(results, throughput)
+    # 先对比再保存，基准和输出是同一个文件时不会和自己比较
+    if args.baseline and results:
+        compare_results(args.baseline, results, args.threshold)
+    if results:
+        tester.save_results(results, args.output, args.text, args.workers, args.runs, throughput)
+
+    print("\n✅ 测试完成！")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
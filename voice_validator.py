@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+音色库快速校验
+只读取.pt文件的zip目录和其中很小的data.pkl，用受限的Unpickler解析出张量的
+形状、类型和存储记录，不把张量数据读入内存；多个文件并行检查，
+结果按 (路径, 大小, 修改时间) 缓存在音色目录的目录文件中，未变化的文件不再重复检查
+"""
+
+import os
+import json
+import pickle
+import zipfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+# Kokoro音色包: 按音素数索引的风格表
+KOKORO_VOICE_SHAPE = (510, 1, 256)
+CATALOG_FILE = '.voice_catalog.json'
+
+# torch存储类型 -> (dtype名, 每个元素的字节数)
+_STORAGE_TYPES = {
+    'FloatStorage': ('float32', 4),
+    'DoubleStorage': ('float64', 8),
+    'HalfStorage': ('float16', 2),
+    'BFloat16Storage': ('bfloat16', 2),
+    'LongStorage': ('int64', 8),
+    'IntStorage': ('int32', 4),
+    'ShortStorage': ('int16', 2),
+    'CharStorage': ('int8', 1),
+    'ByteStorage': ('uint8', 1),
+    'BoolStorage': ('bool', 1),
+    'UntypedStorage': ('uint8', 1),
+}
+_DTYPE_SIZES = {name: size for name, size in _STORAGE_TYPES.values()}
+
+
+@dataclass
+class VoiceFileInfo:
+    """单个音色文件的校验结果"""
+    name: str
+    size: int
+    mtime_ns: int
+    valid: bool
+    shape: Optional[List[int]] = None
+    dtype: Optional[str] = None
+    error: Optional[str] = None
+    checks: List[str] = field(default_factory=list)
+
+
+@dataclass
+class _StorageRef:
+    key: str
+    dtype: str
+    numel: int
+
+
+@dataclass
+class _TensorMeta:
+    storage: _StorageRef
+    offset: int
+    shape: List[int]
+    stride: List[int]
+    dtype: str
+
+
+def _rebuild_tensor_v2(storage, storage_offset, size, stride, *args):
+    return _TensorMeta(storage, storage_offset, list(size), list(stride), storage.dtype)
+
+
+def _rebuild_tensor_v3(storage, storage_offset, size, stride, requires_grad, backward_hooks,
+                       dtype, *args):
+    return _TensorMeta(storage, storage_offset, list(size), list(stride), dtype)
+
+
+class _MetadataUnpickler(pickle.Unpickler):
+    """只允许张量重建相关的全局对象，存储以引用代替，不读取张量数据"""
+
+    def find_class(self, module, name):
+        if module == 'torch._utils' and name == '_rebuild_tensor_v2':
+            return _rebuild_tensor_v2
+        if module == 'torch._utils' and name == '_rebuild_tensor_v3':
+            return _rebuild_tensor_v3
+        if module == 'torch' and name in _STORAGE_TYPES:
+            return name
+        if module == 'torch' and name in _DTYPE_SIZES:
+            return name
+        if module == 'collections' and name == 'OrderedDict':
+            from collections import OrderedDict
+            return OrderedDict
+        raise pickle.UnpicklingError(f"不允许的对象: {module}.{name}")
+
+    def persistent_load(self, pid):
+        # ('storage', 存储类型, 记录名, 设备, 元素数)
+        if not isinstance(pid, tuple) or len(pid) < 5 or pid[0] != 'storage':
+            raise pickle.UnpicklingError(f"未知的持久化引用: {pid!r}")
+        _, storage_type, key, _, numel = pid[:5]
+        dtype = _STORAGE_TYPES.get(storage_type, (None, 1))[0]
+        if dtype is None:
+            raise pickle.UnpicklingError(f"未知的存储类型: {storage_type}")
+        return _StorageRef(str(key), dtype, int(numel))
+
+
+def inspect_voice_file(path: Path, expected_shape: Optional[Sequence[int]] = KOKORO_VOICE_SHAPE,
+                       verify_crc: bool = False) -> VoiceFileInfo:
+    """
+    校验一个.pt音色文件
+
+    Args:
+        path: 音色文件
+        expected_shape: 期望的张量形状，None时不检查
+        verify_crc: 额外校验zip中所有记录的CRC（会顺序读一遍文件，但仍不反序列化张量）
+    """
+    path = Path(path)
+    stat = path.stat()
+    info = VoiceFileInfo(name=path.stem, size=stat.st_size, mtime_ns=stat.st_mtime_ns, valid=False)
+    try:
+        if not zipfile.is_zipfile(path):
+            raise ValueError('不是zip格式的torch文件（旧格式需要完整加载校验）')
+        with zipfile.ZipFile(path) as archive:
+            records = {item.filename: item for item in archive.infolist()}
+            pickle_name = next((name for name in records if name.endswith('/data.pkl')
+                                or name == 'data.pkl'), None)
+            if pickle_name is None:
+                raise ValueError('缺少data.pkl')
+            prefix = pickle_name[:-len('data.pkl')]
+            info.checks.append('zip')
+
+            with archive.open(pickle_name) as f:
+                tensor = _MetadataUnpickler(f).load()
+            if not isinstance(tensor, _TensorMeta):
+                raise ValueError(f'内容不是单个张量: {type(tensor).__name__}')
+            info.shape, info.dtype = tensor.shape, tensor.dtype
+            info.checks.append('pickle')
+
+            # 存储记录必须存在，且大小足够容纳张量按stride访问的最远元素
+            record = records.get(f'{prefix}data/{tensor.storage.key}')
+            if record is None:
+                raise ValueError(f'缺少存储记录 data/{tensor.storage.key}')
+            itemsize = _DTYPE_SIZES.get(tensor.dtype, 1)
+            extent = tensor.offset + 1 + sum((n - 1) * s for n, s in zip(tensor.shape, tensor.stride)
+                                             if n > 0)
+            if any(n == 0 for n in tensor.shape):
+                extent = 0
+            if record.file_size < extent * itemsize:
+                raise ValueError(f'存储记录被截断: {record.file_size} < {extent * itemsize} 字节')
+            if record.compress_type != zipfile.ZIP_STORED:
+                raise ValueError('存储记录被压缩，无法按mmap加载')
+            info.checks.append('storage')
+
+            if verify_crc:
+                bad = archive.testzip()
+                if bad is not None:
+                    raise ValueError(f'CRC校验失败: {bad}')
+                info.checks.append('crc')
+
+        if expected_shape is not None and tuple(info.shape) != tuple(expected_shape):
+            raise ValueError(f'形状 {info.shape} 与期望的 {list(expected_shape)} 不符')
+        if not info.dtype.startswith(('float', 'bfloat')):
+            raise ValueError(f'类型 {info.dtype} 不是浮点数')
+        info.valid = True
+    except (OSError, ValueError, EOFError, pickle.UnpicklingError, zipfile.BadZipFile) as e:
+        info.error = str(e)
+    return info
+
+
+class VoiceCatalog:
+    """音色目录：并行校验音色文件并缓存结果，用于代替逐个加载或合成探测"""
+
+    def __init__(self, voices_dir: str, cache_path: Optional[str] = None,
+                 expected_shape: Optional[Sequence[int]] = KOKORO_VOICE_SHAPE,
+                 workers: Optional[int] = None):
+        self.voices_dir = Path(voices_dir)
+        self.cache_path = Path(cache_path) if cache_path else self.voices_dir / CATALOG_FILE
+        self.expected_shape = expected_shape
+        self.workers = workers or min(32, (os.cpu_count() or 1) * 4)
+        self._entries: Dict[str, VoiceFileInfo] = {}
+        self._lock = threading.Lock()
+        # 同一时间只做一次扫描，refresh在有扫描进行时直接使用现有结果
+        self._scan_lock = threading.Lock()
+        self._scanned_at: Optional[float] = None
+        self.last_scan = {'files': 0, 'checked': 0, 'cached': 0}
+
+    def _load_cache(self) -> Dict[str, VoiceFileInfo]:
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('expected_shape') != (list(self.expected_shape) if self.expected_shape else None):
+                return {}
+            return {name: VoiceFileInfo(**entry) for name, entry in data.get('voices', {}).items()}
+        except (OSError, ValueError, TypeError):
+            return {}
+
+    def _save_cache(self, entries: Dict[str, VoiceFileInfo]):
+        data = {
+            'expected_shape': list(self.expected_shape) if self.expected_shape else None,
+            'voices': {name: asdict(info) for name, info in sorted(entries.items())},
+        }
+        # 临时文件名带上进程和线程，并发写入时互不覆盖
+        tmp_path = self.cache_path.with_name(
+            f'.{self.cache_path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            # 音色目录只读时仍可使用，只是下次需要重新校验
+            print(f"⚠️  无法写入音色目录缓存: {str(e)}")
+
+    def scan(self, verify_crc: bool = False, force: bool = False) -> Dict[str, VoiceFileInfo]:
+        """
+        校验目录中的所有.pt文件，大小和修改时间未变的文件直接使用缓存结果
+
+        Args:
+            verify_crc: 对需要检查的文件额外做CRC校验
+            force: 忽略缓存重新检查所有文件
+        """
+        with self._scan_lock:
+            return self._scan(verify_crc, force)
+
+    def _scan(self, verify_crc: bool, force: bool) -> Dict[str, VoiceFileInfo]:
+        if not self.voices_dir.exists():
+            with self._lock:
+                self._entries = {}
+            self._scanned_at = time.monotonic()
+            return {}
+
+        cached = {} if force else self._load_cache()
+        entries: Dict[str, VoiceFileInfo] = {}
+        pending = []
+        for path in self.voices_dir.glob('*.pt'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            previous = cached.get(path.stem)
+            if (previous is not None and previous.size == stat.st_size
+                    and previous.mtime_ns == stat.st_mtime_ns
+                    and (not verify_crc or 'crc' in previous.checks or not previous.valid)):
+                entries[path.stem] = previous
+            else:
+                pending.append(path)
+
+        if pending:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(pending))) as executor:
+                for info in executor.map(lambda p: inspect_voice_file(p, self.expected_shape,
+                                                                      verify_crc), pending):
+                    entries[info.name] = info
+        if pending or len(entries) != len(cached):
+            self._save_cache(entries)
+
+        self.last_scan = {'files': len(entries), 'checked': len(pending),
+                          'cached': len(entries) - len(pending)}
+        with self._lock:
+            self._entries = entries
+        self._scanned_at = time.monotonic()
+        return dict(entries)
+
+    def refresh(self, max_age: float = 30.0):
+        """距上次扫描超过max_age秒时重新扫描，用于按请求查询音色列表而不是每次都扫描目录"""
+        scanned_at = self._scanned_at
+        if scanned_at is not None and (time.monotonic() - scanned_at < max_age
+                                       or self._scan_lock.locked()):
+            return
+        self.scan()
+
+    def _ensure_scanned(self):
+        if self._scanned_at is None:
+            self.scan()
+
+    def get(self, voice: str) -> Optional[VoiceFileInfo]:
+        """查询单个音色，不存在时返回None"""
+        self._ensure_scanned()
+        with self._lock:
+            return self._entries.get(voice)
+
+    def is_available(self, voice: str) -> bool:
+        info = self.get(voice)
+        return info is not None and info.valid
+
+    def available(self) -> List[str]:
+        """校验通过的音色名"""
+        self._ensure_scanned()
+        with self._lock:
+            return sorted(name for name, info in self._entries.items() if info.valid)
+
+    def invalid(self) -> List[VoiceFileInfo]:
+        """校验失败的音色文件"""
+        self._ensure_scanned()
+        with self._lock:
+            return sorted((info for info in self._entries.values() if not info.valid),
+                          key=lambda info: info.name)